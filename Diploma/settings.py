@@ -143,3 +143,6 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Largest backup file accepted by the upload form
+BACKUP_UPLOAD_MAX_MB = int(os.getenv('BACKUP_UPLOAD_MAX_MB', '10240'))
@@ -15,6 +15,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
 django.setup()
 
+from django.utils import timezone
 from monitoring.models import EnergyLog, SystemSettings
 
 
@@ -98,18 +99,12 @@ def check_prediction_thresholds(predicted_current, predicted_voltage):
     return False
 
 
-def apply_models_to_record(record_id=None, force_abnormal_prediction=False, force_anomaly=False):
+def load_models():
     """
-    Apply ML models to a single energy record or the latest if no ID provided
-    With enhanced anomaly explanation
-
-    Args:
-        record_id: ID of record to analyze, or None for latest
-        force_abnormal_prediction: If True, ensure abnormal prediction values
-        force_anomaly: If True, ensure anomaly detection
+    Load the trained anomaly and forecast models
 
     Returns:
-        tuple: (is_anomaly, anomaly_score, predicted_current, predicted_voltage)
+        tuple: (anomaly_model, forecast_model)
     """
     # Load models
     model_dir = os.path.join(BASE_DIR, 'ml/model')
@@ -131,11 +126,29 @@ def apply_models_to_record(record_id=None, force_abnormal_prediction=False, forc
         raise FileNotFoundError(error_msg)
 
     # Load models
-    anomaly_model = joblib.load(anomaly_model_path)
-    forecast_model = joblib.load(forecast_model_path)
+    return joblib.load(anomaly_model_path), joblib.load(forecast_model_path)
+
+
+def apply_models_to_record(record_id=None, force_abnormal_prediction=False, force_anomaly=False, device_id=None,
+                           trigger_backup=True):
+    """
+    Apply ML models to a single energy record or the latest if no ID provided
+    With enhanced anomaly explanation
+
+    Args:
+        record_id: ID of record to analyze, or None for latest
+        force_abnormal_prediction: If True, ensure abnormal prediction values
+        force_anomaly: If True, ensure anomaly detection
+        device_id: When no record ID is given, pick the latest record of this device
+        trigger_backup: If False, leave the backup check to the caller
+
+    Returns:
+        tuple: (is_anomaly, anomaly_score, predicted_current, predicted_voltage)
+    """
+    anomaly_model, forecast_model = load_models()
 
     # Get the record to analyze
-    record = EnergyLog.objects.get(id=record_id) if record_id else EnergyLog.objects.latest('timestamp')
+    record = EnergyLog.objects.get(id=record_id) if record_id else EnergyLog.objects.for_device(device_id).latest('timestamp')
 
     # Create DataFrame with feature columns matching model expectations
     features = pd.DataFrame({
@@ -199,19 +212,15 @@ def apply_models_to_record(record_id=None, force_abnormal_prediction=False, forc
     record.save()
 
     # After applying models and saving the record, check if we need to create a backup
-    if is_anomaly or is_abnormal_prediction:
+    if trigger_backup and (is_anomaly or is_abnormal_prediction):
         try:
             from ml.backup_database import check_and_backup_if_needed
-            backup_performed = check_and_backup_if_needed(record.id)
-            if backup_performed:
+            # The background dumper marks the record as backed up once the backup is made
+            if check_and_backup_if_needed(record.id):
                 print(
-                    f"Backup created for record {record.id} due to {'anomaly' if is_anomaly else 'abnormal prediction'}")
-
-                # Update the record to indicate backup was triggered
-                record.backup_triggered = True
-                record.save()
+                    f"Backup requested for record {record.id} due to {'anomaly' if is_anomaly else 'abnormal prediction'}")
             else:
-                print(f"Backup not created for record {record.id} despite meeting conditions")
+                print(f"Backup not requested for record {record.id}, it is already backed up")
         except Exception as e:
             print(f"Error triggering backup for record {record.id}: {e}")
 
@@ -226,6 +235,111 @@ def apply_models_to_record(record_id=None, force_abnormal_prediction=False, forc
     return record.is_anomaly, anomaly_score, predicted_current, predicted_voltage
 
 
+def apply_models_to_records(record_ids, force_abnormal_prediction=False, force_anomaly=False, trigger_backup=True):
+    """
+    Apply ML models to many energy records in a single model pass
+
+    Models are loaded once and every prediction runs on the whole batch; feature
+    contributions for anomaly explanations are measured against the batch mean.
+    If any record needs a backup, one backup is created and linked to all of them.
+
+    Args:
+        record_ids: IDs of the records to analyze
+        force_abnormal_prediction: If True, ensure abnormal prediction values for every record
+        force_anomaly: If True, ensure anomaly detection for every record
+        trigger_backup: If False, leave the backup check to the caller
+
+    Returns:
+        dict: counts of scored records, anomalies, abnormal predictions and whether a backup was requested
+    """
+    anomaly_model, forecast_model = load_models()
+
+    records = list(EnergyLog.objects.filter(id__in=record_ids).order_by('id'))
+    if not records:
+        return {'scored': 0, 'anomalies': 0, 'abnormal_predictions': 0, 'backup_requested': False}
+
+    feature_names = ['ac_output_voltage', 'dc_battery_voltage', 'dc_battery_current', 'load_power', 'temperature']
+    features = pd.DataFrame({name: [getattr(record, name) for record in records] for name in feature_names})
+
+    # === Anomaly Detection ===
+    anomaly_preds = anomaly_model.predict(features)
+    baseline_scores = anomaly_model.decision_function(features)
+    anomaly_scores = baseline_scores.copy()
+    is_anomaly = anomaly_preds == -1
+
+    if force_anomaly:
+        # Same adjustment as for single records, applied to the rows the model missed
+        anomaly_scores = np.where(is_anomaly, anomaly_scores, np.minimum(-0.5, anomaly_scores * 2))
+        is_anomaly = np.ones(len(records), dtype=bool)
+
+    # Feature contributions: one decision_function call per feature for the whole batch
+    contributions = {}
+    if is_anomaly.any():
+        for name in feature_names:
+            modified_features = features.copy()
+            modified_features[name] = features[name].mean()
+            contributions[name] = baseline_scores - anomaly_model.decision_function(modified_features)
+
+    # === Prediction ===
+    predictions = forecast_model.predict(features)
+    predicted_current = predictions[:, 0].copy()
+    predicted_voltage = predictions[:, 1].copy()
+
+    current_abnormal = (predicted_current < 5) | (predicted_current > 15)
+    voltage_abnormal = (predicted_voltage < 220) | (predicted_voltage > 240)
+    is_abnormal_prediction = current_abnormal | voltage_abnormal
+
+    if force_abnormal_prediction:
+        # Push normal predictions just outside the normal range, as for single records
+        normal = ~is_abnormal_prediction
+        shift_current = normal & (np.random.random(len(records)) < 0.5)
+        shift_voltage = normal & ~shift_current
+        predicted_current[shift_current] = np.random.choice([4.0, 16.0], shift_current.sum())
+        predicted_voltage[shift_voltage] = np.random.choice([215.0, 245.0], shift_voltage.sum())
+        is_abnormal_prediction[:] = True
+
+    scored_at = timezone.now()
+    for i, record in enumerate(records):
+        record.is_anomaly = bool(is_anomaly[i])
+        record.anomaly_score = float(anomaly_scores[i])
+        record.anomaly_reason = None
+        if record.is_anomaly:
+            feature_scores = {name: contributions[name][i] for name in feature_names}
+            record.anomaly_reason = str(get_anomaly_explanation(None, feature_scores)) or None
+        record.predicted_current = float(predicted_current[i])
+        record.predicted_voltage = float(predicted_voltage[i])
+        record.is_abnormal_prediction = bool(is_abnormal_prediction[i])
+        # bulk_update skips auto_now; incremental backups rely on it
+        record.updated_at = scored_at
+
+    EnergyLog.objects.bulk_update(
+        records,
+        ['is_anomaly', 'anomaly_score', 'anomaly_reason', 'predicted_current', 'predicted_voltage',
+         'is_abnormal_prediction', 'updated_at'],
+        batch_size=500
+    )
+
+    # One backup for the whole batch, linked to every record that needed it
+    backup_requested = False
+    triggering_ids = [record.id for record in records if record.is_anomaly or record.is_abnormal_prediction]
+    if trigger_backup and triggering_ids:
+        try:
+            from ml.backup_coordinator import request_backup
+            reason = "ANOMALY" if is_anomaly.any() else "PREDICTION"
+            backup_requested = request_backup(triggering_ids, reason=reason)
+        except Exception as e:
+            print(f"Error triggering backup for batch of {len(records)} records: {e}")
+
+    summary = {
+        'scored': len(records),
+        'anomalies': int(is_anomaly.sum()),
+        'abnormal_predictions': int(is_abnormal_prediction.sum()),
+        'backup_requested': backup_requested,
+    }
+    print(f"Applied models to {len(records)} records: {summary}")
+    return summary
+
+
 if __name__ == "__main__":
     # If record ID is provided as command line argument, use it
     record_id = sys.argv[1] if len(sys.argv) > 1 else None
@@ -0,0 +1,334 @@
+# ml/backup_coordinator.py
+
+import os
+import sys
+import time
+import django
+import logging
+import argparse
+import subprocess
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+# Get the absolute path to the project directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Ensure logs directory exists
+logs_dir = os.path.join(BASE_DIR, 'logs')
+os.makedirs(logs_dir, exist_ok=True)
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
+django.setup()
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from monitoring.models import EnergyLog, BackupLog, SystemSettings
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(logs_dir, 'backup.log')),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('backup')
+
+# Application-wide key of the Postgres advisory lock held while a dump is in flight
+BACKUP_LOCK_KEY = 4735001
+# Key of the lock held by the single background dumper while it collects and dumps triggers
+DUMPER_LOCK_KEY = 4735002
+
+# Seconds a newly started dumper process may take to get its lock
+DUMPER_START_SECONDS = 5
+
+DEFAULT_COALESCE_SECONDS = 10
+
+# Longest sleep of the dumper before it looks again at triggers waiting for their snapshot window
+SNAPSHOT_POLL_SECONDS = 60
+
+
+@contextmanager
+def backup_lock():
+    """
+    Hold the backup advisory lock, waiting for an in-flight dump to finish first
+
+    The lock is session-level and re-entrant, so code that already holds it may take it again.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", [BACKUP_LOCK_KEY])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [BACKUP_LOCK_KEY])
+
+
+def lock_held(key):
+    """Whether any session holds the advisory lock `key`"""
+    with connection.cursor() as cursor:
+        # A single bigint key shows as classid (high half) and objid (low half) with objsubid 1
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND granted "
+                       "AND classid::text::bigint = %s AND objid::text::bigint = %s AND objsubid = 1)",
+                       [key >> 32, key & 0xFFFFFFFF])
+        return cursor.fetchone()[0]
+
+
+def backup_in_progress():
+    """Whether any session holds the backup lock, i.e. a dump is in flight"""
+    return lock_held(BACKUP_LOCK_KEY)
+
+
+def get_coalesce_window():
+    """Seconds to wait for further triggers before dumping"""
+    settings = SystemSettings.objects.first()
+    return settings.backup_coalesce_seconds if settings else DEFAULT_COALESCE_SECONDS
+
+
+def collect_pending_triggers(exclude_ids):
+    """
+    Find anomalous records that are still waiting for a backup
+
+    Only records added after the last successful backup started are considered: older
+    unlinked records are already contained in that backup's data. Before the first backup with
+    a watermark no backup holds any of them, so every waiting record counts.
+    """
+    pending = EnergyLog.objects.filter(backup_triggered=False).filter(
+        Q(is_anomaly=True) | Q(is_abnormal_prediction=True)
+    ).exclude(id__in=exclude_ids)
+
+    last_backup = BackupLog.objects.filter(
+        status='SUCCESS', watermark_id__isnull=False
+    ).order_by('-timestamp', '-id').first()
+    if last_backup:
+        pending = pending.filter(id__gt=last_backup.watermark_id)
+
+    return list(pending.order_by('id').values_list('id', flat=True))
+
+
+def pending_triggers(record_ids=(), exclude_ids=()):
+    """IDs of the given records that are not backed up yet, with every other waiting trigger"""
+    exclude_ids = set(exclude_ids)
+    own_ids = set(EnergyLog.objects.filter(id__in=record_ids, backup_triggered=False)
+                  .exclude(id__in=exclude_ids).values_list('id', flat=True))
+    return sorted(own_ids | set(collect_pending_triggers(exclude_ids=own_ids | exclude_ids)))
+
+
+def ready_for_snapshot(trigger_ids):
+    """
+    Pick the triggers whose snapshot can be taken now
+
+    In snapshot mode a snapshot holds the readings up to `snapshot_window_minutes` after its
+    latest trigger, so a trigger is only ready once that part of its window has been recorded.
+    In the other modes every trigger is ready.
+
+    Returns:
+        tuple: (IDs of the ready triggers, seconds until the next trigger is ready or None)
+    """
+    settings = SystemSettings.objects.first()
+    if not settings or settings.backup_mode != 'SNAPSHOT':
+        return trigger_ids, None
+
+    window = timedelta(minutes=settings.snapshot_window_minutes)
+    now = timezone.now()
+    ready, next_ready = [], None
+    for record_id, timestamp in EnergyLog.objects.filter(id__in=trigger_ids).values_list('id', 'timestamp'):
+        window_end = timestamp + window
+        if window_end <= now:
+            ready.append(record_id)
+        elif next_ready is None or window_end < next_ready:
+            next_ready = window_end
+
+    return sorted(ready), (next_ready - now).total_seconds() if next_ready else None
+
+
+def dumper_running():
+    """Whether a backup dumper holds its lock, i.e. triggers are being collected or dumped"""
+    return lock_held(DUMPER_LOCK_KEY)
+
+
+@contextmanager
+def dumper_lock():
+    """
+    Try to become the backup dumper; yields False at once if another process already is
+
+    Unlike backup_lock this never waits: a trigger arriving while a dumper runs is picked up
+    by that dumper.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [DUMPER_LOCK_KEY])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [DUMPER_LOCK_KEY])
+
+
+def request_backup(record_ids, reason=None):
+    """
+    Register records that need a backup and make sure the background dumper will take them
+
+    The records themselves are the pending triggers (anomalous and not yet backed up), so
+    nothing else is recorded: if a dumper is running it collects them, otherwise one is started
+    in a detached process. The caller never waits for the coalesce window or the dump.
+
+    Args:
+        record_ids: IDs of the records that triggered the backup
+        reason: Backup reason (ANOMALY or PREDICTION)
+
+    Returns:
+        bool: True if the records were queued for a backup, False if they are already backed up
+    """
+    record_ids = list(record_ids)
+
+    own_ids = list(EnergyLog.objects.filter(id__in=record_ids, backup_triggered=False)
+                   .order_by('id').values_list('id', flat=True))
+    if not own_ids:
+        logger.info(f"Backup trigger for records {record_ids} coalesced into an earlier backup")
+        return False
+
+    if dumper_running():
+        logger.info(f"Backup trigger for records {own_ids} left to the running backup dumper")
+        return True
+
+    start_dumper(own_ids, reason)
+    return True
+
+
+def start_dumper(record_ids, reason=None):
+    """Run the backup dumper for a set of triggering records in a detached process"""
+    script_path = os.path.join(BASE_DIR, 'ml', 'backup_coordinator.py')
+    log_file = os.path.join(logs_dir, 'backup_dumper.log')
+    cmd = [sys.executable, script_path, *[str(record_id) for record_id in record_ids]]
+    if reason:
+        cmd += ['--reason', reason]
+
+    subprocess.Popen(
+        cmd,
+        stdout=open(log_file, "a"),
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+        cwd=str(BASE_DIR)
+    )
+    logger.info(f"Started the backup dumper for records {record_ids}")
+
+
+def dump_pending(record_ids, reason, attempted, coalesce=True):
+    """
+    Wait `backup_coalesce_seconds` for the rest of the burst, then back up every waiting trigger
+
+    Triggers arriving during a dump are backed up by another dump right after it. In snapshot mode
+    triggers wait until their snapshot window has passed (see ready_for_snapshot), and those that
+    become ready together share a snapshot. Records whose backup was attempted (successfully or
+    not) are added to `attempted` and not tried again.
+
+    Returns:
+        tuple: (backups performed, seconds until the next waiting trigger is ready or None)
+    """
+    from ml.backup_database import backup_database
+
+    # Time spent waiting for triggers before the next dump, recorded as its coalesce phase
+    waiting_since = time.monotonic()
+    window = get_coalesce_window() if coalesce else 0
+    if window > 0:
+        logger.info(f"Waiting {window}s to coalesce further backup triggers")
+        time.sleep(window)
+
+    performed = 0
+    while True:
+        trigger_ids = pending_triggers(record_ids, exclude_ids=attempted)
+        if not trigger_ids:
+            return performed, None
+
+        trigger_ids, wait = ready_for_snapshot(trigger_ids)
+        if not trigger_ids:
+            # A snapshot window lasts minutes; the caller waits for it without holding the dumper lock
+            return performed, wait
+
+        attempted.update(trigger_ids)
+        if len(trigger_ids) > 1:
+            logger.info(f"Coalescing {len(trigger_ids) - 1} additional triggers into one backup")
+        coalesce_seconds = time.monotonic() - waiting_since
+        if not backup_database(record_id=trigger_ids[0], reason=reason, coalesced_ids=trigger_ids[1:],
+                               coalesce_seconds=coalesce_seconds):
+            # The records stay unlinked; the next burst or the scheduled backup covers them
+            return performed, None
+
+        performed += 1
+        waiting_since = time.monotonic()
+        # Later dumps take the reason of their own first record
+        reason = None
+
+
+def run_dumper(record_ids, reason=None):
+    """
+    Back up waiting triggers until none are left, as the only dumper
+
+    A trigger that arrives while the dumper still holds its lock is left to it, so after giving
+    up the lock the dumper looks once more and starts over if anything is still waiting. While
+    triggers wait for their snapshot window the dumper sleeps without the lock and its database
+    connection, waking at least every SNAPSHOT_POLL_SECONDS; a dumper started meanwhile takes
+    the lock and the triggers, and this one then finds nothing left to do.
+
+    Returns:
+        int: Backups performed
+    """
+    performed = 0
+    attempted = set()
+    coalesce = True
+    while True:
+        with dumper_lock() as acquired:
+            if not acquired:
+                logger.info("Another backup dumper is running, leaving the triggers to it")
+                return performed
+            done, wait = dump_pending(record_ids, reason, attempted, coalesce=coalesce)
+            performed += done
+
+        if done:
+            # Later dumps take the reason of their own first record
+            record_ids, reason = [], None
+        if wait is not None:
+            wait = min(wait, SNAPSHOT_POLL_SECONDS)
+            logger.info(f"Waiting {wait:.0f}s for the snapshot window of the next trigger to pass")
+            connection.close()
+            time.sleep(wait)
+            # The burst is long over once a snapshot window has passed
+            coalesce = False
+            continue
+        if not pending_triggers(exclude_ids=attempted):
+            return performed
+        record_ids, reason, coalesce = [], None, True
+
+
+def wait_for_dumper(timeout=600):
+    """
+    Wait until no backup dumper is starting or running, e.g. before counting the backups of a run
+
+    Returns:
+        bool: False if a dumper was still running after `timeout` seconds
+    """
+    deadline = time.monotonic() + timeout
+    # A dumper started just now may not hold its lock yet
+    time.sleep(DUMPER_START_SECONDS)
+    while dumper_running():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(1)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back up anomalous records waiting for a backup")
+    parser.add_argument("record_ids", type=int, nargs='*', help="IDs of the records that triggered the backup")
+    parser.add_argument("--reason", choices=['ANOMALY', 'PREDICTION'], help="Reason of the first backup")
+
+    args = parser.parse_args()
+
+    backups = run_dumper(args.record_ids, reason=args.reason)
+    logger.info(f"Backup dumper finished after {backups} backups")
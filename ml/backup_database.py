@@ -2,11 +2,14 @@
 
 import os
 import django
-import subprocess
+import hashlib
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import logging
 from pathlib import Path
+import subprocess
 import sys
+import time
 from django.utils import timezone
 
 # Get the absolute path to the project directory
@@ -25,7 +28,25 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
 django.setup()
 
 from django.conf import settings as django_settings
-from monitoring.models import EnergyLog, BackupLog, SystemSettings
+from django.db import connection, transaction
+from django.db.models import F, Max, Min
+from monitoring.models import (EnergyLog, BackupLog, BackupChunk, BackupDiff, BackupMount, RestoreOperation,
+                               SimulationBatch, SystemSettings)
+from ml.backup_formats import (BACKUP_FORMATS, backup_file_patterns, backup_size_kb, detect_format, open_backup,
+                               remove_backup_path, run_dump, sync_backup_path)
+from ml.backup_retention import DEFAULT_POLICY, compute_keep_set
+from ml.backup_manifest import (MANIFEST_SUFFIX, MANIFEST_VERSION, database_stats, file_sha256, manifest_path, pg_dump_version,
+                                read_manifest, table_stats, write_manifest)
+from ml.chunk_store import chunk_path, chunks_dir, list_stored_chunks, read_recipe, remove_chunk
+from ml.backup_stream import (CopyBlockReader, RestoreCancelled, RestoreListener, RestoreProgress, find_copy_block,
+                              make_row_filter)
+from ml.logical_export import run_export
+from ml.backup_throttle import LatencySampler, baseline_latency, percentile
+from ml.backup_timing import PhaseTimer, bytes_per_second
+from ml.row_digest import DIGEST_VERSION, build_tree, changed_windows, diff_trees, digest_columns, hour_digests
+from ml.backup_policy import DEFAULT_CHANGE_THRESHOLD, backup_decision, change_counter, changes_since
+from ml.table_swap import (build_shadow_indexes, create_shadow_table, drop_shadow_table, swap_back, swap_in_shadow,
+                           validate_referencing_keys)
 
 # Configure logging
 logging.basicConfig(
@@ -38,6 +59,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger('backup')
 
+# Backups triggered by these reasons may be incremental or snapshots; manual and scheduled backups are always full
+INCREMENTAL_REASONS = ('ANOMALY', 'PREDICTION')
+
+# Increments also carry records changed this long before their parent's snapshot, so a write whose
+# transaction was still open when the parent was dumped is not missed
+INCREMENTAL_OVERLAP_MINUTES = 5
+
+# Uploads are written under this prefix until registered; the name matches no backup format
+UPLOAD_PART_PREFIX = '.upload-'
+# Unfinished uploads older than this are removed by the cleanup
+STALE_UPLOAD_HOURS = 24
+
+# A diff still running after this long belongs to a process that died
+STALE_DIFF_MINUTES = 30
+
+
 
 def load_system_settings():
     """Load system settings"""
@@ -54,13 +91,17 @@ def load_system_settings():
 
 def check_and_backup_if_needed(record_id):
     """
-    Check if a record needs a backup and perform it if needed
+    Check if a record needs a backup and request it if needed
+
+    The backup itself is made by the background dumper (see ml/backup_coordinator.py), which
+    links the record to it; this call returns without waiting for the dump.
 
     Args:
         record_id: ID of the record to check
 
     Returns:
-        bool: True if backup was needed and performed, False otherwise
+        bool: True if a backup was requested for the record, False otherwise
+              (including when the record is already covered by a backup)
     """
     logger.info(f"Checking if record {record_id} needs backup")
 
@@ -84,11 +125,10 @@ def check_and_backup_if_needed(record_id):
             # Determine reason
             reason = "ANOMALY" if is_anomalous else "PREDICTION"
 
-            # Perform backup
+            # Request backup; triggers from the same burst are coalesced into a single dump
             logger.info(f"Backup needed for record {record_id}. Reason: {reason}")
-            backup_performed = backup_database(record_id=record_id, reason=reason)
-
-            return backup_performed
+            from ml.backup_coordinator import request_backup
+            return request_backup([record_id], reason=reason)
         else:
             logger.info(f"No backup needed for record {record_id}")
             return False
@@ -98,81 +138,416 @@ def check_and_backup_if_needed(record_id):
         return False
 
 
+def retention_policy(settings):
+    """Retention policy of the system settings (see ml/backup_retention.py)"""
+    if not settings:
+        logger.warning("No system settings found, using defaults")
+        return dict(DEFAULT_POLICY)
+    return {
+        'hourly': settings.retention_hourly,
+        'daily': settings.retention_daily,
+        'weekly': settings.retention_weekly,
+        'monthly': settings.retention_monthly,
+        'max_age_days': settings.backup_retention_days,
+        'max_count': settings.max_backups,
+        'max_bytes': settings.backup_storage_budget_mb * 1024 * 1024,
+    }
+
+
 def cleanup_old_backups():
     """
-    Clean up old backups based on both count limit and age
+    Apply the retention policy to the backups
+
+    The keep-set is computed in one pass over the backup log (grandfather-father-son tiers within
+    the count and byte budgets, see ml/backup_retention.py). Every other backup file on disk is
+    deleted, the backup logs of dropped backups are removed in bulk, and unreferenced chunks are
+    collected. Runs under the backup lock, so a dump in flight is never mistaken for an orphan.
+
+    Returns:
+        dict: Numbers of kept, deleted and orphaned backups and the bytes freed
     """
-    settings = load_system_settings()
-    if not settings:
-        logger.warning("No system settings found, using defaults")
-        max_backups = 20
-        retention_days = 30
-    else:
-        max_backups = settings.max_backups
-        retention_days = settings.backup_retention_days
+    from ml.backup_coordinator import backup_lock
 
-    logger.info(f"Cleaning up old backups (keeping {max_backups} files, {retention_days} days retention)")
+    policy = retention_policy(load_system_settings())
+    logger.info(f"Applying backup retention policy: {policy}")
+    report = {'kept': 0, 'deleted': 0, 'orphans': 0, 'freed_bytes': 0}
 
     try:
-        # Get all backup files
-        backup_files = list(Path(backups_dir).glob("*.sql"))
-        logger.info(f"Found {len(backup_files)} backup files")
-
-        # Remove files older than retention_days
-        cutoff_date = timezone.now() - timedelta(days=retention_days)
-        old_files = []
-
-        for file_path in backup_files:
-            try:
-                file_mtime = datetime.fromtimestamp(file_path.stat().st_mtime)
-                # Make sure the timestamp is timezone-aware
-                if timezone.is_naive(file_mtime):
-                    file_mtime = timezone.make_aware(file_mtime)
-
-                if file_mtime < cutoff_date:
-                    old_files.append(file_path)
-            except Exception as e:
-                logger.error(f"Error checking file {file_path}: {e}")
-
-        # Delete old files
-        logger.info(f"Found {len(old_files)} files older than {retention_days} days")
-        for file_path in old_files:
-            try:
-                logger.info(f"Deleting old backup: {file_path.name}")
-                file_path.unlink()
-                # Also delete from database
-                BackupLog.objects.filter(backup_file=file_path.name).delete()
-                logger.info(f"Deleted old backup older than {retention_days} days: {file_path.name}")
-            except Exception as e:
-                logger.error(f"Failed to delete old backup {file_path}: {str(e)}")
-
-        # Now check if we still have too many files and remove the oldest ones
-        backup_files = list(Path(backups_dir).glob("*.sql"))
-        if len(backup_files) > max_backups:
-            # Sort by modification time (oldest first)
-            backup_files.sort(key=lambda x: x.stat().st_mtime)
-
-            # Select files to delete
-            files_to_delete = backup_files[:(len(backup_files) - max_backups)]
-
-            logger.info(f"Need to delete {len(files_to_delete)} files to respect max_backups limit of {max_backups}")
-
-            # Delete the files
-            for file_path in files_to_delete:
-                try:
-                    logger.info(f"Deleting backup (exceeding max count): {file_path.name}")
-                    file_path.unlink()
-                    # Also delete from database
-                    BackupLog.objects.filter(backup_file=file_path.name).delete()
-                    logger.info(f"Deleted old backup exceeding count limit: {file_path.name}")
-                except Exception as e:
-                    logger.error(f"Failed to delete backup {file_path}: {str(e)}")
+        with backup_lock():
+            backups = list(BackupLog.objects.filter(status='SUCCESS').values(
+                'id', 'timestamp', 'parent_id', 'size_kb', 'backup_file', 'backup_type', 'trigger_reason'))
+            for backup in backups:
+                # Tier buckets follow the local calendar
+                backup['timestamp'] = timezone.localtime(backup['timestamp'])
+                backup['size_bytes'] = int((backup['size_kb'] or 0) * 1024)
+
+            keep = compute_keep_set(backups, policy, timezone.now())
+            dropped = [backup for backup in backups if backup['id'] not in keep]
+            kept_files = {backup['backup_file'] for backup in backups if backup['id'] in keep}
+            dropped_files = {backup['backup_file']: backup['size_bytes'] for backup in dropped}
+            known_files = set(BackupLog.objects.values_list('backup_file', flat=True))
+
+            # Everything on disk outside the keep-set goes: dropped backups, leftovers of failed dumps
+            # and files without a backup log
+            doomed = [path for path in list_backup_files() if path.name not in kept_files]
+            report['orphans'] = sum(1 for path in doomed if path.name not in known_files)
+
+            # Chunks of dropped chunked backups are released in one batch (orphan recipes never held references)
+            adjust_chunk_refs([path for path in doomed
+                               if path.name in dropped_files and detect_format(path) == 'chunked'], -1)
+
+            for path in doomed:
+                if detect_format(path) == 'chunked':
+                    report['freed_bytes'] += path.stat().st_size
+                elif path.name in dropped_files:
+                    report['freed_bytes'] += dropped_files[path.name]
+                else:
+                    report['freed_bytes'] += int(backup_size_kb(path) * 1024)
+                remove_backup_path(path)
+                manifest_path(path).unlink(missing_ok=True)
+
+            # Manifests whose backup is gone
+            for path in Path(backups_dir).glob(f"*{MANIFEST_SUFFIX}"):
+                if path.name[:-len(MANIFEST_SUFFIX)] not in kept_files:
+                    path.unlink()
+
+            # Uploads interrupted without the handler cleaning up
+            stale_before = time.time() - STALE_UPLOAD_HOURS * 3600
+            for path in Path(backups_dir).glob(f"{UPLOAD_PART_PREFIX}*.part"):
+                if path.stat().st_mtime < stale_before:
+                    report['freed_bytes'] += path.stat().st_size
+                    path.unlink()
+
+            dropped_ids = [backup['id'] for backup in dropped]
+            for start in range(0, len(dropped_ids), 500):
+                BackupLog.objects.filter(id__in=dropped_ids[start:start + 500]).delete()
+
+            report['kept'] = len(keep)
+            report['deleted'] = len(dropped)
+
+        # Chunks shared by the remaining backups stay; only unreferenced ones are deleted
+        _, chunk_bytes = collect_chunk_garbage()
+        report['freed_bytes'] += chunk_bytes
+
+        # Mounts of the dropped backups went with their backup logs; their schemas go now
+        from ml.backup_mount import drop_orphaned_mounts
+        drop_orphaned_mounts()
+
+        tiers = {}
+        for tier in keep.values():
+            tiers[tier] = tiers.get(tier, 0) + 1
+        logger.info(f"Retention kept {report['kept']} backups ({tiers}), deleted {report['deleted']} "
+                    f"and {report['orphans']} orphaned files, freed {report['freed_bytes'] / (1024 * 1024):.1f} MB")
 
     except Exception as e:
         logger.error(f"Exception during backup cleanup: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
 
+    return report
+
+
+def get_incremental_parent(settings):
+    """
+    Find the backup a new increment should be chained onto
+
+    Returns None (meaning a full backup is needed) when incremental mode is off, when there is
+    no full backup with a watermark yet, when a file of the chain is missing, or when the chain
+    has reached the configured maximum length.
+    """
+    if not settings or settings.backup_mode != 'INCREMENTAL':
+        return None
+
+    last_backup = BackupLog.objects.filter(
+        status='SUCCESS', watermark_id__isnull=False
+    ).order_by('-timestamp', '-id').first()
+    if not last_backup:
+        logger.info("No backup with a watermark yet, starting a new chain with a full backup")
+        return None
+
+    chain = last_backup.get_chain()
+    if len(chain) - 1 >= settings.max_incremental_chain:
+        logger.info(f"Backup chain reached {settings.max_incremental_chain} increments, starting a new full backup")
+        return None
+
+    for link in chain:
+        if not os.path.exists(os.path.join(backups_dir, link.backup_file)):
+            logger.warning(f"Backup chain is broken ({link.backup_file} is missing), starting a new full backup")
+            return None
+
+    return last_backup
+
+
+def list_backup_files():
+    """Return paths of all backup files (and directory archives) in the backups directory"""
+    return [path for pattern in backup_file_patterns() for path in Path(backups_dir).glob(pattern)]
+
+
+def adjust_chunk_refs(recipe_paths, delta):
+    """
+    Add `delta` references to every chunk of the given recipes (per occurrence)
+
+    Returns:
+        tuple: (chunks created, chunks already stored)
+    """
+    counts = {}
+    for recipe_path in recipe_paths:
+        for chunk_hash in read_recipe(recipe_path):
+            counts[chunk_hash] = counts.get(chunk_hash, 0) + 1
+
+    created = 0
+    if delta > 0 and counts:
+        existing = set(BackupChunk.objects.filter(hash__in=counts).values_list('hash', flat=True))
+        store = chunks_dir(recipe_paths[0])
+        new_chunks = [BackupChunk(hash=chunk_hash, stored_size=chunk_path(store, chunk_hash).stat().st_size)
+                      for chunk_hash in counts if chunk_hash not in existing]
+        BackupChunk.objects.bulk_create(new_chunks, batch_size=1000)
+        created = len(new_chunks)
+
+    # Group by multiplicity to keep the updates few
+    by_count = {}
+    for chunk_hash, count in counts.items():
+        by_count.setdefault(count, []).append(chunk_hash)
+    for count, hashes in by_count.items():
+        BackupChunk.objects.filter(hash__in=hashes).update(ref_count=F('ref_count') + delta * count)
+
+    return created, len(counts) - created
+
+
+def discard_backup_path(path):
+    """Delete a backup file (or directory archive) with its manifest, releasing its chunks"""
+    if detect_format(path) == 'chunked' and os.path.exists(path):
+        adjust_chunk_refs([path], -1)
+    remove_backup_path(path)
+    manifest_path(path).unlink(missing_ok=True)
+
+
+def collect_chunk_garbage():
+    """
+    Delete chunks no backup references any more, and chunk files left by interrupted dumps
+
+    Runs under the backup lock, so no dump can be writing or referencing chunks meanwhile.
+
+    Returns:
+        tuple: (chunks removed, bytes freed)
+    """
+    from ml.backup_coordinator import backup_lock
+
+    store = chunks_dir(os.path.join(backups_dir, 'recipe'))
+    removed = 0
+    freed = 0
+
+    with backup_lock():
+        unreferenced = BackupChunk.objects.filter(ref_count__lte=0)
+        for chunk in unreferenced.iterator():
+            remove_chunk(store, chunk.hash)
+            removed += 1
+            freed += chunk.stored_size
+        unreferenced.delete()
+
+        # Files written by a dump that failed before its chunks were registered
+        known = set(BackupChunk.objects.values_list('hash', flat=True))
+        for chunk_hash in list_stored_chunks(store) - known:
+            path = chunk_path(store, chunk_hash)
+            freed += path.stat().st_size
+            path.unlink()
+            removed += 1
+
+    if removed:
+        logger.info(f"Chunk store garbage collection removed {removed} chunks ({freed / (1024 * 1024):.1f} MB)")
+    return removed, freed
+
+
+def copy_query(cursor, f, table, columns, query, params=None):
+    """Write the result of `query` to `f` as a pg_dump style COPY block for `table`"""
+    if params:
+        query = cursor.cursor.mogrify(query, params).decode('utf-8')
+
+    f.write(f"COPY public.{table} ({columns}) FROM stdin;\n")
+    cursor.cursor.copy_expert(f"COPY ({query}) TO STDOUT", f)
+    f.write("\\.\n\n")
+
+
+def model_columns(model):
+    """Comma-separated quoted column list of a model's table"""
+    return ', '.join(connection.ops.quote_name(field.column) for field in model._meta.concrete_fields)
+
+
+def dump_incremental(backup_file, since_id, changed_since=None):
+    """
+    Write energy logs with IDs above `since_id` or changed since `changed_since` (and their backup
+    links) to a backup file
+
+    Changed records are the ones written after they were backed up, e.g. scored or flagged as backed
+    up; a chain restore replaces them with the newer version. Parents without a snapshot time
+    (older backups) only chain on new IDs.
+
+    The file uses the same COPY block format as pg_dump plain output, so it can be read by
+    restore_database and the replay tool like a full backup.
+
+    Returns:
+        dict: Manifest statistics of the tables written
+    """
+    table = EnergyLog._meta.db_table
+    link_table = BackupLog.triggered_by.through._meta.db_table
+    columns = model_columns(EnergyLog)
+
+    where, params = "id > %s", [since_id]
+    if changed_since:
+        overlap_start = changed_since - timedelta(minutes=INCREMENTAL_OVERLAP_MINUTES)
+        where, params = "id > %s OR updated_at >= %s", [since_id, overlap_start]
+    link_where = f"energylog_id IN (SELECT id FROM {table} WHERE {where})"
+
+    with open_backup(backup_file, 'wt') as f, connection.cursor() as cursor:
+        f.write(f"-- Incremental backup of {table}: records with id > {since_id}"
+                f"{f' or changed since {changed_since.isoformat()}' if changed_since else ''}\n\n")
+        copy_query(cursor, f, table, columns,
+                   f"SELECT {columns} FROM {table} WHERE {where} ORDER BY id", params)
+        copy_query(cursor, f, link_table, 'id, backuplog_id, energylog_id',
+                   f"SELECT id, backuplog_id, energylog_id FROM {link_table} WHERE {link_where} ORDER BY id", params)
+
+        return {
+            table: table_stats(cursor, table, where, params),
+            link_table: table_stats(cursor, link_table, link_where, params),
+        }
+
+
+def dump_snapshot(backup_file, trigger_ids, window_minutes):
+    """
+    Write the readings around the triggering records to a compressed snapshot file
+
+    The snapshot holds the energy logs from `window_minutes` before the earliest trigger to
+    `window_minutes` after the latest one (of the triggering devices only when they are known),
+    the backups linked to those logs and the system settings row. The dumper only takes the
+    snapshot once the window after the latest trigger has passed, so those readings exist.
+
+    Returns:
+        dict: Manifest statistics of the tables written
+    """
+    triggers = EnergyLog.objects.filter(id__in=trigger_ids)
+    bounds = triggers.aggregate(start=Min('timestamp'), end=Max('timestamp'))
+    window_start = bounds['start'] - timedelta(minutes=window_minutes)
+    window_end = bounds['end'] + timedelta(minutes=window_minutes)
+
+    logs = EnergyLog.objects.filter(timestamp__range=(window_start, window_end))
+    device_ids = set(triggers.values_list('device_id', flat=True))
+    if None not in device_ids:
+        logs = logs.filter(device_id__in=device_ids)
+    log_ids = list(logs.values_list('id', flat=True))
+
+    table = EnergyLog._meta.db_table
+    link_table = BackupLog.triggered_by.through._meta.db_table
+    backup_table = BackupLog._meta.db_table
+    settings_table = SystemSettings._meta.db_table
+
+    with open_backup(backup_file, 'wt') as f, connection.cursor() as cursor:
+        f.write(f"-- Anomaly snapshot of {table}: {window_start.isoformat()} - {window_end.isoformat()}, "
+                f"triggered by records {', '.join(str(i) for i in trigger_ids)}\n\n")
+
+        columns = model_columns(EnergyLog)
+        copy_query(cursor, f, table, columns,
+                   f"SELECT {columns} FROM {table} WHERE id = ANY(%s::bigint[]) ORDER BY id", [log_ids])
+
+        columns = model_columns(BackupLog)
+        copy_query(cursor, f, backup_table, columns,
+                   f"SELECT {columns} FROM {backup_table} WHERE id IN (SELECT backuplog_id FROM {link_table} "
+                   f"WHERE energylog_id = ANY(%s::bigint[])) ORDER BY id", [log_ids])
+        copy_query(cursor, f, link_table, 'id, backuplog_id, energylog_id',
+                   f"SELECT id, backuplog_id, energylog_id FROM {link_table} "
+                   f"WHERE energylog_id = ANY(%s::bigint[]) ORDER BY id", [log_ids])
+
+        columns = model_columns(SystemSettings)
+        copy_query(cursor, f, settings_table, columns, f"SELECT {columns} FROM {settings_table} ORDER BY id")
+
+        return {
+            table: table_stats(cursor, table, "id = ANY(%s::bigint[])", [log_ids]),
+            backup_table: table_stats(cursor, backup_table, f"id IN (SELECT backuplog_id FROM {link_table} "
+                                                            f"WHERE energylog_id = ANY(%s::bigint[]))", [log_ids]),
+            link_table: table_stats(cursor, link_table, "energylog_id = ANY(%s::bigint[])", [log_ids]),
+            settings_table: table_stats(cursor, settings_table),
+        }
+
+
+@contextmanager
+def dump_transaction():
+    """
+    Hold one REPEATABLE READ transaction open for a dump and export its snapshot
+
+    The native exporter and the manifest statistics read in this transaction, and pg_dump imports
+    its snapshot (--snapshot), so the manifest describes exactly the data in the backup.
+
+    Yields:
+        tuple: (cursor, snapshot ID)
+    """
+    # Inside an outer transaction the isolation level can no longer be changed; the export is then best effort
+    repeatable = not connection.in_atomic_block
+    with transaction.atomic(), connection.cursor() as cursor:
+        if repeatable:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("SELECT pg_export_snapshot()")
+        yield cursor, cursor.fetchone()[0]
+
+
+def manifest_fields(manifest):
+    """BackupLog fields indexing a manifest, so listings never need to open the backup"""
+    stats = manifest['tables'].get(EnergyLog._meta.db_table, {})
+    row_digests = manifest.get('row_digests')
+    return {
+        'checksum': manifest['sha256'],
+        'row_digest': row_digests['root'] if row_digests else None,
+        'pg_dump_version': manifest['pg_dump_version'],
+        'record_count': stats.get('rows'),
+        'min_record_id': stats.get('min_id'),
+        'max_record_id': stats.get('max_id'),
+        'first_record_at': datetime.fromisoformat(stats['min_timestamp']) if stats.get('min_timestamp') else None,
+        'last_record_at': datetime.fromisoformat(stats['max_timestamp']) if stats.get('max_timestamp') else None,
+        # The digest tree has a node per hour of data; it stays in the manifest file only
+        'manifest': {key: value for key, value in manifest.items() if key != 'row_digests'},
+    }
+
+
+def format_latency(milliseconds):
+    return f"{milliseconds:.1f} ms" if milliseconds is not None else "-"
+
+
+def format_timings(timings):
+    return ', '.join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+
+
+def untracked_tables():
+    """Tables whose writes are backup bookkeeping rather than data, so they never make a backup due"""
+    return [BackupLog._meta.db_table, BackupLog.triggered_by.through._meta.db_table, BackupChunk._meta.db_table,
+            BackupMount._meta.db_table, RestoreOperation._meta.db_table, SimulationBatch._meta.db_table,
+            BackupDiff._meta.db_table, 'django_session']
+
+
+def scheduled_backup_due():
+    """
+    Decide whether the scheduled backup should run now
+
+    Compares the database change counter with the one recorded by the last successful full backup,
+    against the change threshold and the maximum interval from the system settings.
+
+    Returns:
+        tuple: (due, reason)
+    """
+    settings = SystemSettings.objects.first()
+    threshold = settings.backup_change_threshold if settings else DEFAULT_CHANGE_THRESHOLD
+    max_interval_hours = max(settings.backup_frequency_hours, 1) if settings else 24
+
+    # Uploads carry no change counter and their time is not the time of their data
+    last_full = BackupLog.objects.filter(
+        status="SUCCESS", backup_type="FULL", change_counter__isnull=False
+    ).exclude(trigger_reason="UPLOAD").order_by('-timestamp').first()
+    if last_full is None:
+        return backup_decision(None, None, threshold, max_interval_hours)
+
+    with connection.cursor() as cursor:
+        counter = change_counter(cursor, untracked_tables())
+    hours_since = (timezone.now() - last_full.timestamp).total_seconds() / 3600
+    return backup_decision(changes_since(counter, last_full.change_counter), hours_since, threshold,
+                           max_interval_hours)
+
 
 def create_scheduled_backup():
     """Create a scheduled backup without requiring an anomaly"""
@@ -186,19 +561,47 @@ def create_scheduled_backup():
         return False
 
 
-def backup_database(record_id=None, force=False, reason=None, user=None):
+def backup_database(record_id=None, force=False, reason=None, user=None, coalesced_ids=None, backup_format=None,
+                    coalesce_seconds=0):
     """
     Create a backup of the PostgreSQL database
 
+    Waits for any dump already in flight (see ml/backup_coordinator.py), so at most one
+    dump runs at a time across the web server, the scheduler and background scripts.
+
     Args:
         record_id: ID of record to check, or None for no association
         force: Force backup regardless of anomaly status
         reason: Optional specific reason for backup
         user: User who initiated the backup
+        coalesced_ids: IDs of further records whose triggers were coalesced into this backup
+        backup_format: Format of a full backup (see ml/backup_formats.py), defaults to the system setting
+        coalesce_seconds: Time the caller waited for further triggers before this backup
 
     Returns:
         bool: True if backup was performed
     """
+    from ml.backup_coordinator import backup_lock
+
+    timer = PhaseTimer()
+    if coalesce_seconds:
+        timer.add('coalesce', coalesce_seconds)
+    with backup_lock():
+        timer.lap('lock_wait')
+        return perform_backup(record_id=record_id, force=force, reason=reason, user=user,
+                              coalesced_ids=coalesced_ids, backup_format=backup_format, timer=timer)
+
+
+def perform_backup(record_id=None, force=False, reason=None, user=None, coalesced_ids=None, backup_format=None,
+                   timer=None):
+    """
+    Create the backup; the caller must hold the backup lock (see backup_database)
+
+    The time spent in each phase (see BackupLog.BACKUP_PHASES) is recorded on the backup log;
+    `timer` carries the phases timed by the caller, such as the wait for the lock.
+    """
+    coalesced_ids = list(coalesced_ids or [])
+    timer = timer or PhaseTimer()
 
     # Determine backup reason
     trigger_reason = reason
@@ -245,9 +648,37 @@ def backup_database(record_id=None, force=False, reason=None, user=None):
     # Get database settings from Django settings
     db_settings = django_settings.DATABASES['default']
 
+    # Anomaly and prediction backups are snapshots of the readings around the trigger in snapshot mode,
+    # or are chained onto the last backup in incremental mode
+    settings = load_system_settings()
+    trigger_ids = ([record.id] if record else []) + coalesced_ids
+    parent = None
+    if trigger_reason in INCREMENTAL_REASONS and settings and settings.backup_mode == 'SNAPSHOT' and trigger_ids:
+        backup_type = "SNAPSHOT"
+    else:
+        parent = get_incremental_parent(settings) if trigger_reason in INCREMENTAL_REASONS else None
+        backup_type = "INCREMENTAL" if parent else "FULL"
+
+    # Full backups use the configured format; increments are plain COPY files and snapshots are gzipped
+    if backup_type == "FULL":
+        backup_format = backup_format or (settings.backup_format if settings else 'plain')
+    else:
+        backup_format = "gzip" if backup_type == "SNAPSHOT" else "plain"
+    compression_level = settings.backup_compression_level if settings else 6
+    dump_jobs = settings.backup_dump_jobs if settings else 2
+    # Cap on the dump stream in bytes per second, so ingestion keeps its share of the disk (0 = no cap)
+    rate_limit = (settings.backup_bandwidth_mb if settings else 0) * 1024 * 1024
+    # pg_dump's archive formats can only be written by pg_dump itself
+    exporter = settings.backup_exporter if settings else 'NATIVE'
+    if BACKUP_FORMATS[backup_format]['kind'] == 'native':
+        exporter = 'PG_DUMP'
+
     # Create backup filename with timezone-aware timestamp
-    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
-    backup_file = os.path.join(backups_dir, f"energy_data_{timestamp}.sql")
+    # Microsecond resolution keeps back-to-back dumps from sharing a file name
+    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S_%f')
+    suffix = {"FULL": "", "INCREMENTAL": "_inc", "SNAPSHOT": "_snap"}[backup_type]
+    extension = BACKUP_FORMATS[backup_format]['extension']
+    backup_file = os.path.join(backups_dir, f"energy_data_{timestamp}{suffix}{extension}")
     backup_filename = os.path.basename(backup_file)
 
     # Check if a backup log with this filename already exists (prevent duplicates)
@@ -271,37 +702,130 @@ def backup_database(record_id=None, force=False, reason=None, user=None):
             logger.info(f"Previous backup attempt failed, retrying...")
 
     try:
-        # PostgreSQL dump command
-        cmd = [
-            'pg_dump',
-            '-h', db_settings['HOST'],
-            '-p', db_settings['PORT'],
-            '-U', db_settings['USER'],
-            '-d', db_settings['NAME'],
-            '-f', backup_file
-        ]
-
-        # Execute backup
-        logger.info(f"Starting database backup to {backup_file} (reason: {trigger_reason})")
-        process = subprocess.Popen(
-            cmd,
-            env=dict(os.environ, PGPASSWORD=db_settings['PASSWORD']),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        stdout, stderr = process.communicate()
-
-        if process.returncode == 0:
+        # Ingest latency right before and during the dump, to tune the bandwidth cap
+        with connection.cursor() as cursor:
+            latency_before = percentile(baseline_latency(cursor, EnergyLog._meta.db_table))
+
+        timer.lap('prepare')
+        with LatencySampler(EnergyLog._meta.db_table) as sampler, dump_transaction() as (cursor, snapshot_id):
+            # Every record up to this ID is covered by the backup: the dump reads the same snapshot.
+            # Snapshots cover only a time window and never serve as a watermark.
+            watermark_id = None
+            snapshot_at = None
+            if backup_type != "SNAPSHOT":
+                watermark_id = EnergyLog.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+                # Start of the dump transaction: the next increment carries the records changed since
+                cursor.execute("SELECT now()")
+                snapshot_at = cursor.fetchone()[0]
+
+            # Change counter the next scheduled backup is measured from (see ml/backup_policy.py)
+            counter = change_counter(cursor, untracked_tables()) if backup_type == "FULL" else None
+
+            # Digest tree of the energy logs in the backup, for diffing against the live table later
+            row_digests = (build_tree(hour_digests(cursor, EnergyLog._meta.db_table, digest_columns(EnergyLog)))
+                           if backup_type == "FULL" else None)
+
+            cursor.execute("SHOW server_version")
+            server_version = cursor.fetchone()[0]
+            dumper_version = None
+            digest = None
+
+            if backup_type == "SNAPSHOT":
+                logger.info(f"Starting anomaly snapshot to {backup_file} for records {trigger_ids} "
+                            f"(±{settings.snapshot_window_minutes} minutes, reason: {trigger_reason})")
+                tables = dump_snapshot(backup_file, trigger_ids, settings.snapshot_window_minutes)
+                logger.info(f"Anomaly snapshot contains {tables[EnergyLog._meta.db_table]['rows']} energy logs")
+                returncode, error_output = 0, ""
+            elif parent:
+                logger.info(f"Starting incremental backup to {backup_file} since record {parent.watermark_id} "
+                            f"(reason: {trigger_reason})")
+                tables = dump_incremental(backup_file, parent.watermark_id, changed_since=parent.snapshot_at)
+                logger.info(f"Incremental backup contains {tables[EnergyLog._meta.db_table]['rows']} energy logs")
+                returncode, error_output = 0, ""
+            elif exporter == 'NATIVE':
+                # Every table is streamed with COPY in this transaction; rows are counted and the
+                # checksum computed as they stream
+                logger.info(f"Starting database export to {backup_file} "
+                            f"(format: {backup_format}, reason: {trigger_reason})")
+                digest = hashlib.sha256()
+                tables = run_export(cursor, backup_file, backup_format, level=compression_level, digest=digest,
+                                    rate_limit=rate_limit)
+                returncode, error_output = 0, ""
+            else:
+                # Execute backup; the checksum is computed while pg_dump streams
+                logger.info(f"Starting database backup to {backup_file} "
+                            f"(format: {backup_format}, reason: {trigger_reason})")
+                from ml.backup_mount import MOUNT_SCHEMA_PREFIX
+                tables = database_stats(cursor)
+                dumper_version = pg_dump_version()
+                digest = hashlib.sha256()
+                returncode, error_output = run_dump(db_settings, backup_file, backup_format,
+                                                    level=compression_level, jobs=dump_jobs,
+                                                    extra_args=['--snapshot', snapshot_id,
+                                                                '--exclude-schema', f"{MOUNT_SCHEMA_PREFIX}*"],
+                                                    digest=digest,
+                                                    rate_limit=rate_limit, low_priority=True)
+
+        timer.lap('dump')
+        latency_during = percentile(sampler.samples)
+        logger.info(f"Ingest latency p95: {format_latency(latency_before)} before the dump, "
+                    f"{format_latency(latency_during)} during it ({len(sampler.samples)} probes)")
+
+        if returncode == 0:
             logger.info(f"Backup completed successfully: {backup_file}")
 
-            # Get file size in KB
-            file_size_kb = os.path.getsize(backup_file) / 1024
+            # The backup must be on disk before it is recorded
+            sync_backup_path(backup_file)
+            timer.lap('fsync')
+
+            # Reference the chunks first, so a recipe on disk always holds its references
+            if backup_format == 'chunked':
+                created, reused = adjust_chunk_refs([backup_file], 1)
+                logger.info(f"Chunked backup stored {created} new chunks and reused {reused} existing ones")
+                timer.lap('bookkeeping')
+
+            # Get size on disk in KB (compressed size for compressed formats)
+            file_size_kb = backup_size_kb(backup_file)
+
+            # Increments and snapshots are small and written by us, so they are hashed once written
+            manifest = {
+                'version': MANIFEST_VERSION,
+                'backup_file': backup_filename,
+                'backup_type': backup_type,
+                'backup_format': backup_format,
+                'trigger_reason': trigger_reason or "UNKNOWN",
+                'created_at': timezone.now().isoformat(),
+                'parent': parent.backup_file if parent else None,
+                'watermark_id': watermark_id,
+                'snapshot_at': snapshot_at.isoformat() if snapshot_at else None,
+                'exporter': 'pg_dump' if backup_type == "FULL" and exporter == 'PG_DUMP' else 'native',
+                'pg_dump_version': dumper_version,
+                'server_version': server_version,
+                'sha256': digest.hexdigest() if digest else file_sha256(backup_file),
+                'size_bytes': int(file_size_kb * 1024),
+                'tables': tables,
+            }
+            if row_digests:
+                manifest['row_digests'] = row_digests
+            write_manifest(backup_file, manifest)
+            timer.lap('manifest')
 
             # If we have an existing record that failed, update it instead of creating a new one
             if existing_backup and existing_backup.status != "SUCCESS":
                 existing_backup.status = "SUCCESS"
                 existing_backup.size_kb = file_size_kb
                 existing_backup.error_message = None
+                existing_backup.backup_type = backup_type
+                existing_backup.backup_format = backup_format
+                existing_backup.parent = parent
+                existing_backup.watermark_id = watermark_id
+                existing_backup.snapshot_at = snapshot_at
+                existing_backup.coalesced_triggers = len(coalesced_ids)
+                existing_backup.ingest_latency_before_ms = latency_before
+                existing_backup.ingest_latency_during_ms = latency_during
+                existing_backup.change_counter = counter
+                for field, value in manifest_fields(manifest).items():
+                    setattr(existing_backup, field, value)
                 existing_backup.save()
                 backup_log = existing_backup
                 logger.info(f"Updated existing backup log {existing_backup.id} to SUCCESS")
@@ -313,6 +837,16 @@ def backup_database(record_id=None, force=False, reason=None, user=None):
                     size_kb=file_size_kb,
                     trigger_reason=trigger_reason or "UNKNOWN",
                     created_by=user,
+                    backup_type=backup_type,
+                    backup_format=backup_format,
+                    parent=parent,
+                    watermark_id=watermark_id,
+                    snapshot_at=snapshot_at,
+                    coalesced_triggers=len(coalesced_ids),
+                    ingest_latency_before_ms=latency_before,
+                    ingest_latency_during_ms=latency_during,
+                    change_counter=counter,
+                    **manifest_fields(manifest),
                 )
                 logger.info(f"Created new backup log with ID {backup_log.id}")
 
@@ -326,9 +860,26 @@ def backup_database(record_id=None, force=False, reason=None, user=None):
 
                 logger.info(f"Marked record {record.id} as backed up")
 
+            # Link the records whose triggers were coalesced into this dump
+            if coalesced_ids:
+                backup_log.triggered_by.add(*coalesced_ids)
+                EnergyLog.objects.filter(id__in=coalesced_ids).update(backup_triggered=True,
+                                                                      updated_at=timezone.now())
+                logger.info(f"Linked {len(coalesced_ids)} coalesced records to backup {backup_log.id}")
+
+            timer.lap('bookkeeping')
+            dump_seconds = timer.phases['dump']
+            BackupLog.objects.filter(id=backup_log.id).update(
+                duration_seconds=round(timer.elapsed(), 3),
+                bytes_per_second=bytes_per_second(file_size_kb * 1024, dump_seconds),
+                phase_timings=timer.as_dict(),
+            )
+            logger.info(f"Backup took {timer.elapsed():.1f}s ({format_timings(timer.as_dict())}), "
+                        f"{file_size_kb / 1024 / dump_seconds if dump_seconds else 0:.1f} MB/s written")
+
             return True
         else:
-            error_msg = stderr.decode('utf-8')
+            error_msg = error_output
             logger.error(f"Backup failed: {error_msg}")
 
             # Create failed backup log entry
@@ -338,7 +889,11 @@ def backup_database(record_id=None, force=False, reason=None, user=None):
                 size_kb=0,
                 trigger_reason=trigger_reason or "UNKNOWN",
                 error_message=error_msg[:255],  # Truncate if needed
-                created_by=user
+                created_by=user,
+                backup_type=backup_type,
+                backup_format=backup_format,
+                duration_seconds=round(timer.elapsed(), 3),
+                phase_timings=timer.as_dict(),
             )
 
             # Associate backup with the triggering record if provided
@@ -358,7 +913,11 @@ def backup_database(record_id=None, force=False, reason=None, user=None):
                 size_kb=0,
                 trigger_reason=trigger_reason or "UNKNOWN",
                 error_message=str(e)[:255],  # Truncate if needed
-                created_by=user
+                created_by=user,
+                backup_type=backup_type,
+                backup_format=backup_format,
+                duration_seconds=round(timer.elapsed(), 3),
+                phase_timings=timer.as_dict(),
             )
             # Associate backup with the triggering record if provided
             if record:
@@ -369,130 +928,231 @@ def backup_database(record_id=None, force=False, reason=None, user=None):
         return False
 
 
-def restore_database(backup_filename):
+def restore_copy_block(cursor, backup_path, label, mode='load', selection=None, target=None, listener=None):
     """
-    Restore only the energy logs from a backup file - properly overwriting existing data
+    Stream the energy log COPY block of one backup file into the database
+
+    The dump is read line by line and fed straight into COPY, so memory use does not
+    depend on the size of the backup.
 
     Args:
-        backup_filename: Name of the backup file
+        cursor: Database cursor inside the restore transaction
+        backup_path: Path to the backup file (any format)
+        label: Name of the backup for log messages
+        mode: 'load' - COPY into the (empty) table,
+              'merge' - replace the records contained in the block,
+              'upsert' - insert or update the records of the block with ON CONFLICT (id) DO UPDATE
+        selection: Optional dict with start/end/min_id/max_id limiting the restored rows
+        target: Table to restore into (defaults to the energy log table)
+        listener: Optional RestoreListener following the streamed rows
 
     Returns:
-        tuple: (success, message)
+        RestoreProgress: Rows and bytes restored
     """
-    import tempfile
-    import re
+    table = EnergyLog._meta.db_table
+    target = target or table
+    progress = RestoreProgress(f"Restoring {label}", listener)
 
-    logger.info(f"Attempting to restore energy logs from {backup_filename}")
+    with open_backup(backup_path) as stream:
+        columns = find_copy_block(stream, table)
+        if columns is None:
+            raise Exception(f"No data found in backup file {label}")
 
-    backup_file = os.path.join(backups_dir, backup_filename)
+        column_list = ', '.join(connection.ops.quote_name(column) for column in columns)
+        reader = CopyBlockReader(stream, progress, row_filter=make_row_filter(columns, **(selection or {})))
 
-    # Check if the file exists
-    if not os.path.exists(backup_file):
-        error_msg = f"Файл резервної копії не знайдено: {backup_filename}"
-        logger.error(error_msg)
-        return False, error_msg
+        if mode == 'load':
+            cursor.cursor.copy_expert(f"COPY {target} ({column_list}) FROM STDIN", reader)
+        else:
+            # Only the rows of the block (or of the selection) go through the staging table
+            cursor.execute(f"CREATE TEMP TABLE energylog_staging (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP")
+            cursor.cursor.copy_expert(f"COPY energylog_staging ({column_list}) FROM STDIN", reader)
+
+            if mode == 'upsert':
+                # Restored records count as changed, so the next increment carries them
+                kept = [column for column in columns if column != 'updated_at']
+                insert_list = ', '.join(connection.ops.quote_name(column) for column in kept + ['updated_at'])
+                select_list = ', '.join([connection.ops.quote_name(column) for column in kept] + ['now()'])
+                updates = ', '.join(f"{connection.ops.quote_name(column)} = EXCLUDED.{connection.ops.quote_name(column)}"
+                                    for column in kept + ['updated_at'] if column != 'id')
+                cursor.execute(f"INSERT INTO {target} ({insert_list}) SELECT {select_list} FROM energylog_staging "
+                               f"ON CONFLICT (id) DO UPDATE SET {updates}")
+            else:
+                cursor.execute(f"DELETE FROM {target} WHERE id IN (SELECT id FROM energylog_staging)")
+                cursor.execute(f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM energylog_staging")
+            cursor.execute("DROP TABLE energylog_staging")
 
-    # Get database settings
-    db_settings = django_settings.DATABASES['default']
+    if selection:
+        logger.info(f"Selected {progress.rows} of {reader.scanned} rows in {label}")
+    progress.report()
+    return progress
 
-    try:
-        # Create a temporary file to hold only the energy logs data
-        with tempfile.NamedTemporaryFile(suffix='.sql', mode='w', delete=False) as temp_file:
-            temp_path = temp_file.name
 
-            # Read the original backup file
-            with open(backup_file, 'r') as original_file:
-                content = original_file.read()
+def reset_energylog_sequence(cursor):
+    """Move the energy log ID sequence past the restored records and return the record count"""
+    table = EnergyLog._meta.db_table
+    # Set the sequence to max ID + 1 (since we don't have sequence info in backup)
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('public.{table}', 'id'), "
+        f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}))"
+    )
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    return cursor.fetchone()[0]
 
-            # Extract only the energy logs table data and schema
-            # Define patterns to match the energy logs table SQL statements
-            table_pattern = r'CREATE TABLE public\.monitoring_energylog[\s\S]*?;\s*\n'
-            data_pattern = r'COPY public\.monitoring_energylog[\s\S]*?\\.\s*\n'
 
-            # Find all relevant sections
-            table_match = re.search(table_pattern, content)
-            data_match = re.search(data_pattern, content)
+def restore_into_shadow(chain_files, timer=None, listener=None):
+    """
+    Replace the energy log table with a backup chain without blocking readers and writers
 
-            # Start with statements to handle foreign keys and clear existing table
-            temp_file.write('-- Generated restore script for monitoring_energylog\n')
-            temp_file.write('BEGIN;\n')
+    The chain is loaded into a shadow table and indexed while the live table keeps serving the
+    dashboard and ingestion. The shadow is then swapped in by renames under a short exclusive lock;
+    records written during the load are carried over, and the replaced table is kept as
+    `monitoring_energylog_old` for `rollback_restore`.
 
-            # Delete all existing records from EnergyLog (keeping table structure)
-            temp_file.write('DELETE FROM public.monitoring_energylog;\n')
+    Returns:
+        tuple: (rows restored, bytes restored, record count)
+    """
+    timer = timer or PhaseTimer()
+    listener = listener or RestoreListener()
+    table = EnergyLog._meta.db_table
+    restored_rows = 0
+    restored_bytes = 0
 
-            # Insert the data
-            if data_match:
-                temp_file.write(data_match.group(0))
-            else:
-                raise Exception("No data found in backup file")
+    # Records above this ID were written during the restore and survive it
+    catch_up_after_id = EnergyLog.objects.aggregate(max_id=Max('id'))['max_id'] or 0
 
-            # Set the sequence to max ID + 1 (since we don't have sequence info in backup)
-            temp_file.write("\n-- Reset sequence\n")
-            temp_file.write(
-                "SELECT setval('public.monitoring_energylog_id_seq', "
-                "(SELECT COALESCE(MAX(id), 0) + 1 FROM public.monitoring_energylog));\n"
-            )
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            shadow = create_shadow_table(cursor, table)
+
+            progress = restore_copy_block(cursor, os.path.join(backups_dir, chain_files[0]), chain_files[0],
+                                          mode='load', target=shadow, listener=listener)
+            restored_rows += progress.rows
+            restored_bytes += progress.bytes
+
+            # Replay the increments on top: each one replaces the records it contains
+            for increment_file in chain_files[1:]:
+                progress = restore_copy_block(cursor, os.path.join(backups_dir, increment_file), increment_file,
+                                              mode='merge', target=shadow, listener=listener)
+                restored_rows += progress.rows
+                restored_bytes += progress.bytes
+            timer.lap('load')
+
+            listener.phase('indexes')
+            build_shadow_indexes(cursor, table)
+        timer.lap('indexes')
+
+        # Past this point the restore can no longer be cancelled: the swap commits it
+        listener.phase('swap')
+        with transaction.atomic(), connection.cursor() as cursor:
+            lock_wait, _ = swap_in_shadow(cursor, table, catch_up_after_id=catch_up_after_id)
+            record_count = reset_energylog_sequence(cursor)
+        # The rest of the swap transaction, including the commit, is time under the exclusive lock
+        timer.add('lock_wait', lock_wait)
+        timer.lap('swap')
+        timer.add('swap', -lock_wait)
+
+    except Exception:
+        with connection.cursor() as cursor:
+            drop_shadow_table(cursor, table)
+        raise
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        validate_referencing_keys(cursor, table)
+
+    return restored_rows, restored_bytes, record_count
+
+
+def restore_database(backup_filename, start=None, end=None, min_id=None, max_id=None, listener=None):
+    """
+    Restore only the energy logs from a backup file - properly overwriting existing data
 
-            temp_file.write('COMMIT;\n')
-
-        # Now restore from the temporary file
-        restore_cmd = [
-            'psql',
-            '-h', db_settings['HOST'],
-            '-p', db_settings['PORT'],
-            '-U', db_settings['USER'],
-            '-d', db_settings['NAME'],
-            '-f', temp_path
-        ]
-
-        logger.info(f"Restoring energy logs from temporary file {temp_path}")
-        restore_process = subprocess.Popen(
-            restore_cmd,
-            env=dict(os.environ, PGPASSWORD=db_settings['PASSWORD']),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        restore_stdout, restore_stderr = restore_process.communicate()
+    A full restore is loaded into a shadow table and swapped in atomically (see `restore_into_shadow`),
+    so the dashboard and ingestion keep working meanwhile. Snapshots and selective restores merge
+    into the live table in a single transaction. When a time window and/or ID range is given, only the
+    matching rows are restored: they are streamed into a staging table and merged with
+    INSERT ... ON CONFLICT (id) DO UPDATE, leaving every other record untouched.
 
-        # Clean up the temporary file
-        try:
-            os.unlink(temp_path)
-        except Exception as e:
-            logger.warning(f"Failed to delete temporary file {temp_path}: {e}")
+    Args:
+        backup_filename: Name of the backup file
+        start, end: Optional time window of the records to restore (inclusive)
+        min_id, max_id: Optional ID range of the records to restore (inclusive)
+        listener: Optional RestoreListener following the progress; it may cancel the restore
+            until the restored data is committed
 
-        if restore_process.returncode != 0:
-            error_msg = f"Failed to restore energy logs: {restore_stderr.decode('utf-8')}"
+    Returns:
+        tuple: (success, message)
+    """
+    listener = listener or RestoreListener()
+    selection = {key: value for key, value in
+                 {'start': start, 'end': end, 'min_id': min_id, 'max_id': max_id}.items() if value is not None}
+
+    logger.info(f"Attempting to restore energy logs from {backup_filename}"
+                f"{f' (selection: {selection})' if selection else ''}")
+
+    # An incremental backup is restored by replaying its whole chain: the full backup, then every increment
+    backup_log = BackupLog.objects.filter(backup_file=backup_filename, status='SUCCESS').first()
+    chain_files = [link.backup_file for link in backup_log.get_chain()] if backup_log else [backup_filename]
+
+    # Check if the files exist
+    for chain_file in chain_files:
+        if not os.path.exists(os.path.join(backups_dir, chain_file)):
+            error_msg = f"Файл резервної копії не знайдено: {chain_file}"
             logger.error(error_msg)
             return False, error_msg
 
-        # Verify the restore
-        count_cmd = [
-            'psql',
-            '-h', db_settings['HOST'],
-            '-p', db_settings['PORT'],
-            '-U', db_settings['USER'],
-            '-d', db_settings['NAME'],
-            '-t',  # Tuple only output
-            '-c', 'SELECT COUNT(*) FROM public.monitoring_energylog;'
-        ]
-
-        count_process = subprocess.Popen(
-            count_cmd,
-            env=dict(os.environ, PGPASSWORD=db_settings['PASSWORD']),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        count_stdout, count_stderr = count_process.communicate()
+    if len(chain_files) > 1:
+        logger.info(f"Restoring chain of {len(chain_files)} backups: {', '.join(chain_files)}")
 
-        if count_process.returncode == 0:
-            record_count = count_stdout.decode('utf-8').strip()
-            logger.info(f"Restored {record_count} records to monitoring_energylog")
-            success_message = f"Energy logs successfully restored from {backup_filename} ({record_count} records)"
+    restored_rows = 0
+    restored_bytes = 0
+    timer = PhaseTimer()
+
+    try:
+        listener.phase('load')
+        if not selection and (backup_log is None or backup_log.backup_type != 'SNAPSHOT'):
+            # Any other backup replaces the table
+            restored_rows, restored_bytes, record_count = restore_into_shadow(chain_files, timer=timer,
+                                                                             listener=listener)
+            listener.phase('bookkeeping')
         else:
-            success_message = f"Energy logs successfully restored from {backup_filename}"
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Selective restore: every file of the chain contributes its matching rows, later files win.
+                # A snapshot only holds the readings around an anomaly, so it is merged into the current data
+                mode = 'upsert' if selection else 'merge'
+                for chain_file in chain_files:
+                    progress = restore_copy_block(cursor, os.path.join(backups_dir, chain_file), chain_file,
+                                                  mode=mode, selection=selection, listener=listener)
+                    restored_rows += progress.rows
+                    restored_bytes += progress.bytes
+                timer.lap('load')
+
+                record_count = reset_energylog_sequence(cursor)
+                # Past this point the restore can no longer be cancelled: the transaction commits it
+                listener.phase('bookkeeping')
+        timer.lap('bookkeeping')
+
+        if backup_log:
+            BackupLog.objects.filter(id=backup_log.id).update(
+                restored_at=timezone.now(),
+                restore_seconds=round(timer.elapsed(), 3),
+                restore_bytes_per_second=bytes_per_second(restored_bytes, timer.phases.get('load')),
+                restore_phase_timings=timer.as_dict(),
+            )
 
+        logger.info(f"Restore took {timer.elapsed():.1f}s ({format_timings(timer.as_dict())})")
+        logger.info(f"Restored {restored_rows} rows ({restored_bytes / (1024 * 1024):.1f} MB) "
+                    f"from {len(chain_files)} backup file(s); {record_count} records in monitoring_energylog")
         logger.info("Energy logs restored successfully")
-        return True, success_message
+        if selection:
+            return True, (f"{restored_rows} energy logs restored from {backup_filename} "
+                          f"({record_count} records in total)")
+        return True, f"Energy logs successfully restored from {backup_filename} ({record_count} records)"
+
+    except RestoreCancelled:
+        logger.warning(f"Restore from {backup_filename} cancelled after {timer.elapsed():.1f}s; "
+                       f"the energy logs were left unchanged")
+        return False, "Restore cancelled, energy logs left unchanged"
 
     except Exception as e:
         error_msg = f"Exception during database restore: {str(e)}"
@@ -502,6 +1162,202 @@ def restore_database(backup_filename):
         return False, error_msg
 
 
+def rollback_restore():
+    """
+    Swap the energy log table replaced by the last full restore back in
+
+    The restored table becomes the kept one, so calling it again redoes the restore.
+
+    Returns:
+        tuple: (success, message)
+    """
+    table = EnergyLog._meta.db_table
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            swap_back(cursor, table)
+            record_count = reset_energylog_sequence(cursor)
+        with transaction.atomic(), connection.cursor() as cursor:
+            validate_referencing_keys(cursor, table)
+        logger.info(f"Rolled back the last restore ({record_count} records)")
+        return True, f"Previous energy logs restored ({record_count} records)"
+    except Exception as e:
+        error_msg = f"Exception during restore rollback: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+
+
+def live_digest_tree():
+    """Digest tree of the energy logs currently in the database (see ml/row_digest.py)"""
+    with connection.cursor() as cursor:
+        return build_tree(hour_digests(cursor, EnergyLog._meta.db_table, digest_columns(EnergyLog)))
+
+
+def diff_with_live(backup_log):
+    """
+    Find the hours whose energy logs differ between the database and a full backup
+
+    The live digest tree is computed by the server and compared with the one in the backup's
+    manifest, descending only into months and days that differ. Consecutive changed hours are
+    merged into windows that can be restored selectively.
+
+    Returns:
+        tuple: (report dict or None, message)
+    """
+    manifest = read_manifest(os.path.join(backups_dir, backup_log.backup_file))
+    if not manifest or not manifest.get('row_digests'):
+        return None, "Для цієї копії не збережено дайджестів записів"
+
+    backup_tree = manifest['row_digests']
+    if backup_tree.get('version') != DIGEST_VERSION:
+        return None, "Дайджести записів цієї копії обчислено старішою версією системи"
+    live_tree = live_digest_tree()
+    changed, compared = diff_trees(live_tree, backup_tree)
+    windows = [{'start': window['start'], 'end': window['end'], 'hours': window['hours'],
+                'live_rows': window['left_rows'], 'backup_rows': window['right_rows']}
+               for window in changed_windows(changed)]
+
+    logger.info(f"Diff of {backup_log.backup_file} with the live energy logs: {len(changed)} changed hours "
+                f"in {len(windows)} windows ({compared} tree nodes compared)")
+    report = {
+        'identical': not changed,
+        'windows': windows,
+        'changed_hours': len(changed),
+        'compared_nodes': compared,
+        'live_rows': live_tree['rows'],
+        'backup_rows': backup_tree['rows'],
+    }
+    if not changed:
+        return report, "Записи енергосистеми збігаються з резервною копією"
+    return report, f"Змінено {len(changed)} год. даних у {len(windows)} проміжках"
+
+
+def start_diff(backup_log, user=None):
+    """
+    Compare the live energy logs with a backup without waiting for the full-table scan
+
+    A diff of the backup still running is returned as it is; otherwise diff_with_live is run by a
+    detached process (see run_diff) and the returned BackupDiff stays RUNNING until it is done.
+
+    Returns:
+        BackupDiff: The diff of the backup
+    """
+    running_since = timezone.now() - timedelta(minutes=STALE_DIFF_MINUTES)
+    diff = BackupDiff.objects.filter(backup=backup_log, status='RUNNING', created_at__gte=running_since).first()
+    if diff:
+        return diff
+
+    diff = BackupDiff.objects.create(backup=backup_log, created_by=user)
+    log_file = os.path.join(logs_dir, 'backup_diff.log')
+    try:
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'run-diff', str(diff.id)],
+            stdout=open(log_file, "a"),
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            cwd=str(BASE_DIR)
+        )
+    except Exception as e:
+        logger.error(f"Error starting the diff with {backup_log.backup_file}: {str(e)}")
+        BackupDiff.objects.filter(id=diff.id).update(status='FAILED', message=f"Помилка запуску: {str(e)}"[:255],
+                                                      finished_at=timezone.now())
+        diff.refresh_from_db()
+    return diff
+
+
+def run_diff(diff_id):
+    """Run a diff started by start_diff and store its report"""
+    diff = BackupDiff.objects.select_related('backup').get(id=diff_id)
+    try:
+        report, message = diff_with_live(diff.backup)
+    except Exception as e:
+        logger.error(f"Error comparing {diff.backup.backup_file} with the live energy logs: {str(e)}")
+        BackupDiff.objects.filter(id=diff.id).update(status='FAILED', message=f"Помилка порівняння: {str(e)}"[:255],
+                                                      finished_at=timezone.now())
+        return False, str(e)
+
+    BackupDiff.objects.filter(id=diff.id).update(status='SUCCESS', report=report, message=message,
+                                                  finished_at=timezone.now())
+    return True, message
+
+
+def register_uploaded_backup(upload_path, original_name, sha256, user=None):
+    """
+    Register a dump uploaded into the backups directory as a full backup
+
+    Only single-file formats are accepted and the dump must contain the energy log data. The
+    manifest records the checksum computed during the upload; its table statistics are left to
+    the test restore of ml/verify_backups.py.
+
+    Args:
+        upload_path: Path of the uploaded file in the backups directory
+        original_name: File name on the uploader's side, which determines the format
+        sha256: Checksum of the uploaded bytes
+        user: User who uploaded the dump
+
+    Returns:
+        tuple: (success, message)
+    """
+    from ml.backup_coordinator import backup_lock
+
+    format_name = detect_format(original_name)
+    profile = BACKUP_FORMATS[format_name]
+    if not original_name.endswith(profile['extension']) or format_name == 'directory' or profile['kind'] == 'chunked':
+        os.remove(upload_path)
+        return False, f"Unsupported backup file type: {original_name}"
+
+    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S_%f')
+    backup_filename = f"energy_data_{timestamp}_upload{profile['extension']}"
+    backup_file = os.path.join(backups_dir, backup_filename)
+
+    # Under the lock, so the cleanup never sees the file before its backup log exists
+    with backup_lock():
+        os.replace(upload_path, backup_file)
+        try:
+            with open_backup(backup_file) as f:
+                has_data = find_copy_block(f, EnergyLog._meta.db_table) is not None
+        except Exception as e:
+            logger.error(f"Uploaded backup {original_name} cannot be read: {str(e)}")
+            has_data = False
+        if not has_data:
+            remove_backup_path(backup_file)
+            return False, f"No energy log data found in {original_name}"
+
+        file_size_kb = backup_size_kb(backup_file)
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'backup_file': backup_filename,
+            'backup_type': "FULL",
+            'backup_format': format_name,
+            'trigger_reason': "UPLOAD",
+            'created_at': timezone.now().isoformat(),
+            'uploaded_as': original_name,
+            'parent': None,
+            'watermark_id': None,
+            'exporter': 'upload',
+            'pg_dump_version': None,
+            'server_version': None,
+            'sha256': sha256,
+            'size_bytes': int(file_size_kb * 1024),
+            'tables': {},
+        }
+        write_manifest(backup_file, manifest)
+
+        backup_log = BackupLog.objects.create(
+            backup_file=backup_filename,
+            status="SUCCESS",
+            size_kb=file_size_kb,
+            trigger_reason="UPLOAD",
+            created_by=user,
+            backup_type="FULL",
+            backup_format=format_name,
+            **manifest_fields(manifest),
+        )
+
+    logger.info(f"Registered uploaded backup {original_name} as {backup_filename} (ID {backup_log.id}, "
+                f"{file_size_kb / 1024:.1f} MB)")
+    return True, backup_filename
+
+
 def delete_backup_file(backup_filename):
     """
     Delete a backup file
@@ -523,9 +1379,27 @@ def delete_backup_file(backup_filename):
         return False, error_msg
 
     try:
-        # Delete the file
-        os.remove(backup_file)
+        # Delete the file (or directory archive) with its manifest
+        discard_backup_path(backup_file)
         logger.info(f"Backup file deleted: {backup_file}")
+
+        # Increments chained onto this backup cannot be restored without it
+        backup_log = BackupLog.objects.filter(backup_file=backup_filename).first()
+        dependents = backup_log.get_dependents() if backup_log else []
+
+        # Backups opened for browsing are closed with their files
+        from ml.backup_mount import unmount_backup
+        for mounted in ([backup_log] if backup_log else []) + dependents:
+            unmount_backup(mounted)
+
+        for dependent in dependents:
+            dependent_file = os.path.join(backups_dir, dependent.backup_file)
+            if os.path.exists(dependent_file):
+                discard_backup_path(dependent_file)
+                logger.info(f"Dependent incremental backup file deleted: {dependent_file}")
+
+        if dependents:
+            return True, f"Backup file and {len(dependents)} dependent incremental backups deleted successfully"
         return True, "Backup file deleted successfully"
     except Exception as e:
         error_msg = f"Error deleting backup file: {str(e)}"
@@ -539,6 +1413,18 @@ if __name__ == "__main__":
     # If a specific reason is provided as a command line argument, use it
     if len(sys.argv) > 1 and sys.argv[1] == "scheduled":
         create_scheduled_backup()
+    elif len(sys.argv) > 1 and sys.argv[1] == "rollback-restore":
+        print(rollback_restore()[1])
+    elif len(sys.argv) > 2 and sys.argv[1] == "run-diff":
+        # Started by start_diff for the diff view
+        run_diff(int(sys.argv[2]))
+    elif len(sys.argv) > 2 and sys.argv[1] == "diff":
+        # What changed in the live energy logs since a backup, by hour windows
+        report, message = diff_with_live(BackupLog.objects.get(backup_file=sys.argv[2]))
+        print(message)
+        for window in (report or {}).get('windows', []):
+            print(f"  {window['start'].isoformat()} - {window['end'].isoformat()}: "
+                  f"{window['live_rows']} records now, {window['backup_rows']} in the backup")
     else:
         # Check the latest record and backup if needed
         backup_database()
\ No newline at end of file
@@ -0,0 +1,283 @@
+# ml/backup_formats.py
+
+import io
+import os
+import bz2
+import gzip
+import lzma
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+
+# Backup profiles: how pg_dump output is written and compressed
+#   native - pg_dump's own archive formats (custom -Fc with -Z, directory -Fd with parallel -j workers)
+#   stream - plain SQL from pg_dump stdout compressed by a standard library codec
+#   chunked - plain SQL split into deduplicated, content-addressed chunks (see ml/chunk_store.py);
+#             the backup file is only the recipe listing the chunks
+BACKUP_FORMATS = {
+    'plain': {'label': 'SQL без стиснення', 'extension': '.sql', 'kind': 'plain'},
+    'custom': {'label': 'pg_dump custom (-Fc)', 'extension': '.dump', 'kind': 'native', 'pg_format': 'c'},
+    'directory': {'label': 'pg_dump directory (-Fd, паралельно)', 'extension': '.dir', 'kind': 'native',
+                  'pg_format': 'd'},
+    'gzip': {'label': 'SQL + gzip', 'extension': '.sql.gz', 'kind': 'stream', 'opener': gzip.open},
+    'lzma': {'label': 'SQL + lzma (xz)', 'extension': '.sql.xz', 'kind': 'stream', 'opener': lzma.open},
+    'bz2': {'label': 'SQL + bzip2', 'extension': '.sql.bz2', 'kind': 'stream', 'opener': bz2.open},
+    'chunked': {'label': 'Дедупліковані фрагменти', 'extension': '.chunks', 'kind': 'chunked'},
+}
+
+# Size of the chunks piped from pg_dump into a stream codec
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def detect_format(path):
+    """Return the name of the backup format of a file from its extension"""
+    name = str(path)
+    # Longest extension first so that .sql.gz is not taken for .sql
+    for format_name, profile in sorted(BACKUP_FORMATS.items(), key=lambda item: -len(item[1]['extension'])):
+        if name.endswith(profile['extension']):
+            return format_name
+    return 'plain'
+
+
+def backup_file_patterns():
+    """Glob patterns matching backup files of every format"""
+    return [f"*{profile['extension']}" for profile in BACKUP_FORMATS.values()]
+
+
+def _codec_kwargs(format_name, level):
+    """Compression level argument of a standard library codec"""
+    if format_name == 'lzma':
+        return {'preset': min(max(level, 0), 9)}
+    return {'compresslevel': min(max(level, 1), 9)}
+
+
+def _connection_args(db_settings):
+    return [
+        '-h', db_settings['HOST'],
+        '-p', str(db_settings['PORT']),
+        '-U', db_settings['USER'],
+        '-d', db_settings['NAME'],
+    ]
+
+
+def _pg_env(db_settings):
+    return dict(os.environ, PGPASSWORD=db_settings['PASSWORD'])
+
+
+def run_dump(db_settings, backup_path, format_name='plain', level=6, jobs=2, extra_args=None, digest=None,
+             rate_limit=None, low_priority=False):
+    """
+    Dump the database to `backup_path` in the given format
+
+    Args:
+        db_settings: Django database settings (HOST, PORT, USER, NAME, PASSWORD)
+        backup_path: Target file (or directory for the directory format)
+        format_name: Name of a profile in BACKUP_FORMATS
+        level: Compression level (0-9)
+        jobs: Parallel workers for the directory format
+        extra_args: Additional pg_dump arguments
+        digest: Optional hashlib object fed with the bytes written to disk; single-file formats are
+            hashed while pg_dump streams, directory archives once pg_dump has finished
+        rate_limit: Optional cap on the dump stream in bytes per second (not for directory archives,
+            which pg_dump writes itself)
+        low_priority: Run pg_dump at low CPU and idle I/O priority
+
+    Returns:
+        tuple: (returncode, error output)
+    """
+    profile = BACKUP_FORMATS[format_name]
+    cmd = ['pg_dump'] + _connection_args(db_settings) + list(extra_args or [])
+
+    # pg_dump writes the file itself unless the output has to pass through a codec or a digest
+    writes_file = format_name == 'directory' or (profile['kind'] in ('plain', 'native') and digest is None
+                                                 and not rate_limit)
+
+    if profile['kind'] == 'native':
+        cmd += ['-F', profile['pg_format'], '-Z', str(level)]
+        if format_name == 'directory':
+            cmd += ['-j', str(max(jobs, 1))]
+    if writes_file:
+        cmd += ['-f', str(backup_path)]
+
+    if writes_file:
+        process = subprocess.Popen(cmd, env=_pg_env(db_settings), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if low_priority:
+            _lower_dump_priority(process)
+        stdout, stderr = process.communicate()
+        if digest is not None and process.returncode == 0:
+            from ml.backup_manifest import update_digest_from_path
+            update_digest_from_path(digest, backup_path)
+        return process.returncode, stderr.decode('utf-8')
+
+    # Dump on stdout, compressed, chunked and/or hashed while it is produced so the raw dump never
+    # touches the disk; stderr goes to a temporary file so a chatty pg_dump cannot block on a full pipe
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, env=_pg_env(db_settings), stdout=subprocess.PIPE, stderr=stderr)
+        if low_priority:
+            _lower_dump_priority(process)
+        with open_backup_writer(backup_path, format_name, level, digest, rate_limit) as target:
+            shutil.copyfileobj(process.stdout, target, STREAM_CHUNK_SIZE)
+        process.wait()
+        stderr.seek(0)
+        # A recipe of a failed dump must not reference chunks; they are collected as garbage
+        if process.returncode != 0 and profile['kind'] == 'chunked':
+            os.remove(backup_path)
+        return process.returncode, stderr.read().decode('utf-8')
+
+
+def _lower_dump_priority(process):
+    from ml.backup_throttle import lower_priority
+    lower_priority(process.pid)
+
+
+@contextmanager
+def open_backup_writer(backup_path, format_name='plain', level=6, digest=None, rate_limit=None):
+    """
+    Binary writer producing a single-file backup in the given format
+
+    Stream formats are compressed and chunked backups are split into the chunk store as the data
+    is written. The digest, if given, is fed with the bytes written to disk; for chunked backups
+    with the recipe, which lists the SHA-256 of every chunk and so covers the whole dump. A rate
+    limit (bytes per second) caps the uncompressed stream written.
+    """
+    profile = BACKUP_FORMATS[format_name]
+    if format_name == 'directory':
+        raise ValueError("Directory archives can only be written by pg_dump")
+
+    if profile['kind'] == 'chunked':
+        from ml.chunk_store import ChunkWriter
+        with ChunkWriter(backup_path, level) as target:
+            yield _throttled(target, rate_limit)
+        if digest is not None:
+            from ml.backup_manifest import update_digest_from_path
+            update_digest_from_path(digest, backup_path)
+        return
+
+    with open(backup_path, 'wb') as raw:
+        if digest is not None:
+            from ml.backup_manifest import HashingWriter
+            raw = HashingWriter(raw, digest)
+        if profile['kind'] == 'stream':
+            with profile['opener'](raw, 'wb', **_codec_kwargs(format_name, level)) as target:
+                yield _throttled(target, rate_limit)
+        else:
+            yield _throttled(raw, rate_limit)
+
+
+def _throttled(target, rate_limit):
+    if not rate_limit:
+        return target
+    from ml.backup_throttle import ThrottledWriter
+    return ThrottledWriter(target, rate_limit)
+
+
+class _RestoreOutput(io.TextIOWrapper):
+    """Text stream over the stdout of pg_restore that waits for the process when closed"""
+
+    def __init__(self, process, stderr):
+        super().__init__(process.stdout, encoding='utf-8')
+        self.process = process
+        self.stderr = stderr
+
+    def close(self):
+        if self.closed:
+            return
+        # Readers may stop early (e.g. after the COPY block they need); pg_restore is then stopped
+        stopped_early = self.process.poll() is None
+        super().close()
+        if stopped_early:
+            self.process.terminate()
+        self.process.wait()
+        self.stderr.seek(0)
+        error_output = self.stderr.read().decode('utf-8')
+        self.stderr.close()
+        if self.process.returncode != 0 and not stopped_early:
+            raise RuntimeError(f"pg_restore failed: {error_output}")
+
+
+def open_backup(path, mode='rt'):
+    """
+    Open a backup file of any format as a stream of plain SQL
+
+    Stream codecs are decompressed on the fly; custom and directory archives are converted to a
+    SQL script by `pg_restore -f -`; chunked backups are reassembled from their chunks. Only plain
+    and stream formats can be opened for writing.
+    """
+    format_name = detect_format(path)
+    profile = BACKUP_FORMATS[format_name]
+
+    if profile['kind'] == 'stream':
+        return profile['opener'](path, mode)
+
+    if profile['kind'] == 'chunked':
+        if 'r' not in mode:
+            raise ValueError("Chunked backups can only be written through run_dump")
+        from ml.chunk_store import open_recipe
+        return open_recipe(path, mode)
+
+    if profile['kind'] == 'native':
+        if 'r' not in mode:
+            raise ValueError(f"Backups in the {format_name} format can only be written by pg_dump")
+        stderr = tempfile.TemporaryFile()
+        process = subprocess.Popen(['pg_restore', '-f', '-', str(path)], stdout=subprocess.PIPE, stderr=stderr)
+        return _RestoreOutput(process, stderr)
+
+    return open(path, mode.replace('t', ''))
+
+
+def backup_size_kb(path):
+    """Size of a backup on disk in KB (directory archives are summed, chunked backups count their chunks)"""
+    if detect_format(path) == 'chunked':
+        from ml.chunk_store import recipe_stored_size
+        return (recipe_stored_size(path) + Path(path).stat().st_size) / 1024
+    path = Path(path)
+    if path.is_dir():
+        return sum(item.stat().st_size for item in path.rglob('*') if item.is_file()) / 1024
+    return path.stat().st_size / 1024
+
+
+def _fsync(path, flags=os.O_RDONLY):
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_backup_path(path):
+    """
+    Flush a backup to stable storage before it is recorded as successful
+
+    Covers every file of a directory archive and every chunk a chunked backup references, then the
+    directories holding them, so a crash right after the dump cannot leave a recorded backup with
+    missing or truncated files.
+    """
+    path = Path(path)
+    if path.is_dir():
+        files = [item for item in path.rglob('*') if item.is_file()]
+        directories = {path, path.parent} | {item.parent for item in files}
+    elif BACKUP_FORMATS[detect_format(path)]['kind'] == 'chunked':
+        from ml.chunk_store import chunk_path, chunks_dir, read_recipe
+        store = chunks_dir(path)
+        files = [path] + [chunk_path(store, chunk_hash) for chunk_hash in set(read_recipe(path))]
+        directories = {item.parent for item in files}
+    else:
+        files = [path]
+        directories = {path.parent}
+
+    for item in files:
+        _fsync(item)
+    # Directories cannot be opened for fsync on every platform
+    if hasattr(os, 'O_DIRECTORY'):
+        for directory in directories:
+            _fsync(directory, os.O_RDONLY | os.O_DIRECTORY)
+
+
+def remove_backup_path(path):
+    """Delete a backup file or directory archive"""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
@@ -0,0 +1,130 @@
+# ml/backup_manifest.py
+
+import json
+import hashlib
+import subprocess
+from pathlib import Path
+
+# Every backup gets a JSON manifest next to it: <backup file><MANIFEST_SUFFIX>
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def manifest_path(backup_path):
+    return Path(f"{backup_path}{MANIFEST_SUFFIX}")
+
+
+class HashingWriter:
+    """Binary file wrapper that feeds every byte written through a digest"""
+
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+
+def update_digest_from_path(digest, path):
+    """
+    Feed a backup file, or every file of a directory archive, through a digest
+
+    Directory archives are hashed file by file in name order, including each relative name,
+    so a renamed or missing table file changes the checksum.
+    """
+    path = Path(path)
+    files = sorted(item for item in path.rglob('*') if item.is_file()) if path.is_dir() else [path]
+    for item in files:
+        if path.is_dir():
+            digest.update(item.relative_to(path).as_posix().encode('utf-8') + b'\0')
+        with open(item, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    return digest
+
+
+def file_sha256(path):
+    return update_digest_from_path(hashlib.sha256(), path).hexdigest()
+
+
+def pg_dump_version():
+    """Version string of the installed pg_dump, or None if it cannot be run"""
+    try:
+        return subprocess.run(['pg_dump', '--version'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def table_stats(cursor, table, where='TRUE', params=None, schema='public', rows=None):
+    """
+    Row count and ID/timestamp bounds of the rows of a table matching `where`
+
+    Timestamp bounds are only collected for tables with a `timestamp` column. A row count already
+    known (e.g. counted while the table was streamed) spares the COUNT(*) scan.
+    """
+    cursor.execute("SELECT 1 FROM information_schema.columns "
+                   "WHERE table_schema = %s AND table_name = %s AND column_name = 'timestamp'", [schema, table])
+    has_timestamp = cursor.fetchone() is not None
+
+    columns = ("COUNT(*)" if rows is None else "NULL") + ", MIN(id), MAX(id)"
+    columns += ", MIN(timestamp), MAX(timestamp)" if has_timestamp else ""
+    cursor.execute(f"SELECT {columns} FROM {schema}.{table} WHERE {where}", params or [])
+    row = cursor.fetchone()
+
+    stats = {'rows': row[0] if rows is None else rows, 'min_id': row[1], 'max_id': row[2]}
+    if has_timestamp:
+        stats['min_timestamp'] = row[3].isoformat() if row[3] else None
+        stats['max_timestamp'] = row[4].isoformat() if row[4] else None
+    return stats
+
+
+def database_stats(cursor):
+    """Statistics of every table with an `id` column in the public schema (what a full pg_dump contains)"""
+    cursor.execute("SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+                   "JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = 'id' AND NOT a.attisdropped "
+                   "WHERE n.nspname = 'public' AND c.relkind = 'r' ORDER BY c.relname")
+    return {table: table_stats(cursor, table) for (table,) in cursor.fetchall()}
+
+
+def write_manifest(backup_path, manifest):
+    path = manifest_path(backup_path)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def read_manifest(backup_path):
+    """Manifest of a backup, or None for backups made before manifests existed"""
+    path = manifest_path(backup_path)
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def verify_checksum(backup_path, manifest=None):
+    """
+    Compare a backup with the SHA-256 recorded in its manifest
+
+    Returns:
+        tuple: (success, message)
+    """
+    manifest = manifest or read_manifest(backup_path)
+    if not manifest or not manifest.get('sha256'):
+        return False, "No checksum recorded for this backup"
+
+    actual = file_sha256(backup_path)
+    if actual != manifest['sha256']:
+        return False, f"Checksum mismatch: expected {manifest['sha256']}, got {actual}"
+
+    # The recipe of a chunked backup is intact; its chunks must be too
+    if manifest.get('backup_format') == 'chunked':
+        from ml.chunk_store import verify_recipe
+        return verify_recipe(backup_path)
+    return True, "Checksum matches"
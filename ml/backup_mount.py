@@ -0,0 +1,309 @@
+# ml/backup_mount.py
+
+import os
+import sys
+import time
+import django
+import logging
+import argparse
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import timedelta
+
+# Get the absolute path to the project directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Ensure the logs directory exists
+logs_dir = os.path.join(BASE_DIR, 'logs')
+os.makedirs(logs_dir, exist_ok=True)
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
+django.setup()
+
+from django.db import IntegrityError, ProgrammingError, connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from monitoring.models import EnergyLog, BackupLog, BackupMount, SystemSettings
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(logs_dir, 'backup.log')),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('backup')
+
+# Backups are mounted into schemas named <prefix><backup id>; backups of the database skip them
+MOUNT_SCHEMA_PREFIX = 'backup_mount_'
+
+# First key of the advisory lock taken while a backup is mounted, so each backup is loaded once
+MOUNT_LOCK_KEY = 5050
+
+DEFAULT_MOUNT_LIMIT_MB = 500
+
+# Seconds a newly started loader process may take to get its lock
+MOUNT_START_SECONDS = 60
+
+
+class MountGone(Exception):
+    """The schema of a mount was dropped (e.g. evicted) before it could be browsed"""
+
+
+def mount_schema(backup_log):
+    return f"{MOUNT_SCHEMA_PREFIX}{backup_log.id}"
+
+
+def schema_exists(cursor, schema):
+    cursor.execute("SELECT 1 FROM pg_namespace WHERE nspname = %s", [schema])
+    return cursor.fetchone() is not None
+
+
+def load_mount(cursor, backup_log, schema):
+    """
+    Load the energy logs of a backup chain into a new schema and index them like the live table
+
+    Runs inside the caller's transaction, so a failed load leaves no schema behind.
+
+    Returns:
+        int: Records loaded
+    """
+    from ml.backup_database import backups_dir, restore_copy_block
+    from ml.table_swap import list_indexes
+
+    table = EnergyLog._meta.db_table
+    target = f"{schema}.{table}"
+
+    cursor.execute(f"CREATE SCHEMA {schema}")
+    cursor.execute(f"CREATE TABLE {target} (LIKE public.{table} INCLUDING DEFAULTS)")
+
+    # Like a full restore: the first file is loaded, later increments replace the records they contain
+    chain_files = [link.backup_file for link in backup_log.get_chain()]
+    for position, chain_file in enumerate(chain_files):
+        restore_copy_block(cursor, os.path.join(backups_dir, chain_file), chain_file,
+                           mode='load' if position == 0 else 'merge', target=target)
+
+    # Indexes are built once the rows are in; names only need to be unique per schema
+    for name, is_unique, definition, constraint in list_indexes(cursor, table):
+        if constraint:
+            cursor.execute(f"ALTER TABLE {target} ADD CONSTRAINT {name} {constraint}")
+        else:
+            cursor.execute(f"CREATE {'UNIQUE ' if is_unique else ''}INDEX {name} ON {target} USING {definition}")
+    cursor.execute(f"ANALYZE {target}")
+
+    cursor.execute(f"SELECT COUNT(*) FROM {target}")
+    return cursor.fetchone()[0]
+
+
+def loader_running(mount):
+    """Whether a process is still loading a mount (or was started so recently it may not have its lock yet)"""
+    if mount.mounted_at >= timezone.now() - timedelta(seconds=MOUNT_START_SECONDS):
+        return True
+    with connection.cursor() as cursor:
+        # A two-key advisory lock shows as classid and objid with objsubid 2
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND granted "
+                       "AND classid::text::bigint = %s AND objid::text::bigint = %s AND objsubid = 2)",
+                       [MOUNT_LOCK_KEY, mount.backup_id])
+        return cursor.fetchone()[0]
+
+
+def start_mount(backup_log):
+    """
+    Make the energy logs of a backup available for browsing without waiting for them to load
+
+    A ready mount is marked as used and returned. Otherwise the backup is loaded by a detached
+    process (see mount_backup) and the returned mount stays LOADING until it is READY or FAILED.
+
+    Returns:
+        BackupMount: The mount of the backup
+    """
+    schema = mount_schema(backup_log)
+
+    mount = BackupMount.objects.filter(backup=backup_log).first()
+    if mount and mount.status == 'READY':
+        with connection.cursor() as cursor:
+            if schema_exists(cursor, schema):
+                BackupMount.objects.filter(id=mount.id).update(last_used_at=timezone.now())
+                return mount
+        # The schema was dropped outside of this module
+        mount.delete()
+    elif mount and (mount.status == 'FAILED' or loader_running(mount)):
+        return mount
+    elif mount:
+        logger.warning(f"Loading of {schema} stopped without finishing, starting it again")
+        mount.delete()
+
+    try:
+        with transaction.atomic():
+            mount = BackupMount.objects.create(backup=backup_log, schema=schema, status='LOADING')
+    except IntegrityError:
+        # Another request started the load first
+        return BackupMount.objects.get(backup=backup_log)
+
+    script_path = os.path.join(BASE_DIR, 'ml', 'backup_mount.py')
+    log_file = os.path.join(logs_dir, 'backup_mount.log')
+    subprocess.Popen(
+        [sys.executable, script_path, '--mount', str(backup_log.id)],
+        stdout=open(log_file, "a"),
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+        cwd=str(BASE_DIR)
+    )
+    logger.info(f"Started loading backup {backup_log.backup_file} into schema {schema}")
+    return mount
+
+
+def mount_backup(backup_log):
+    """
+    Load the energy logs of a backup into its mount schema (run by the process start_mount starts)
+
+    A backup already mounted is only marked as used. Newly mounted backups may push the mounts
+    over the space limit from the system settings; the least recently browsed ones are then
+    dropped. A failed load marks the mount as FAILED with the error.
+
+    Returns:
+        BackupMount: The mount of the backup
+    """
+    schema = mount_schema(backup_log)
+    mount = BackupMount.objects.get_or_create(backup=backup_log, defaults={'schema': schema})[0]
+
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            # A request browsing the backup sees the load running while this lock is held
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [MOUNT_LOCK_KEY, backup_log.id])
+
+            mount.refresh_from_db()
+            if mount.status == 'READY' and schema_exists(cursor, schema):
+                BackupMount.objects.filter(id=mount.id).update(last_used_at=timezone.now())
+                return mount
+
+            logger.info(f"Mounting backup {backup_log.backup_file} into schema {schema}")
+            started = time.monotonic()
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            record_count = load_mount(cursor, backup_log, schema)
+            cursor.execute("SELECT COALESCE(SUM(pg_total_relation_size(c.oid)), 0) FROM pg_class c "
+                           "JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = %s AND c.relkind = 'r'",
+                           [schema])
+            size_bytes = cursor.fetchone()[0]
+
+            mount.status = 'READY'
+            mount.error_message = None
+            mount.record_count = record_count
+            mount.size_bytes = size_bytes
+            mount.load_seconds = round(time.monotonic() - started, 3)
+            mount.last_used_at = timezone.now()
+            mount.save()
+    except Exception as e:
+        logger.error(f"Error mounting backup {backup_log.backup_file}: {str(e)}")
+        BackupMount.objects.filter(id=mount.id).update(status='FAILED', error_message=str(e)[:255])
+        raise
+
+    logger.info(f"Mounted {backup_log.backup_file}: {record_count} records, "
+                f"{size_bytes / (1024 * 1024):.1f} MB in {mount.load_seconds:.1f}s")
+    evict_mounts(keep=mount)
+    return mount
+
+
+def unmount(mount):
+    """Drop the schema of a mounted backup"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {mount.schema} CASCADE")
+        BackupMount.objects.filter(id=mount.id).delete()
+    logger.info(f"Unmounted {mount.schema}")
+
+
+def unmount_backup(backup_log):
+    """Drop the mount of a backup, if it has one (e.g. before the backup is deleted)"""
+    mount = BackupMount.objects.filter(backup=backup_log).first()
+    if mount:
+        unmount(mount)
+
+
+def drop_orphaned_mounts():
+    """
+    Drop mount schemas without a BackupMount, which goes when its backup log is deleted
+
+    Returns:
+        int: Schemas dropped
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nspname FROM pg_namespace WHERE starts_with(nspname, %s)", [MOUNT_SCHEMA_PREFIX])
+        orphaned = ({name for (name,) in cursor.fetchall()} -
+                    set(BackupMount.objects.values_list('schema', flat=True)))
+        for schema in orphaned:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            logger.info(f"Dropped orphaned mount schema {schema}")
+    return len(orphaned)
+
+
+def evict_mounts(keep=None):
+    """
+    Drop the least recently browsed mounts until the mounts fit in the space limit
+
+    The mount given as `keep` (the one just loaded) is never dropped. Schemas of deleted backups
+    are dropped first.
+
+    Returns:
+        int: Mounts dropped
+    """
+    drop_orphaned_mounts()
+    settings = SystemSettings.objects.first()
+    limit_bytes = (settings.backup_mount_limit_mb if settings else DEFAULT_MOUNT_LIMIT_MB) * 1024 * 1024
+
+    total = BackupMount.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    evicted = 0
+    # Mounts still loading hold no space yet and are left alone
+    mounts = BackupMount.objects.filter(status='READY').exclude(id=keep.id if keep else None)
+    for mount in mounts.order_by('last_used_at'):
+        if total <= limit_bytes:
+            break
+        unmount(mount)
+        total -= mount.size_bytes
+        evicted += 1
+
+    if total > limit_bytes:
+        logger.warning(f"Mounted backups take {total / (1024 * 1024):.1f} MB, over the limit of "
+                       f"{limit_bytes / (1024 * 1024):.0f} MB")
+    return evicted
+
+
+@contextmanager
+def browse_mount(mount):
+    """
+    Run queries against the energy logs of a mounted backup
+
+    Inside the block, unqualified table names resolve to the mount's schema first and to the
+    public schema for everything else (devices, users), within a read-only transaction.
+    Raises MountGone if the schema was dropped since the mount was looked up.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET TRANSACTION READ ONLY")
+        # Holding the table keeps an eviction from dropping it mid-request, which would otherwise
+        # let the search path fall through to the live table
+        try:
+            cursor.execute(f"LOCK TABLE {mount.schema}.{EnergyLog._meta.db_table} IN ACCESS SHARE MODE")
+        except ProgrammingError as e:
+            raise MountGone(str(e)) from e
+        cursor.execute(f"SET LOCAL search_path TO {mount.schema}, public")
+        yield mount
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mount backups for read-only browsing")
+    parser.add_argument("--mount", type=int, metavar="BACKUP_ID", help="Load the energy logs of a backup")
+    parser.add_argument("--unmount-all", action='store_true', help="Drop every mounted backup")
+
+    args = parser.parse_args()
+
+    if args.mount:
+        mount_backup(BackupLog.objects.get(id=args.mount, status='SUCCESS'))
+    if args.unmount_all:
+        for mount in BackupMount.objects.all():
+            unmount(mount)
+    for mount in BackupMount.objects.select_related('backup').order_by('-last_used_at'):
+        print(f"{mount.schema}: {mount.backup.backup_file}, {mount.record_count} records, "
+              f"{mount.size_bytes / (1024 * 1024):.1f} MB, last browsed {mount.last_used_at:%Y-%m-%d %H:%M}")
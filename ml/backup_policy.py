@@ -0,0 +1,60 @@
+# ml/backup_policy.py
+
+# Minutes between evaluations of the scheduled backup policy
+POLICY_CHECK_MINUTES = 5
+
+DEFAULT_CHANGE_THRESHOLD = 1000
+
+
+def change_counter(cursor, excluded_tables=(), schema='public'):
+    """
+    Rows inserted, updated and deleted in a schema's tables since the statistics were last reset
+
+    Read from the cumulative statistics (pg_stat_user_tables), so it costs nothing like a COUNT(*).
+    The counters are flushed by each session within about a second of its transaction ending.
+    """
+    cursor.execute("SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0) FROM pg_stat_user_tables "
+                   "WHERE schemaname = %s AND NOT (relname = ANY(%s))", [schema, list(excluded_tables)])
+    return int(cursor.fetchone()[0])
+
+
+def changes_since(counter, last_counter):
+    """Changes between two counter readings, or None if unknown (no reading, or statistics reset since)"""
+    if last_counter is None or counter < last_counter:
+        return None
+    return counter - last_counter
+
+
+def backup_decision(changes, hours_since, threshold, max_interval_hours):
+    """
+    Decide whether a scheduled backup is due
+
+    A backup runs once `threshold` changes have accumulated, or once `max_interval_hours` have
+    passed with at least one change. A backup without changes would repeat the previous one and
+    is skipped whatever the interval.
+
+    Args:
+        changes: Changes since the last full backup, or None if unknown
+        hours_since: Hours since the last full backup, or None without one
+        threshold: Changes that trigger a backup early (0 disables the trigger)
+        max_interval_hours: Longest time between backups while anything changes
+
+    Returns:
+        tuple: (due, reason)
+    """
+    if hours_since is None:
+        return True, "no full backup yet"
+    if changes is None:
+        # The counter was reset (e.g. server restart after a crash); back up on the interval to be safe
+        if hours_since >= max_interval_hours:
+            return True, f"{hours_since:.1f}h since the last backup, change count unknown"
+        return False, "change count unknown, waiting for the maximum interval"
+    if changes == 0:
+        return False, f"no changes in {hours_since:.1f}h since the last backup"
+    if threshold and changes >= threshold:
+        return True, f"{changes} changes since the last backup (threshold {threshold})"
+    if hours_since >= max_interval_hours:
+        return True, f"{hours_since:.1f}h since the last backup with {changes} changes"
+    if not threshold:
+        return False, f"{changes} changes in {hours_since:.1f}h, waiting for the maximum interval"
+    return False, f"{changes} changes in {hours_since:.1f}h, below the threshold of {threshold}"
@@ -0,0 +1,119 @@
+# ml/backup_retention.py
+
+from datetime import timedelta
+
+# Grandfather-father-son tiers, from the longest-lived to the most detailed. Under count or byte
+# pressure backups are admitted in this order, so hourly detail is given up before long-term history.
+TIERS = ('monthly', 'weekly', 'daily', 'hourly')
+
+# Backups that do not hold the whole database (anomaly snapshots) or whose contents are unknown
+# (uploads) never take a tier slot: they would push out the period's full backup. They are kept
+# as 'standalone' backups, within the age limit, after every tier pick.
+STANDALONE_TYPES = ('SNAPSHOT',)
+STANDALONE_REASONS = ('UPLOAD',)
+
+DEFAULT_POLICY = {
+    'hourly': 24,
+    'daily': 7,
+    'weekly': 4,
+    'monthly': 6,
+    'max_age_days': 30,  # older backups survive only as monthly (grandfather) backups
+    'max_count': 20,
+    'max_bytes': 0,  # 0 = no byte budget
+}
+
+
+def period_key(timestamp, tier):
+    """Bucket a backup time falls into for a tier"""
+    if tier == 'hourly':
+        return timestamp.date(), timestamp.hour
+    if tier == 'daily':
+        return timestamp.date()
+    if tier == 'weekly':
+        return timestamp.isocalendar()[:2]
+    return timestamp.year, timestamp.month
+
+
+def tier_picks(backups, tier, count):
+    """Newest backup of each of the `count` most recent buckets of a tier (backups newest first)"""
+    picks = []
+    seen = set()
+    for backup in backups:
+        key = period_key(backup['timestamp'], tier)
+        if key in seen:
+            continue
+        if len(seen) == count:
+            break
+        seen.add(key)
+        picks.append(backup)
+    return picks
+
+
+def is_standalone(backup):
+    """Whether a backup stays out of the tiers (see STANDALONE_TYPES)"""
+    return backup['backup_type'] in STANDALONE_TYPES or backup['trigger_reason'] in STANDALONE_REASONS
+
+
+def compute_keep_set(backups, policy, now):
+    """
+    Decide which backups to keep in one pass over their metadata
+
+    Each tier keeps the newest backup of its most recent periods. Backups are then admitted in
+    priority order (newest backup, then monthly, weekly, daily and hourly picks, newest first,
+    then standalone backups younger than the age limit) while the count and byte budgets allow.
+    An increment is admitted together with the chain it depends on, so a kept backup is always
+    restorable.
+
+    Args:
+        backups: Dicts with id, timestamp (local time, for the tier buckets), parent_id, size_bytes,
+            backup_type and trigger_reason of every successful backup
+        policy: Dict with the keys of DEFAULT_POLICY
+        now: Current time, for the age limit
+
+    Returns:
+        dict: {id of every backup to keep: tier (or 'latest'/'chain'/'standalone') that kept it}
+    """
+    backups = sorted(backups, key=lambda b: (b['timestamp'], b['id']), reverse=True)
+    if not backups:
+        return {}
+
+    by_id = {backup['id']: backup for backup in backups}
+    cutoff = now - timedelta(days=policy['max_age_days'])
+
+    tiered = [backup for backup in backups if not is_standalone(backup)]
+    standalone = [backup for backup in backups if is_standalone(backup)]
+
+    candidates = [((tiered or standalone)[0], 'latest')]
+    for tier in TIERS:
+        tier_backups = tiered if tier == 'monthly' else [b for b in tiered if b['timestamp'] >= cutoff]
+        candidates.extend((backup, tier) for backup in tier_picks(tier_backups, tier, policy[tier]))
+    candidates.extend((backup, 'standalone') for backup in standalone if backup['timestamp'] >= cutoff)
+
+    keep = {}
+    kept_bytes = 0
+    for backup, tier in candidates:
+        if backup['id'] in keep:
+            continue
+
+        # The backup and the part of its chain not kept yet
+        needed = []
+        link = backup
+        while link is not None and link['id'] not in keep:
+            needed.append(link)
+            link = by_id.get(link['parent_id']) if link['parent_id'] else None
+        if link is None and needed[-1]['parent_id']:
+            # The chain is broken (its full backup is gone), so the backup cannot be restored
+            continue
+
+        needed_bytes = sum(item['size_bytes'] for item in needed)
+        over_count = policy['max_count'] and len(keep) + len(needed) > policy['max_count']
+        over_bytes = policy['max_bytes'] and kept_bytes + needed_bytes > policy['max_bytes']
+        # The newest backup is always kept, whatever the budgets
+        if keep and (over_count or over_bytes):
+            continue
+
+        for item in needed:
+            keep[item['id']] = tier if item is backup else 'chain'
+        kept_bytes += needed_bytes
+
+    return keep
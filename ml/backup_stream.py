@@ -0,0 +1,168 @@
+# ml/backup_stream.py
+
+import time
+import logging
+
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger('backup')
+
+# How often a running restore reports its progress
+PROGRESS_EVERY_ROWS = 50000
+PROGRESS_EVERY_SECONDS = 5
+# How often the progress of streaming rows is passed to a RestoreListener
+LISTENER_EVERY_SECONDS = 0.5
+
+
+def find_copy_block(stream, table, schema='public'):
+    """
+    Advance a SQL dump stream to the data of a table's COPY block
+
+    Reads the stream line by line until the `COPY schema.table (...) FROM stdin;` header, so
+    everything before the block is skipped without being kept in memory.
+
+    Returns:
+        list or None: Column names of the block, or None if the stream has no block for the table
+    """
+    prefix = f"COPY {schema}.{table} ("
+    for line in stream:
+        if line.startswith(prefix):
+            header = line[len(prefix):line.index(')')]
+            return [name.strip().strip('"') for name in header.split(',')]
+    return None
+
+
+def iter_copy_rows(stream):
+    """Yield the raw data lines of the current COPY block, stopping at its `\\.` terminator"""
+    for line in stream:
+        if line.startswith('\\.'):
+            return
+        yield line
+
+
+def parse_copy_timestamp(value):
+    """
+    Parse a timestamptz as PostgreSQL writes it in COPY data, e.g. `2024-05-01 10:00:00+00`
+
+    datetime.fromisoformat only accepts the bare hour offset from Python 3.11 on.
+    """
+    timestamp = parse_datetime(value)
+    if timestamp is None:
+        raise ValueError(f"Invalid timestamp in COPY data: {value!r}")
+    return timestamp
+
+
+def make_row_filter(columns, start=None, end=None, min_id=None, max_id=None):
+    """
+    Build a predicate selecting COPY data lines of energy logs by time window and/or ID range
+
+    Bounds are inclusive; None leaves a side open. Returns None when nothing is restricted.
+    """
+    if start is None and end is None and min_id is None and max_id is None:
+        return None
+
+    id_index = columns.index('id')
+    timestamp_index = columns.index('timestamp')
+
+    def row_filter(line):
+        values = line.rstrip('\n').split('\t')
+        if min_id is not None or max_id is not None:
+            record_id = int(values[id_index])
+            if (min_id is not None and record_id < min_id) or (max_id is not None and record_id > max_id):
+                return False
+        if start is not None or end is not None:
+            timestamp = parse_copy_timestamp(values[timestamp_index])
+            if (start is not None and timestamp < start) or (end is not None and timestamp > end):
+                return False
+        return True
+
+    return row_filter
+
+
+class RestoreCancelled(Exception):
+    """Raised inside a restore to stop it; the restore transaction is rolled back"""
+
+
+class RestoreListener:
+    """
+    Receives the progress of a restore; this base class ignores it
+
+    `phase` is called as the restore enters each phase (see BackupLog.RESTORE_PHASES) and `update`
+    with the RestoreProgress of the file being streamed, about twice a second. Both may raise
+    RestoreCancelled to stop the restore.
+    """
+
+    def phase(self, name):
+        pass
+
+    def update(self, progress):
+        pass
+
+
+class RestoreProgress:
+    """Counts restored rows and bytes, logs them periodically and passes them to a listener"""
+
+    def __init__(self, label, listener=None):
+        self.label = label
+        self.listener = listener or RestoreListener()
+        self.rows = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.last_report_rows = 0
+        self.last_update = self.started
+
+    def add(self, line):
+        self.rows += 1
+        self.bytes += len(line.encode('utf-8'))
+        now = time.monotonic()
+        if now - self.last_update >= LISTENER_EVERY_SECONDS:
+            self.listener.update(self)
+            self.last_update = now
+        if self.rows - self.last_report_rows >= PROGRESS_EVERY_ROWS or now - self.last_report >= PROGRESS_EVERY_SECONDS:
+            self.report()
+            self.last_report = now
+            self.last_report_rows = self.rows
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        logger.info(f"{self.label}: {self.rows} rows, {self.bytes / (1024 * 1024):.1f} MB "
+                    f"in {elapsed:.1f}s")
+        self.listener.update(self)
+
+
+class CopyBlockReader:
+    """
+    File-like view of a COPY block for `cursor.copy_expert`
+
+    Serves the block's data lines in chunks as COPY asks for them, so a restore runs in
+    constant memory whatever the size of the dump. Lines rejected by `row_filter` are skipped.
+    """
+
+    def __init__(self, stream, progress=None, row_filter=None):
+        self.rows = iter_copy_rows(stream)
+        self.progress = progress
+        self.row_filter = row_filter
+        self.scanned = 0
+        self.buffer = ''
+        self.exhausted = False
+
+    def read(self, size=-1):
+        while not self.exhausted and (size < 0 or len(self.buffer) < size):
+            try:
+                line = next(self.rows)
+            except StopIteration:
+                self.exhausted = True
+                break
+            self.scanned += 1
+            if self.row_filter and not self.row_filter(line):
+                continue
+            if self.progress:
+                self.progress.add(line)
+            self.buffer += line
+
+        if size < 0:
+            chunk, self.buffer = self.buffer, ''
+        else:
+            chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
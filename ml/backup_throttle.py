@@ -0,0 +1,126 @@
+# ml/backup_throttle.py
+
+import time
+import logging
+import threading
+
+import psutil
+
+logger = logging.getLogger('backup')
+
+# Seconds between ingest latency probes while a dump runs
+PROBE_INTERVAL_SECONDS = 1.0
+# Probes taken right before a dump, as the baseline
+BASELINE_PROBES = 5
+
+
+class ThrottledWriter:
+    """
+    Binary writer passing data on at no more than `bytes_per_second`
+
+    A token bucket holding one second of budget: writes sleep once the budget is spent. Throttling
+    the dump stream slows the reads on the database server too, since the server only sends COPY
+    data (and pg_dump only reads it) as fast as it is consumed.
+    """
+
+    def __init__(self, target, bytes_per_second):
+        self.target = target
+        self.rate = bytes_per_second
+        self.allowance = bytes_per_second
+        self.last = time.monotonic()
+        self.waited = 0.0
+
+    def write(self, data):
+        now = time.monotonic()
+        self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+        self.last = now
+        self.allowance -= len(data)
+        if self.allowance < 0:
+            delay = -self.allowance / self.rate
+            time.sleep(delay)
+            self.waited += delay
+        return self.target.write(data)
+
+    def flush(self):
+        self.target.flush()
+
+
+def lower_priority(pid=None):
+    """
+    Run a process (or, on Linux, a single thread by its native ID) at low CPU and idle I/O priority
+
+    Priorities cannot be raised again without privileges, so only processes and threads that end
+    with the work should be lowered.
+    """
+    try:
+        process = psutil.Process(pid)
+        process.nice(10)
+        if hasattr(psutil, 'IOPRIO_CLASS_IDLE'):
+            process.ionice(psutil.IOPRIO_CLASS_IDLE)
+    except (psutil.Error, OSError) as e:
+        logger.warning(f"Could not lower the priority of {pid or 'this process'}: {str(e)}")
+
+
+def probe_ingest_latency(cursor, table):
+    """
+    Milliseconds of one ingest-like round trip: reading the newest record and committing a transaction
+
+    The commit has a transaction ID, so it waits for a WAL flush like every insert of a reading does.
+    """
+    started = time.monotonic()
+    cursor.execute(f"SELECT id FROM {table} ORDER BY id DESC LIMIT 1")
+    cursor.fetchone()
+    cursor.execute("SELECT txid_current()")
+    cursor.fetchone()
+    return (time.monotonic() - started) * 1000
+
+
+def percentile(samples, fraction=0.95):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def baseline_latency(cursor, table, probes=BASELINE_PROBES):
+    """Ingest latency samples (milliseconds) taken back to back"""
+    return [probe_ingest_latency(cursor, table) for _ in range(probes)]
+
+
+class LatencySampler(threading.Thread):
+    """
+    Probe ingest latency on a connection of its own at an interval until stopped
+
+    Used as a context manager around a dump; the samples are in `samples` afterwards.
+    """
+
+    def __init__(self, table, interval=PROBE_INTERVAL_SECONDS):
+        super().__init__(name='ingest-latency-sampler', daemon=True)
+        self.table = table
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def run(self):
+        from django.db import connection
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopped.wait(self.interval):
+                    self.samples.append(probe_ingest_latency(cursor, self.table))
+        except Exception as e:
+            logger.warning(f"Ingest latency sampling stopped: {str(e)}")
+        finally:
+            connection.close()
+
+    def stop(self):
+        """Stop sampling and return the samples in milliseconds"""
+        self.stopped.set()
+        self.join()
+        return self.samples
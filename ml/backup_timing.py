@@ -0,0 +1,37 @@
+# ml/backup_timing.py
+
+import time
+
+
+class PhaseTimer:
+    """
+    Wall-clock seconds spent in the consecutive phases of a backup or restore
+
+    Each `lap` closes a phase: the time since the previous lap (or since the timer started) is
+    added to the named phase, so phases entered more than once accumulate.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.last = self.started
+        self.phases = {}
+
+    def lap(self, name):
+        now = time.monotonic()
+        self.add(name, now - self.last)
+        self.last = now
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def as_dict(self):
+        return {name: round(seconds, 3) for name, seconds in self.phases.items()}
+
+
+def bytes_per_second(size_bytes, seconds):
+    if not size_bytes or not seconds or seconds <= 0:
+        return None
+    return round(size_bytes / seconds, 1)
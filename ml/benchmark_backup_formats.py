@@ -0,0 +1,178 @@
+# ml/benchmark_backup_formats.py
+
+import os
+import json
+import time
+import shutil
+import django
+import logging
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Get the absolute path to the project directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Ensure the logs directory exists
+logs_dir = os.path.join(BASE_DIR, 'logs')
+os.makedirs(logs_dir, exist_ok=True)
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
+django.setup()
+
+from django.conf import settings as django_settings
+from ml.backup_formats import BACKUP_FORMATS, run_dump, open_backup, backup_size_kb
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(logs_dir, 'backup.log')),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('backup')
+
+
+def restore_into(db_settings, backup_path, format_name, database, jobs):
+    """
+    Restore a backup into a scratch database, replacing its public schema
+
+    Returns:
+        tuple: (returncode, error output)
+    """
+    target = dict(db_settings, NAME=database)
+    env = dict(os.environ, PGPASSWORD=db_settings['PASSWORD'])
+    connection_args = ['-h', target['HOST'], '-p', str(target['PORT']), '-U', target['USER'], '-d', database]
+
+    reset = subprocess.run(
+        ['psql'] + connection_args + ['-q', '-c', 'DROP SCHEMA public CASCADE; CREATE SCHEMA public;'],
+        env=env, capture_output=True
+    )
+    if reset.returncode != 0:
+        return reset.returncode, reset.stderr.decode('utf-8')
+
+    if BACKUP_FORMATS[format_name]['kind'] == 'native':
+        process = subprocess.run(['pg_restore'] + connection_args + ['-j', str(max(jobs, 1)), str(backup_path)],
+                                 env=env, capture_output=True)
+        return process.returncode, process.stderr.decode('utf-8')
+
+    # Plain and stream formats: feed the (decompressed) SQL script to psql
+    process = subprocess.Popen(['psql'] + connection_args + ['-q', '-f', '-'], env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    with open_backup(backup_path, 'rb') as source:
+        shutil.copyfileobj(source, process.stdin)
+    process.stdin.close()
+    stderr = process.stderr.read()
+    process.wait()
+    return process.returncode, stderr.decode('utf-8')
+
+
+def decode_backup(backup_path):
+    """Read a backup back as plain SQL and return the number of bytes produced"""
+    total = 0
+    with open_backup(backup_path) as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), ''):
+            total += len(chunk.encode('utf-8'))
+    return total
+
+
+def benchmark_format(format_name, work_dir, level=6, jobs=2, restore_database=None):
+    """
+    Dump the database in one format and time the dump and the restore
+
+    Without `restore_database` the restore time only covers reading the backup back as SQL
+    (decompression or pg_restore), not applying it to a database.
+    """
+    db_settings = django_settings.DATABASES['default']
+    backup_path = os.path.join(work_dir, f"benchmark{BACKUP_FORMATS[format_name]['extension']}")
+
+    result = {'format': format_name, 'level': level, 'jobs': jobs}
+
+    started = time.perf_counter()
+    returncode, error_output = run_dump(db_settings, backup_path, format_name, level=level, jobs=jobs)
+    result['dump_seconds'] = round(time.perf_counter() - started, 3)
+    if returncode != 0:
+        result['error'] = error_output.strip()[:255]
+        return result
+
+    result['bytes'] = int(backup_size_kb(backup_path) * 1024)
+
+    started = time.perf_counter()
+    if restore_database:
+        returncode, error_output = restore_into(db_settings, backup_path, format_name, restore_database, jobs)
+        if returncode != 0:
+            result['error'] = error_output.strip()[:255]
+        result['restore_mode'] = 'database'
+    else:
+        result['sql_bytes'] = decode_backup(backup_path)
+        result['restore_mode'] = 'decode'
+    result['restore_seconds'] = round(time.perf_counter() - started, 3)
+
+    return result
+
+
+def run_benchmark(formats=None, level=6, jobs=2, restore_database=None):
+    """Benchmark every requested format and return the list of results"""
+    formats = formats or list(BACKUP_FORMATS)
+    work_dir = tempfile.mkdtemp(prefix='backup_benchmark_')
+    results = []
+
+    try:
+        for format_name in formats:
+            logger.info(f"Benchmarking backup format {format_name}")
+            results.append(benchmark_format(format_name, work_dir, level=level, jobs=jobs,
+                                            restore_database=restore_database))
+            # Keep only one backup on disk at a time
+            for item in Path(work_dir).iterdir():
+                if item.is_dir():
+                    shutil.rmtree(item)
+                else:
+                    item.unlink()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Relative size against the plain dump when it was measured
+    plain = next((r for r in results if r['format'] == 'plain' and 'bytes' in r), None)
+    for result in results:
+        if plain and 'bytes' in result:
+            result['ratio'] = round(result['bytes'] / plain['bytes'], 3) if plain['bytes'] else None
+
+    return results
+
+
+def print_results(results):
+    """Print a table of benchmark results"""
+    print(f"\n{'format':<10} {'bytes':>14} {'ratio':>7} {'dump s':>9} {'restore s':>10}  restore mode")
+    for result in results:
+        if 'error' in result and 'bytes' not in result:
+            print(f"{result['format']:<10} failed: {result['error']}")
+            continue
+        print(f"{result['format']:<10} {result['bytes']:>14} {result.get('ratio', '-'):>7} "
+              f"{result['dump_seconds']:>9} {result.get('restore_seconds', '-'):>10}  {result.get('restore_mode', '-')}"
+              f"{' (error: ' + result['error'] + ')' if 'error' in result else ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare backup formats: size, dump time and restore time")
+    parser.add_argument("--formats", nargs='+', choices=list(BACKUP_FORMATS), help="Formats to benchmark (default: all)")
+    parser.add_argument("--level", type=int, default=6, help="Compression level 0-9 (default: 6)")
+    parser.add_argument("--jobs", type=int, default=2, help="Parallel jobs for the directory format (default: 2)")
+    parser.add_argument("--restore-db", help="Scratch database to time full restores in (its public schema is replaced)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+
+    args = parser.parse_args()
+
+    if args.restore_db and args.restore_db == django_settings.DATABASES['default']['NAME']:
+        parser.error("--restore-db must not be the application database")
+
+    benchmark_results = run_benchmark(args.formats, level=args.level, jobs=args.jobs, restore_database=args.restore_db)
+    print_results(benchmark_results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(benchmark_results, f, indent=2)
+        print(f"\nResults written to {args.json}")
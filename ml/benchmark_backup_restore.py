@@ -0,0 +1,461 @@
+# ml/benchmark_backup_restore.py
+
+import os
+import json
+import time
+import django
+import logging
+import argparse
+import platform
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import psutil
+
+# Get the absolute path to the project directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Ensure the logs directory exists
+logs_dir = os.path.join(BASE_DIR, 'logs')
+os.makedirs(logs_dir, exist_ok=True)
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
+django.setup()
+
+from django.conf import settings as django_settings
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from monitoring.models import EnergyLog, BackupLog, SystemSettings
+from ml.backup_formats import BACKUP_FORMATS
+from ml.backup_database import (backup_database, backups_dir, collect_chunk_garbage, discard_backup_path,
+                                restore_database)
+from ml.ingest import bulk_ingest
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(logs_dir, 'backup.log')),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('backup')
+
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+MODES = ('FULL', 'SNAPSHOT', 'INCREMENTAL')
+EXPORTERS = ('NATIVE', 'PG_DUMP')
+
+# Readings per bulk loader call while seeding
+SEED_BATCH = 10_000
+# Records written between the full backup and the increment, as a share of the table
+INCREMENT_SHARE = 0.01
+# Seeded readings are one minute apart from this point on
+SERIES_START = datetime(2000, 1, 1)
+
+RSS_SAMPLE_SECONDS = 0.05
+LOCK_SAMPLE_SECONDS = 0.01
+# Lock modes that conflict with the ROW EXCLUSIVE lock every insert of a reading takes; waiting
+# requests count too, since inserts queue up behind them
+INGEST_BLOCKING_LOCKS = ['ShareLock', 'ShareRowExclusiveLock', 'ExclusiveLock', 'AccessExclusiveLock']
+
+# Metrics compared against a baseline, and the smallest baseline value worth comparing
+REGRESSION_METRICS = {
+    'dump_seconds': 0.5,
+    'restore_seconds': 0.5,
+    'bytes': 1024 * 1024,
+    'dump_peak_rss_mb': 10,
+    'restore_peak_rss_mb': 10,
+    'restore_lock_max_seconds': 0.05,
+}
+
+LOCAL_HOSTS = ('', 'localhost', '127.0.0.1', '::1')
+
+
+def is_local_database(db_settings):
+    """The benchmark replaces the energy logs, so it only runs against a server on this machine"""
+    host = db_settings.get('HOST') or ''
+    return host in LOCAL_HOSTS or host.startswith('/')
+
+
+class PeakMemorySampler(threading.Thread):
+    """
+    Sample the resident memory of this process and its children (pg_dump, pg_restore) until stopped
+
+    The database server's own memory is not included. Used as a context manager around a dump or
+    restore; the peak is in `peak_bytes` afterwards.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        super().__init__(name='peak-rss-sampler', daemon=True)
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak_bytes = 0
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        self.sample()
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stopped.set()
+        self.join()
+        self.sample()
+
+    def sample(self):
+        rss = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        self.peak_bytes = max(self.peak_bytes, rss)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+
+class LockMonitor(threading.Thread):
+    """
+    Measure how long other sessions hold (or queue for) locks on a table that would block ingestion
+
+    Polls pg_locks on a connection of its own. Used as a context manager; afterwards `longest` is the
+    longest continuous blocking period and `total` their sum, in seconds.
+    """
+
+    def __init__(self, table, interval=LOCK_SAMPLE_SECONDS):
+        super().__init__(name='lock-monitor', daemon=True)
+        self.table = table
+        self.interval = interval
+        self.longest = 0.0
+        self.total = 0.0
+        self.since = None
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stopped.set()
+        self.join()
+
+    def record(self, held, now):
+        if held and self.since is None:
+            self.since = now
+        elif not held and self.since is not None:
+            self.longest = max(self.longest, now - self.since)
+            self.total += now - self.since
+            self.since = None
+
+    def run(self):
+        from django.db import connection
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopped.is_set():
+                    cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_locks l "
+                                   "JOIN pg_class c ON c.oid = l.relation "
+                                   "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                                   "WHERE n.nspname = 'public' AND c.relname = %s "
+                                   "AND l.pid <> pg_backend_pid() AND l.mode = ANY(%s))",
+                                   [self.table, INGEST_BLOCKING_LOCKS])
+                    self.record(cursor.fetchone()[0], time.monotonic())
+                    self.stopped.wait(self.interval)
+        except Exception as e:
+            logger.warning(f"Lock monitoring stopped: {str(e)}")
+        finally:
+            self.record(False, time.monotonic())
+            connection.close()
+
+
+def measure(action, prefix):
+    """
+    Run an action under the memory and lock monitors
+
+    Returns:
+        tuple: (result of the action, dict of measurements with keys starting with `prefix`)
+    """
+    with PeakMemorySampler() as memory, LockMonitor(EnergyLog._meta.db_table) as locks:
+        started = time.perf_counter()
+        outcome = action()
+        seconds = time.perf_counter() - started
+
+    return outcome, {
+        f'{prefix}_seconds': round(seconds, 3),
+        f'{prefix}_peak_rss_mb': round(memory.peak_bytes / (1024 * 1024), 1),
+        f'{prefix}_lock_max_seconds': round(locks.longest, 3),
+        f'{prefix}_lock_total_seconds': round(locks.total, 3),
+    }
+
+
+def generate_readings(first_index, count):
+    """Simulated inverter readings one minute apart, continuing the series at `first_index`"""
+    start = timezone.make_aware(SERIES_START)
+    index = np.arange(first_index, first_index + count)
+    columns = {
+        'ac_output_voltage': np.random.normal(230, 5, count),
+        'dc_battery_voltage': np.random.normal(24, 1, count),
+        'dc_battery_current': np.random.normal(10, 2, count),
+        'load_power': np.abs(np.sin(index / 10.0) * 2500 + np.random.normal(0, 100, count)),
+        'temperature': np.random.normal(35, 2, count),
+    }
+    for position, minute in enumerate(index):
+        reading = {field: float(values[position]) for field, values in columns.items()}
+        reading['timestamp'] = start + timedelta(minutes=int(minute))
+        yield reading
+
+
+def reset_energy_logs():
+    """Empty the energy log table (and the backup trigger links pointing at it)"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {EnergyLog._meta.db_table} RESTART IDENTITY CASCADE")
+
+
+def seed_energy_logs(target):
+    """
+    Top the energy log table up to `target` rows with the bulk loader
+
+    Returns:
+        list: IDs of the inserted records
+    """
+    current = EnergyLog.objects.count()
+    ids = []
+    started = time.perf_counter()
+    while current < target:
+        batch = min(SEED_BATCH, target - current)
+        ids.extend(bulk_ingest(generate_readings(current, batch), derive_keys=False)['ids'])
+        current += batch
+        if current % 1_000_000 < batch:
+            logger.info(f"Seeded {current} of {target} energy logs")
+
+    if ids:
+        with connection.cursor() as cursor:
+            cursor.execute(f"VACUUM ANALYZE {EnergyLog._meta.db_table}")
+        logger.info(f"Seeded {len(ids)} energy logs in {time.perf_counter() - started:.1f}s")
+    return ids
+
+
+def configure(**fields):
+    SystemSettings.objects.update(**fields)
+
+
+def remove_backups(after_id):
+    """Delete the backups (files, manifests, chunk references and logs) created after a backup log ID"""
+    created = BackupLog.objects.filter(id__gt=after_id)
+    for backup_file in created.values_list('backup_file', flat=True):
+        path = os.path.join(backups_dir, backup_file)
+        if os.path.exists(path):
+            discard_backup_path(path)
+    created.delete()
+
+
+def run_case(size, mode, format_name, exporter):
+    """
+    Create one backup, restore it, and return the measurements
+
+    Full backups use the given format and exporter. A snapshot is taken around a record in the
+    middle of the table. An increment is chained onto a (not measured) plain full backup after
+    INCREMENT_SHARE new records; restoring it replays the whole chain.
+    """
+    result = {'size': size, 'mode': mode, 'format': format_name, 'exporter': exporter}
+    first_id = BackupLog.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    configure(backup_mode=mode, backup_exporter=exporter, backup_bandwidth_mb=0)
+
+    try:
+        if mode == 'FULL':
+            def dump():
+                return backup_database(force=True, backup_format=format_name)
+        elif mode == 'SNAPSHOT':
+            record_id = EnergyLog.objects.order_by('id').values_list('id', flat=True)[size // 2]
+
+            def dump():
+                return backup_database(record_id=record_id, reason='ANOMALY')
+        else:
+            if not backup_database(force=True, backup_format='plain'):
+                result['error'] = "Full backup for the chain failed"
+                return result
+            new_ids = seed_energy_logs(EnergyLog.objects.count() + max(int(size * INCREMENT_SHARE), 1))
+
+            def dump():
+                return backup_database(record_id=new_ids[-1], reason='ANOMALY')
+
+        performed, measurements = measure(dump, 'dump')
+        result.update(measurements)
+
+        backup_log = BackupLog.objects.filter(id__gt=first_id).order_by('-id').first()
+        if not performed or backup_log is None or backup_log.status != 'SUCCESS':
+            result['error'] = (backup_log.error_message if backup_log else None) or "Backup was not created"
+            return result
+        if backup_log.backup_type != mode:
+            result['error'] = f"Expected a {mode} backup, got {backup_log.backup_type}"
+            return result
+
+        result['format'] = backup_log.backup_format
+        result['rows'] = backup_log.record_count
+        result['bytes'] = int(backup_log.size_kb * 1024)
+
+        (success, message), measurements = measure(lambda: restore_database(backup_log.backup_file), 'restore')
+        result.update(measurements)
+        if not success:
+            result['error'] = message[:255]
+        return result
+
+    finally:
+        remove_backups(first_id)
+
+
+def benchmark_cases(formats, exporters, modes):
+    """(mode, format, exporter) of every case; pg_dump archive formats have no native exporter"""
+    cases = []
+    for mode in modes:
+        if mode != 'FULL':
+            cases.append((mode, 'gzip' if mode == 'SNAPSHOT' else 'plain', 'NATIVE'))
+            continue
+        for format_name in formats:
+            native = BACKUP_FORMATS[format_name]['kind'] == 'native'
+            for exporter in (['PG_DUMP'] if native else exporters):
+                cases.append((mode, format_name, exporter))
+    return cases
+
+
+def run_benchmark(sizes=None, formats=None, exporters=None, modes=None):
+    """
+    Benchmark every case at every data size, smallest first
+
+    The energy log table is emptied first and topped up to each size with the bulk loader.
+    The system settings changed for the cases are put back at the end.
+
+    Returns:
+        dict: Run metadata and the list of results
+    """
+    sizes = sorted(sizes or DEFAULT_SIZES)
+    cases = benchmark_cases(formats or list(BACKUP_FORMATS), exporters or list(EXPORTERS), modes or list(MODES))
+
+    settings = SystemSettings.objects.first() or SystemSettings.objects.create()
+    original = {field: getattr(settings, field) for field in ('backup_mode', 'backup_exporter', 'backup_bandwidth_mb')}
+
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW server_version")
+        server_version = cursor.fetchone()[0]
+
+    report = {
+        'version': RESULTS_VERSION,
+        'started_at': timezone.now().isoformat(),
+        'server_version': server_version,
+        'host': platform.node(),
+        'cpu_count': os.cpu_count(),
+        'memory_mb': psutil.virtual_memory().total // (1024 * 1024),
+        'results': [],
+    }
+
+    try:
+        reset_energy_logs()
+        for size in sizes:
+            seed_energy_logs(size)
+            for mode, format_name, exporter in cases:
+                logger.info(f"Benchmarking {mode} backup ({format_name}, {exporter}) of {size} energy logs")
+                result = run_case(size, mode, format_name, exporter)
+                if 'error' in result:
+                    logger.error(f"Benchmark case failed: {result['error']}")
+                report['results'].append(result)
+    finally:
+        configure(**original)
+        collect_chunk_garbage()
+
+    report['finished_at'] = timezone.now().isoformat()
+    return report
+
+
+def result_key(result):
+    return result['size'], result['mode'], result['format'], result['exporter']
+
+
+def find_regressions(results, baseline_results, tolerance):
+    """
+    Compare results with a baseline run
+
+    A metric regresses when it grew by more than `tolerance` (a fraction) over the baseline value;
+    values below the floors in REGRESSION_METRICS are too noisy to compare. A case that succeeded
+    in the baseline and fails now is a regression too.
+
+    Returns:
+        list: Messages describing each regression
+    """
+    baseline = {result_key(result): result for result in baseline_results}
+    regressions = []
+    for result in results:
+        before = baseline.get(result_key(result))
+        if before is None:
+            continue
+        label = "{} {} {} {}".format(*result_key(result))
+        if 'error' in result and 'error' not in before:
+            regressions.append(f"{label}: failed ({result['error']})")
+            continue
+        for metric, floor in REGRESSION_METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None or max(old, new) < floor:
+                continue
+            if new > max(old, floor) * (1 + tolerance):
+                regressions.append(f"{label}: {metric} {old} -> {new}")
+    return regressions
+
+
+def print_results(results):
+    """Print a table of benchmark results"""
+    print(f"\n{'size':>9} {'mode':<12} {'format':<8} {'exporter':<8} {'bytes':>13} {'dump s':>8} {'dump MB':>8} "
+          f"{'restore s':>9} {'rest. MB':>8} {'lock s':>7}")
+    for result in results:
+        print(f"{result['size']:>9} {result['mode']:<12} {result['format']:<8} {result['exporter']:<8} "
+              f"{result.get('bytes', '-'):>13} {result.get('dump_seconds', '-'):>8} "
+              f"{result.get('dump_peak_rss_mb', '-'):>8} {result.get('restore_seconds', '-'):>9} "
+              f"{result.get('restore_peak_rss_mb', '-'):>8} {result.get('restore_lock_max_seconds', '-'):>7}"
+              f"{'  (error: ' + result['error'] + ')' if 'error' in result else ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark backups and restores at several data sizes (replaces all energy logs)")
+    parser.add_argument("--sizes", type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Energy log counts to benchmark (default: 10000 1000000 10000000)")
+    parser.add_argument("--formats", nargs='+', choices=list(BACKUP_FORMATS),
+                        help="Formats of full backups (default: all)")
+    parser.add_argument("--exporters", nargs='+', choices=EXPORTERS, help="Exporters of full backups (default: both)")
+    parser.add_argument("--modes", nargs='+', choices=MODES, help="Backup modes (default: all)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run; exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed growth of a metric over the baseline (default: 0.25)")
+    parser.add_argument("--yes", action='store_true', help="Confirm that all energy logs may be deleted")
+
+    args = parser.parse_args()
+
+    if not is_local_database(django_settings.DATABASES['default']):
+        parser.error("The benchmark only runs against a local PostgreSQL server")
+    if not args.yes:
+        parser.error("The benchmark deletes all energy logs; run it against a scratch database with --yes")
+
+    benchmark_report = run_benchmark(args.sizes, args.formats, args.exporters, args.modes)
+    print_results(benchmark_report['results'])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(benchmark_report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline_report = json.load(f)
+        found = find_regressions(benchmark_report['results'], baseline_report['results'], args.tolerance)
+        for regression in found:
+            print(f"Regression: {regression}")
+        if found:
+            raise SystemExit(1)
+        print("\nNo regressions against the baseline")
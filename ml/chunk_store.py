@@ -0,0 +1,187 @@
+# ml/chunk_store.py
+
+import io
+import os
+import gzip
+import json
+import zlib
+import hashlib
+from pathlib import Path
+
+# Chunks live in a store next to the recipe files that reference them
+CHUNKS_DIR_NAME = 'chunks'
+RECIPE_VERSION = 1
+
+# Content-defined chunking on line boundaries: a chunk ends after a line whose CRC matches the
+# boundary mask, so boundaries move with the content and an appended row only changes the last chunk
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+BOUNDARY_MASK = 0x3FF  # about one boundary every 1024 lines past the minimum size
+
+
+def chunks_dir(recipe_path):
+    return Path(recipe_path).parent / CHUNKS_DIR_NAME
+
+
+def chunk_path(store, chunk_hash):
+    return Path(store) / chunk_hash[:2] / f"{chunk_hash}.gz"
+
+
+class ChunkWriter:
+    """
+    Binary writer storing what is written to it as deduplicated chunks
+
+    Each chunk is stored once, gzip-compressed, under the SHA-256 of its content; chunks already
+    in the store are only referenced. The recipe listing the chunks is written when the writer is
+    closed without an error, so a failed dump never leaves a recipe behind.
+    """
+
+    def __init__(self, recipe_path, level=6):
+        self.recipe_path = recipe_path
+        self.store = chunks_dir(recipe_path)
+        self.level = min(max(level, 1), 9)
+        self.chunks = []
+        self.lines = []
+        self.size = 0
+        self.partial = b''
+        self.stats = {'chunks': 0, 'new_chunks': 0, 'bytes': 0, 'new_stored_bytes': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def write(self, data):
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self._add_line(line + b'\n')
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.partial:
+            self._add_line(self.partial)
+            self.partial = b''
+        if self.lines:
+            self._store_chunk()
+        with open(self.recipe_path, 'w') as f:
+            json.dump({'version': RECIPE_VERSION, 'chunks': self.chunks}, f)
+
+    def _add_line(self, line):
+        self.lines.append(line)
+        self.size += len(line)
+        at_boundary = self.size >= MIN_CHUNK_SIZE and (zlib.crc32(line) & BOUNDARY_MASK) == 0
+        if at_boundary or self.size >= MAX_CHUNK_SIZE:
+            self._store_chunk()
+
+    def _store_chunk(self):
+        data = b''.join(self.lines)
+        self.lines = []
+        self.size = 0
+
+        chunk_hash = hashlib.sha256(data).hexdigest()
+        self.chunks.append([chunk_hash, len(data)])
+        self.stats['chunks'] += 1
+        self.stats['bytes'] += len(data)
+
+        path = chunk_path(self.store, chunk_hash)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write under a temporary name so an interrupted dump never leaves a truncated chunk
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=self.level))
+        os.replace(temp_path, path)
+        self.stats['new_chunks'] += 1
+        self.stats['new_stored_bytes'] += path.stat().st_size
+
+
+def store_chunks(stream, recipe_path, level=6):
+    """
+    Store a binary stream as deduplicated chunks and write the recipe listing them
+
+    Returns:
+        dict: Chunk statistics (total, new, logical and new stored bytes)
+    """
+    with ChunkWriter(recipe_path, level) as writer:
+        for data in stream:
+            writer.write(data)
+    return writer.stats
+
+
+def read_recipe(recipe_path):
+    """Chunk hashes of a recipe, in stream order"""
+    with open(recipe_path) as f:
+        return [chunk_hash for chunk_hash, _ in json.load(f)['chunks']]
+
+
+def recipe_stored_size(recipe_path):
+    """Bytes on disk of the distinct chunks a recipe references"""
+    store = chunks_dir(recipe_path)
+    return sum(chunk_path(store, chunk_hash).stat().st_size for chunk_hash in set(read_recipe(recipe_path)))
+
+
+class ChunkReader(io.RawIOBase):
+    """Binary stream reassembling a recipe's chunks in order, holding one chunk in memory"""
+
+    def __init__(self, recipe_path):
+        self.store = chunks_dir(recipe_path)
+        self.hashes = iter(read_recipe(recipe_path))
+        self.buffer = b''
+        self.offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while self.offset >= len(self.buffer):
+            chunk_hash = next(self.hashes, None)
+            if chunk_hash is None:
+                return 0
+            with open(chunk_path(self.store, chunk_hash), 'rb') as f:
+                self.buffer = gzip.decompress(f.read())
+            self.offset = 0
+        size = min(len(target), len(self.buffer) - self.offset)
+        target[:size] = self.buffer[self.offset:self.offset + size]
+        self.offset += size
+        return size
+
+
+def open_recipe(recipe_path, mode='rt'):
+    stream = io.BufferedReader(ChunkReader(recipe_path), buffer_size=1024 * 1024)
+    if 'b' in mode:
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def verify_recipe(recipe_path):
+    """
+    Check that every chunk of a recipe is present and matches its hash
+
+    Returns:
+        tuple: (success, message)
+    """
+    store = chunks_dir(recipe_path)
+    for chunk_hash in set(read_recipe(recipe_path)):
+        path = chunk_path(store, chunk_hash)
+        if not path.exists():
+            return False, f"Missing chunk {chunk_hash}"
+        with open(path, 'rb') as f:
+            if hashlib.sha256(gzip.decompress(f.read())).hexdigest() != chunk_hash:
+                return False, f"Corrupted chunk {chunk_hash}"
+    return True, "All chunks present and intact"
+
+
+def list_stored_chunks(store):
+    """Hashes of the chunks on disk in a store"""
+    return {path.name[:-len('.gz')] for path in Path(store).glob('*/*.gz')}
+
+
+def remove_chunk(store, chunk_hash):
+    chunk_path(store, chunk_hash).unlink(missing_ok=True)
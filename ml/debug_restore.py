@@ -3,13 +3,49 @@
 
 import os
 import re
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from ml.backup_manifest import read_manifest, verify_checksum
+
+
+def show_manifest(backup_file, manifest, verify=False):
+    """Print what a backup contains from its manifest, without opening the dump"""
+
+    print(f"Manifest of backup file: {backup_file}")
+    print("-" * 50)
+    print(f"Type: {manifest['backup_type']}, format: {manifest['backup_format']}, "
+          f"created: {manifest['created_at']}")
+    print(f"pg_dump: {manifest['pg_dump_version'] or '-'}, server: {manifest['server_version']}")
+    if manifest.get('parent'):
+        print(f"Chained onto: {manifest['parent']}")
+    print(f"Size: {manifest['size_bytes']} bytes, SHA-256: {manifest['sha256']}")
+
+    for table, stats in manifest['tables'].items():
+        line = f"  {table}: {stats['rows']} rows, id {stats['min_id']} - {stats['max_id']}"
+        if 'min_timestamp' in stats:
+            line += f", {stats['min_timestamp']} - {stats['max_timestamp']}"
+        print(line)
+
+    if verify:
+        success, message = verify_checksum(backup_file, manifest)
+        print(f"\nChecksum: {message}")
+
+    print("-" * 50)
+
 
 def analyze_backup_file(backup_file):
     """Analyze a backup file to see what data it contains for monitoring_energylog"""
 
-    print(f"Analyzing backup file: {backup_file}")
+    # Backups made with a manifest are described without reading the dump
+    manifest = read_manifest(backup_file)
+    if manifest:
+        show_manifest(backup_file, manifest, verify='--verify' in sys.argv)
+        return
+
+    print(f"Analyzing backup file (no manifest): {backup_file}")
     print("-" * 50)
 
     try:
@@ -56,8 +92,9 @@ def analyze_backup_file(backup_file):
 
 # Usage:
 if __name__ == "__main__":
-    # Replace with your actual backup file path
-    backup_file = "../backups/energy_data_20250503_210056.sql"
+    # Pass the backup file path (add --verify to check it against the manifest checksum)
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    backup_file = paths[0] if paths else "../backups/energy_data_20250503_210056.sql"
     if os.path.exists(backup_file):
         analyze_backup_file(backup_file)
     else:
@@ -0,0 +1,197 @@
+# ml/ingest.py
+
+import os
+import csv
+import math
+import django
+import logging
+import argparse
+from datetime import timezone as dt_timezone
+from pathlib import Path
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Get the absolute path to the project directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Ensure the logs directory exists
+logs_dir = os.path.join(BASE_DIR, 'logs')
+os.makedirs(logs_dir, exist_ok=True)
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
+django.setup()
+
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+from monitoring.models import EnergyLog, Device
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(logs_dir, 'ingest.log')),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('ingest')
+
+METRIC_FIELDS = ['ac_output_voltage', 'dc_battery_voltage', 'dc_battery_current', 'load_power', 'temperature']
+
+# Raw INSERT bypasses model defaults, so every NOT NULL flag is written explicitly
+INSERT_COLUMNS = ['timestamp', 'device_id', 'ingest_key', *METRIC_FIELDS,
+                  'is_abnormal_prediction', 'is_anomaly', 'backup_triggered', 'is_manual', 'created_by_id']
+
+
+def make_ingest_key(device_id, timestamp):
+    """
+    Derive the idempotency key of a reading from its device and source timestamp
+
+    Timestamps are normalised to UTC so the same reading delivered with a different
+    offset still maps to the same key.
+    """
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return f"{device_id or '-'}@{timestamp.astimezone(dt_timezone.utc).isoformat()}"
+
+
+def _clean_value(value):
+    """Store NaN (sensor dropout) as NULL"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return float(value)
+
+
+def _build_row(reading, device_id, is_manual, user_id, derive_keys):
+    timestamp = reading.get('timestamp') or timezone.now()
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+
+    # A client-supplied key always wins over the derived one
+    ingest_key = reading.get('ingest_key')
+    if not ingest_key and derive_keys:
+        ingest_key = make_ingest_key(device_id, timestamp)
+
+    return (
+        timestamp,
+        device_id,
+        ingest_key or None,
+        *[_clean_value(reading.get(field)) for field in METRIC_FIELDS],
+        False,
+        False,
+        False,
+        is_manual,
+        user_id,
+    )
+
+
+def bulk_ingest(readings, device=None, is_manual=False, user=None, derive_keys=True, batch_size=1000):
+    """
+    Insert readings in batches, silently dropping ones that were already ingested
+
+    Every batch is one `INSERT ... ON CONFLICT (ingest_key) DO NOTHING RETURNING id`, so a
+    collector retrying after a timeout can resend the same readings without creating
+    duplicates. Readings without a key (derive_keys=False and no client key) are always inserted.
+
+    Args:
+        readings: Iterable of reading dicts (timestamp, metric fields, optional ingest_key)
+        device: Device the readings belong to
+        is_manual: Flag if these are manually created readings
+        user: User who created the readings
+        derive_keys: Derive a key from (device, timestamp) when the reading has none
+        batch_size: Number of rows per INSERT statement
+
+    Returns:
+        dict: received/inserted/duplicates counts and the IDs of the inserted logs
+    """
+    device_id = device.id if device else None
+    user_id = user.id if user else None
+
+    rows = [_build_row(reading, device_id, is_manual, user_id, derive_keys) for reading in readings]
+    if not rows:
+        return {'received': 0, 'inserted': 0, 'duplicates': 0, 'ids': []}
+
+    sql = (
+        f"INSERT INTO {EnergyLog._meta.db_table} ({', '.join(INSERT_COLUMNS)}) VALUES %s "
+        f"ON CONFLICT (ingest_key) DO NOTHING RETURNING id"
+    )
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # execute_values needs the underlying psycopg2 cursor; fetch=True collects RETURNING across pages
+            inserted = execute_values(cursor.cursor, sql, rows, page_size=batch_size, fetch=True)
+
+    ids = [row[0] for row in inserted]
+    result = {
+        'received': len(rows),
+        'inserted': len(ids),
+        'duplicates': len(rows) - len(ids),
+        'ids': ids,
+    }
+
+    if result['duplicates']:
+        logger.info(f"Dropped {result['duplicates']} duplicate readings out of {result['received']}")
+
+    return result
+
+
+def ingest_reading(reading, device=None, is_manual=False, user=None, derive_keys=True):
+    """
+    Insert a single reading idempotently
+
+    Returns:
+        int or None: ID of the new log, or None if the reading was already ingested
+    """
+    result = bulk_ingest([reading], device=device, is_manual=is_manual, user=user, derive_keys=derive_keys)
+    return result['ids'][0] if result['ids'] else None
+
+
+def read_csv_readings(csv_file):
+    """
+    Stream readings out of a CSV export with a header row
+
+    The CSV must contain a `timestamp` column (ISO format) and the metric columns;
+    an optional `ingest_key` column carries client-supplied idempotency keys.
+    """
+    with open(csv_file, newline='') as f:
+        for row in csv.DictReader(f):
+            reading = {field: float(row[field]) if row.get(field) not in (None, '', '\\N') else None
+                       for field in METRIC_FIELDS}
+            # Exports written by PostgreSQL carry hour-only offsets (`+00`), which fromisoformat
+            # rejects before Python 3.11
+            timestamp = parse_datetime(row['timestamp'])
+            if timestamp is None:
+                raise ValueError(f"Invalid timestamp in CSV: {row['timestamp']!r}")
+            if timezone.is_naive(timestamp):
+                timestamp = timezone.make_aware(timestamp)
+            reading['timestamp'] = timestamp
+            if row.get('ingest_key'):
+                reading['ingest_key'] = row['ingest_key']
+            yield reading
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Idempotently load readings from a CSV export")
+    parser.add_argument("csv", help="CSV file (timestamp + metric columns, optional ingest_key)")
+    parser.add_argument("--device", help="Serial number of the device the readings come from")
+    parser.add_argument("--no-derive-keys", action="store_true",
+                        help="Do not derive keys from (device, timestamp) for rows without ingest_key")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT (default: 1000)")
+
+    args = parser.parse_args()
+
+    ingest_device = None
+    if args.device:
+        ingest_device = Device.objects.get_or_create(serial_number=args.device, defaults={'name': args.device})[0]
+
+    ingest_result = bulk_ingest(
+        read_csv_readings(args.csv),
+        device=ingest_device,
+        derive_keys=not args.no_derive_keys,
+        batch_size=args.batch_size
+    )
+
+    print(f"Received: {ingest_result['received']}, inserted: {ingest_result['inserted']}, "
+          f"duplicates dropped: {ingest_result['duplicates']}")
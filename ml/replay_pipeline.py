@@ -0,0 +1,336 @@
+# ml/replay_pipeline.py
+
+import os
+import json
+import time
+import threading
+import django
+import logging
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.utils import timezone
+
+# Get the absolute path to the project directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Ensure the logs directory exists
+logs_dir = os.path.join(BASE_DIR, 'logs')
+os.makedirs(logs_dir, exist_ok=True)
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
+django.setup()
+
+from django.db import connection
+from django.db.models import Max, Sum
+from monitoring.models import EnergyLog, BackupLog, Device
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(logs_dir, 'replay.log')),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('replay')
+
+METRIC_FIELDS = ['ac_output_voltage', 'dc_battery_voltage', 'dc_battery_current', 'load_power', 'temperature']
+STAGES = ['ingest', 'score', 'backup', 'total']
+
+
+def _parse_value(value):
+    """Convert a raw text field (COPY or CSV) to float, treating empty and \\N as missing"""
+    if value is None or value in ('', '\\N'):
+        return None
+    return float(value)
+
+
+def read_backup_readings(backup_file):
+    """
+    Stream readings out of the monitoring_energylog COPY block of a backup or snapshot
+
+    Args:
+        backup_file: Path to a backup file of any format (see ml/backup_formats.py)
+
+    Yields:
+        dict: timestamp plus the metric fields of every recorded row
+    """
+    from ml.backup_formats import open_backup
+    from ml.backup_stream import find_copy_block, iter_copy_rows, parse_copy_timestamp
+
+    with open_backup(backup_file) as f:
+        columns = find_copy_block(f, EnergyLog._meta.db_table)
+        if columns is None:
+            raise ValueError(f"No energy log data found in backup file {backup_file}")
+
+        for line in iter_copy_rows(f):
+            values = dict(zip(columns, line.rstrip('\n').split('\t')))
+            reading = {field: _parse_value(values.get(field)) for field in METRIC_FIELDS}
+            reading['timestamp'] = parse_copy_timestamp(values['timestamp'])
+            yield reading
+
+
+def synthetic_readings(count, interval_minutes=15, seed=None, scenario='realistic'):
+    """
+    Generate a synthetic stream of readings from a ready-made scenario (see ml/scenarios.py)
+
+    Args:
+        count: Number of readings
+        interval_minutes: Spacing between readings in recorded time
+        seed: Seed for reproducible runs
+        scenario: Name of the scenario
+    """
+    from ml.scenarios import get_scenario, iter_readings
+
+    frame = get_scenario(scenario, interval_minutes=interval_minutes, seed=seed).generate(count)
+    return iter_readings(frame)
+
+
+class ReplayStats:
+    """Thread-safe collector of per-stage latencies and pipeline outcomes"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {stage: [] for stage in STAGES}
+        self.schedule_lag = []
+        self.processed = 0
+        self.anomalies = 0
+        self.backups_triggered = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    def record(self, timings, lag, is_anomalous, backup_requested):
+        with self.lock:
+            for stage, seconds in timings.items():
+                self.latencies[stage].append(seconds)
+            self.schedule_lag.append(lag)
+            self.processed += 1
+            self.anomalies += int(is_anomalous)
+            self.backups_triggered += int(backup_requested)
+
+    def record_duplicate(self):
+        with self.lock:
+            self.duplicates += 1
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+
+def _percentiles(values):
+    """Summarise a list of durations (seconds) as milliseconds"""
+    if not values:
+        return None
+    data = np.array(values) * 1000
+    return {
+        'count': len(values),
+        'p50_ms': round(float(np.percentile(data, 50)), 2),
+        'p95_ms': round(float(np.percentile(data, 95)), 2),
+        'p99_ms': round(float(np.percentile(data, 99)), 2),
+        'max_ms': round(float(data.max()), 2),
+    }
+
+
+def process_reading(reading, due_at, stats, device=None, keep_timestamps=False):
+    """
+    Drive a single reading through ingest -> apply_models_to_record -> check_and_backup_if_needed
+    """
+    from ml.apply_models_to_record import apply_models_to_record
+    from ml.backup_database import check_and_backup_if_needed
+    from ml.ingest import ingest_reading
+
+    lag = max(0.0, time.monotonic() - due_at)
+    timings = {}
+
+    try:
+        started = time.perf_counter()
+        # Readings go through the raw INSERT of the ingest path: EnergyLog.timestamp is auto_now_add,
+        # so an ORM create would replace the recorded timestamp with the current time
+        if keep_timestamps:
+            # Recorded timestamps make the replay idempotent: re-running it drops already ingested readings
+            log_id = ingest_reading(reading, device=device)
+        else:
+            log_id = ingest_reading({**reading, 'timestamp': timezone.now()}, device=device, derive_keys=False)
+        timings['ingest'] = time.perf_counter() - started
+
+        if log_id is None:
+            stats.record_duplicate()
+            return
+
+        stage_started = time.perf_counter()
+        apply_models_to_record(log_id, trigger_backup=False)
+        timings['score'] = time.perf_counter() - stage_started
+
+        stage_started = time.perf_counter()
+        backup_requested = check_and_backup_if_needed(log_id)
+        timings['backup'] = time.perf_counter() - stage_started
+
+        timings['total'] = time.perf_counter() - started
+
+        log = EnergyLog.objects.only('is_anomaly', 'is_abnormal_prediction').get(id=log_id)
+        stats.record(timings, lag, log.is_anomaly or log.is_abnormal_prediction, backup_requested)
+
+    except Exception as e:
+        logger.error(f"Error replaying reading {reading.get('timestamp')}: {str(e)}")
+        stats.record_error()
+    finally:
+        # Worker threads hold their own connections; give them back between readings
+        connection.close()
+
+
+def run_replay(readings, rate=100.0, concurrency=4, limit=None, device=None, keep_timestamps=False):
+    """
+    Replay a stream of readings through the pipeline with time compression
+
+    Args:
+        readings: Iterable of reading dicts (timestamp + metric fields), ordered by timestamp
+        rate: Time compression factor (100 = 100x real time, 0 = as fast as possible)
+        concurrency: Number of worker threads driving the pipeline
+        limit: Stop after this many readings
+        device: Device to attribute replayed readings to
+        keep_timestamps: Insert the recorded timestamps instead of the replay time
+
+    Returns:
+        dict: Report with throughput, per-stage latency percentiles and backup counts
+    """
+    stats = ReplayStats()
+    last_backup_id = BackupLog.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    backups_before = BackupLog.objects.count()
+    successful_before = BackupLog.objects.filter(status='SUCCESS').count()
+
+    logger.info(f"Starting replay at {rate or 'max'}x with concurrency {concurrency}")
+
+    first_timestamp = None
+    submitted = 0
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for reading in readings:
+            if limit and submitted >= limit:
+                break
+
+            if first_timestamp is None:
+                first_timestamp = reading['timestamp']
+
+            # Compress recorded time by the rate multiplier
+            offset = (reading['timestamp'] - first_timestamp).total_seconds() / rate if rate else 0
+            due_at = started + offset
+            delay = due_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            executor.submit(process_reading, reading, due_at, stats, device, keep_timestamps)
+            submitted += 1
+
+    elapsed = time.monotonic() - started
+
+    # Backups are made by the background dumper; let it finish so the report counts them
+    from ml.backup_coordinator import wait_for_dumper
+    if not wait_for_dumper():
+        logger.warning("Backup dumper still running, the report may miss its latest backups")
+
+    backups_created = BackupLog.objects.count() - backups_before
+    successful_created = BackupLog.objects.filter(status='SUCCESS').count() - successful_before
+    coalesced_triggers = BackupLog.objects.filter(id__gt=last_backup_id).aggregate(
+        total=Sum('coalesced_triggers'))['total'] or 0
+
+    report = {
+        'rate_multiplier': rate,
+        'concurrency': concurrency,
+        'submitted': submitted,
+        'processed': stats.processed,
+        'duplicates': stats.duplicates,
+        'errors': stats.errors,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_per_second': round(stats.processed / elapsed, 2) if elapsed > 0 else None,
+        'anomalous_readings': stats.anomalies,
+        'backups_triggered': stats.backups_triggered,
+        'backups_created': backups_created,
+        'backups_successful': successful_created,
+        'backups_failed': backups_created - successful_created,
+        'coalesced_triggers': coalesced_triggers,
+        'schedule_lag': _percentiles(stats.schedule_lag),
+        'stages': {stage: _percentiles(values) for stage, values in stats.latencies.items()},
+    }
+
+    logger.info(f"Replay finished: {stats.processed} readings in {elapsed:.1f}s, "
+                f"{backups_created} backups created")
+    return report
+
+
+def print_report(report):
+    """Print a human-readable replay report"""
+    print("\nReplay summary:")
+    print(f"- Rate: {report['rate_multiplier'] or 'max'}x, concurrency: {report['concurrency']}")
+    print(f"- Processed: {report['processed']}/{report['submitted']} readings ({report['errors']} errors, "
+          f"{report['duplicates']} duplicates dropped)")
+    print(f"- Elapsed: {report['elapsed_seconds']}s, throughput: {report['throughput_per_second']} readings/s")
+    print(f"- Anomalous readings: {report['anomalous_readings']}")
+    print(f"- Backups: {report['backups_created']} created "
+          f"({report['backups_successful']} successful, {report['backups_failed']} failed, "
+          f"{report['coalesced_triggers']} triggers coalesced)")
+
+    print("\nLatency per stage (ms):")
+    for stage, summary in list(report['stages'].items()) + [('schedule lag', report['schedule_lag'])]:
+        if summary:
+            print(f"- {stage:<13} p50={summary['p50_ms']:<9} p95={summary['p95_ms']:<9} "
+                  f"p99={summary['p99_ms']:<9} max={summary['max_ms']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded or synthetic readings through the full pipeline")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--backup", help="Plain SQL backup file to replay energy logs from")
+    source.add_argument("--csv", help="CSV export to replay (timestamp + metric columns)")
+    source.add_argument("--synthetic", type=int, metavar="COUNT", help="Generate COUNT synthetic readings")
+    parser.add_argument("--interval", type=float, default=15,
+                        help="Recorded minutes between synthetic readings (default: 15)")
+    parser.add_argument("--seed", type=int, help="Seed for synthetic readings")
+    parser.add_argument("--scenario", default='realistic', help="Scenario for synthetic readings (default: realistic)")
+    parser.add_argument("--rate", type=float, default=100,
+                        help="Time compression factor, 0 for as fast as possible (default: 100)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Worker threads (default: 4)")
+    parser.add_argument("--limit", type=int, help="Maximum number of readings to replay")
+    parser.add_argument("--device", help="Serial number of the device to attribute readings to")
+    parser.add_argument("--keep-timestamps", action="store_true", help="Insert recorded timestamps")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+
+    args = parser.parse_args()
+
+    if args.backup:
+        # Accept both a path and a bare file name from the backups directory
+        backup_path = args.backup
+        if not os.path.exists(backup_path):
+            backup_path = os.path.join(BASE_DIR, 'backups', args.backup)
+        replay_source = read_backup_readings(backup_path)
+    elif args.csv:
+        from ml.ingest import read_csv_readings
+        replay_source = read_csv_readings(args.csv)
+    else:
+        replay_source = synthetic_readings(args.synthetic, interval_minutes=args.interval, seed=args.seed,
+                                           scenario=args.scenario)
+
+    replay_device = None
+    if args.device:
+        replay_device = Device.objects.get_or_create(serial_number=args.device, defaults={'name': args.device})[0]
+
+    replay_report = run_replay(
+        replay_source,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        limit=args.limit,
+        device=replay_device,
+        keep_timestamps=args.keep_timestamps
+    )
+
+    print_report(replay_report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(replay_report, f, indent=2)
+        print(f"\nReport written to {args.json}")
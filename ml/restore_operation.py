@@ -0,0 +1,268 @@
+# ml/restore_operation.py
+
+import os
+import sys
+import django
+import logging
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime, timedelta
+
+# Get the absolute path to the project directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Ensure the logs directory exists
+logs_dir = os.path.join(BASE_DIR, 'logs')
+os.makedirs(logs_dir, exist_ok=True)
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
+django.setup()
+
+from django.db import connection, transaction
+from django.utils import timezone
+from monitoring.models import RestoreOperation
+from ml.backup_stream import RestoreCancelled, RestoreListener
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(logs_dir, 'backup.log')),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('backup')
+
+# How often a running restore writes its progress and checks for a cancellation request
+HEARTBEAT_SECONDS = 1
+
+# An active operation without a heartbeat for this long belongs to a restore process that died
+STALE_SECONDS = 60
+
+
+class OperationTracker(RestoreListener):
+    """
+    Writes the progress of a restore to its RestoreOperation and carries out cancellation requests
+
+    A heartbeat thread with its own database connection saves the phase and the rows and bytes
+    streamed so far, and polls `cancel_requested`. A cancellation is only accepted in the phases of
+    RestoreOperation.CANCELLABLE_PHASES: the restore is then interrupted both from the inside (the
+    next progress update or phase change raises RestoreCancelled) and from the server
+    (pg_cancel_backend stops an index build or merge that reports no progress), and its transaction
+    is rolled back.
+    """
+
+    def __init__(self, operation_id, backend_pid):
+        self.operation_id = operation_id
+        self.backend_pid = backend_pid
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.stopped = threading.Event()
+        self.current_phase = ''
+        # Rows and bytes of the chain files already streamed, and the progress of the current one
+        self.done_rows = 0
+        self.done_bytes = 0
+        self.progress = None
+        self.thread = threading.Thread(target=self._heartbeat, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def phase(self, name):
+        # Holding the lock, a phase change cannot slip between the check and the server-side cancel
+        with self.lock:
+            if self.cancelled.is_set():
+                raise RestoreCancelled()
+            self.current_phase = name
+
+    def update(self, progress):
+        with self.lock:
+            if progress is not self.progress:
+                if self.progress is not None:
+                    self.done_rows += self.progress.rows
+                    self.done_bytes += self.progress.bytes
+                self.progress = progress
+        if self.cancelled.is_set():
+            raise RestoreCancelled()
+
+    def totals(self):
+        with self.lock:
+            if self.progress is None:
+                return self.done_rows, self.done_bytes
+            return self.done_rows + self.progress.rows, self.done_bytes + self.progress.bytes
+
+    def flush(self):
+        rows, read = self.totals()
+        RestoreOperation.objects.filter(id=self.operation_id).update(
+            phase=self.current_phase, rows_restored=rows, bytes_read=read, updated_at=timezone.now())
+
+    def _heartbeat(self):
+        try:
+            while not self.stopped.wait(HEARTBEAT_SECONDS):
+                try:
+                    self.flush()
+                    if (not self.cancelled.is_set() and
+                            RestoreOperation.objects.filter(id=self.operation_id, cancel_requested=True).exists()):
+                        self._cancel()
+                except Exception as e:
+                    logger.warning(f"Restore operation {self.operation_id}: progress update failed: {str(e)}")
+        finally:
+            connection.close()
+
+    def _cancel(self):
+        with self.lock:
+            if self.current_phase not in RestoreOperation.CANCELLABLE_PHASES:
+                logger.info(f"Restore operation {self.operation_id}: cancellation ignored in the "
+                            f"{self.current_phase} phase")
+                return
+            self.cancelled.set()
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_cancel_backend(%s)", [self.backend_pid])
+        logger.info(f"Restore operation {self.operation_id}: cancelling")
+
+
+def decode_selection(selection):
+    """Arguments of restore_database from the JSON selection of an operation"""
+    bounds = dict(selection or {})
+    for field in ('start', 'end'):
+        if bounds.get(field):
+            bounds[field] = datetime.fromisoformat(bounds[field])
+    return bounds
+
+
+def run_operation(operation_id):
+    """
+    Run a pending restore operation in this process
+
+    Returns:
+        tuple: (success, message)
+    """
+    from ml.backup_database import restore_database
+
+    with transaction.atomic():
+        operation = RestoreOperation.objects.select_for_update().get(id=operation_id)
+        if operation.status != 'PENDING':
+            return False, f"Restore operation {operation_id} is {operation.status}"
+        if operation.cancel_requested:
+            operation.status = 'CANCELLED'
+            operation.finished_at = timezone.now()
+            operation.save(update_fields=['status', 'finished_at'])
+            return False, "Restore cancelled before it started"
+        operation.status = 'RUNNING'
+        operation.pid = os.getpid()
+        operation.started_at = operation.updated_at = timezone.now()
+        operation.save(update_fields=['status', 'pid', 'started_at', 'updated_at'])
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid()")
+        backend_pid = cursor.fetchone()[0]
+
+    logger.info(f"Restore operation {operation_id}: restoring {operation.backup_file}")
+    tracker = OperationTracker(operation_id, backend_pid)
+    tracker.start()
+    try:
+        success, message = restore_database(operation.backup_file, listener=tracker,
+                                            **decode_selection(operation.selection))
+    except Exception as e:
+        success, message = False, f"Exception during restore operation: {str(e)}"
+        logger.error(message)
+    finally:
+        tracker.stop()
+
+    if tracker.cancelled.is_set():
+        status, message = 'CANCELLED', "Restore cancelled, energy logs left unchanged"
+    else:
+        status = 'SUCCESS' if success else 'FAILED'
+
+    rows, read = tracker.totals()
+    RestoreOperation.objects.filter(id=operation_id).update(
+        status=status, message=message[:255], phase=tracker.current_phase, rows_restored=rows, bytes_read=read,
+        finished_at=timezone.now(), updated_at=timezone.now())
+    logger.info(f"Restore operation {operation_id}: {status} - {message}")
+    return success, message
+
+
+def expire_stale_operations():
+    """Mark active operations whose restore process stopped sending heartbeats as failed"""
+    cutoff = timezone.now() - timedelta(seconds=STALE_SECONDS)
+    stale = RestoreOperation.objects.filter(status__in=RestoreOperation.ACTIVE_STATUSES).exclude(
+        updated_at__gte=cutoff).exclude(updated_at__isnull=True, created_at__gte=cutoff)
+    return stale.update(status='FAILED', message="Процес відновлення перестав відповідати",
+                        finished_at=timezone.now())
+
+
+def start_restore(backup, user=None, selection=None):
+    """
+    Queue a restore from a backup and run it in a detached process
+
+    Args:
+        backup: BackupLog to restore
+        user: User who started the restore
+        selection: Optional arguments of a selective restore (start, end, min_id, max_id)
+
+    Returns:
+        tuple: (operation or None, message)
+    """
+    expire_stale_operations()
+    if RestoreOperation.objects.filter(status__in=RestoreOperation.ACTIVE_STATUSES).exists():
+        return None, "Інше відновлення ще виконується"
+
+    if selection:
+        selection = {field: value.isoformat() if isinstance(value, datetime) else value
+                     for field, value in selection.items()}
+        expected_rows = None
+    else:
+        counts = [link.record_count for link in backup.get_chain()]
+        expected_rows = sum(counts) if None not in counts else None
+
+    operation = RestoreOperation.objects.create(
+        backup=backup,
+        backup_file=backup.backup_file,
+        selection=selection or None,
+        expected_rows=expected_rows,
+        created_by=user,
+    )
+
+    script_path = os.path.join(BASE_DIR, 'ml', 'restore_operation.py')
+    log_file = os.path.join(logs_dir, 'restore.log')
+    subprocess.Popen(
+        [sys.executable, script_path, str(operation.id)],
+        stdout=open(log_file, "a"),
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+        cwd=str(BASE_DIR)
+    )
+    return operation, f"Відновлення з {backup.backup_file} запущено"
+
+
+def request_cancel(operation):
+    """
+    Ask a restore operation to stop
+
+    Returns:
+        tuple: (success, message)
+    """
+    if not operation.is_active():
+        return False, "Відновлення вже завершено"
+    if operation.phase not in RestoreOperation.CANCELLABLE_PHASES:
+        return False, "Дані вже замінюються, відновлення не можна скасувати"
+    RestoreOperation.objects.filter(id=operation.id).update(cancel_requested=True)
+    return True, "Запит на скасування відновлення надіслано"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a restore operation queued from the backups page")
+    parser.add_argument("operation_id", type=int, help="ID of the RestoreOperation")
+
+    args = parser.parse_args()
+
+    success, _ = run_operation(args.operation_id)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,145 @@
+# ml/row_digest.py
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+# Levels of the digest tree from the top down, with the length of their bucket keys:
+# month '2025-03', day '2025-03-14', hour '2025-03-14T09'
+DIGEST_LEVELS = (('month', 7), ('day', 10), ('hour', 13))
+DIGEST_VERSION = 2
+
+# Bookkeeping columns left out of the row hashes: backup_triggered is set on the triggering rows
+# after their backup was dumped, and updated_at moves with it, while the reading stays the same
+UNHASHED_COLUMNS = ('backup_triggered', 'updated_at')
+
+HOUR_KEY_FORMAT = '%Y-%m-%dT%H'
+
+
+def digest_columns(model):
+    """Columns of a model hashed into the row digests"""
+    return [field.column for field in model._meta.concrete_fields if field.column not in UNHASHED_COLUMNS]
+
+
+def hour_digests(cursor, table, columns, schema='public', where='TRUE', params=None):
+    """
+    Row count and digest of the rows of every hour of a table, computed by the server
+
+    Every row is hashed from the text form of its `columns` (see digest_columns) and the row
+    hashes of an hour are hashed again in ID order, so any inserted, deleted or modified row
+    changes the digest of its hour. Hours are cut in the session time zone, which is UTC on
+    Django connections.
+
+    Returns:
+        dict: {hour key: [rows, digest]}
+    """
+    row = ', '.join(f't."{column}"' for column in columns)
+    cursor.execute(f"SELECT to_char(date_trunc('hour', t.timestamp), 'YYYY-MM-DD\"T\"HH24'), COUNT(*), "
+                   f"md5(string_agg(md5(ROW({row})::text), '' ORDER BY t.id)) "
+                   f"FROM {schema}.{table} t WHERE {where} GROUP BY 1 ORDER BY 1", params or [])
+    return {key: [rows, digest] for key, rows, digest in cursor.fetchall()}
+
+
+def _combine(children, length):
+    """Parent nodes of `children`, grouped by the first `length` characters of their keys"""
+    groups = {}
+    for key in sorted(children):
+        groups.setdefault(key[:length], []).append(key)
+
+    nodes = {}
+    for parent, keys in groups.items():
+        digest = hashlib.sha256()
+        for key in keys:
+            digest.update(f"{key}:{children[key][1]}\n".encode('utf-8'))
+        nodes[parent] = [sum(children[key][0] for key in keys), digest.hexdigest()]
+    return nodes
+
+
+def build_tree(leaves):
+    """
+    Merkle tree over the hour digests of a table
+
+    Every node is [rows, digest]; the digest of a day hashes the keys and digests of its hours, a
+    month those of its days and the root those of the months, so equal digests at any level mean
+    equal rows below it.
+
+    Returns:
+        dict: {'version', 'root', 'rows', 'month': {...}, 'day': {...}, 'hour': {...}}
+    """
+    tree = {'version': DIGEST_VERSION}
+    children = dict(leaves)
+    for level, _ in reversed(DIGEST_LEVELS):
+        tree[level] = children
+        children = _combine(children, _parent_length(level))
+    tree['rows'], tree['root'] = children.get('', [0, hashlib.sha256().hexdigest()])
+    return tree
+
+
+def _parent_length(level):
+    """Key length of the level above `level` (0 for the root)"""
+    names = [name for name, _ in DIGEST_LEVELS]
+    index = names.index(level)
+    return DIGEST_LEVELS[index - 1][1] if index else 0
+
+
+def _group_by_parent(nodes, length):
+    groups = {}
+    for key in nodes:
+        groups.setdefault(key[:length], []).append(key)
+    return groups
+
+
+def diff_trees(left, right):
+    """
+    Hours whose rows differ between two digest trees
+
+    The trees are compared from the root down, only descending into months and days whose
+    digests differ, so unchanged parts are skipped after a single comparison.
+
+    Returns:
+        tuple: (list of (hour key, left rows, right rows), number of nodes compared)
+    """
+    compared = 1
+    if left['root'] == right['root']:
+        return [], compared
+
+    changed = ['']
+    for level, _ in DIGEST_LEVELS:
+        parent_length = _parent_length(level)
+        left_children = _group_by_parent(left[level], parent_length)
+        right_children = _group_by_parent(right[level], parent_length)
+
+        next_changed = []
+        for parent in changed:
+            for key in sorted(set(left_children.get(parent, [])) | set(right_children.get(parent, []))):
+                compared += 1
+                if left[level].get(key) != right[level].get(key):
+                    next_changed.append(key)
+        changed = next_changed
+
+    return [(key, left['hour'].get(key, [0])[0], right['hour'].get(key, [0])[0]) for key in changed], compared
+
+
+def hour_start(key):
+    return datetime.strptime(key, HOUR_KEY_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def changed_windows(changed_hours):
+    """
+    Merge consecutive changed hours into time windows
+
+    Returns:
+        list: dicts with start, end (exclusive), hours, left_rows and right_rows
+    """
+    windows = []
+    for key, left_rows, right_rows in sorted(changed_hours):
+        start = hour_start(key)
+        if windows and windows[-1]['end'] == start:
+            window = windows[-1]
+        else:
+            window = {'start': start, 'end': start, 'hours': 0, 'left_rows': 0, 'right_rows': 0}
+            windows.append(window)
+        window['end'] = start + timedelta(hours=1)
+        window['hours'] += 1
+        window['left_rows'] += left_rows
+        window['right_rows'] += right_rows
+    return windows
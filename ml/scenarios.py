@@ -0,0 +1,347 @@
+# ml/scenarios.py
+
+"""
+Declarative, vectorized generation of synthetic energy system workloads
+
+A scenario is a list of components applied in order to arrays covering the whole
+duration at once. Every component works on full numpy arrays, so generating a year
+of readings costs the same handful of numpy calls as generating one.
+
+Example:
+    scenario = Scenario([
+        BaseSignals(),
+        DiurnalLoad(amplitude=600),
+        BatteryDischarge(start_hour=20, duration_hours=6),
+        AnomalyBurst(probability=0.001, duration=4),
+    ], interval_minutes=15, seed=42)
+    df = scenario.generate(days=7)
+"""
+
+import json
+import argparse
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+
+METRIC_FIELDS = ['ac_output_voltage', 'dc_battery_voltage', 'dc_battery_current', 'load_power', 'temperature']
+
+# Nominal operating point of the simulated inverter (matches the data the models are trained on)
+NOMINAL = {
+    'ac_output_voltage': (230, 3),
+    'dc_battery_voltage': (24, 0.5),
+    'dc_battery_current': (10, 1),
+    'load_power': (1250, 150),
+    'temperature': (35, 1),
+}
+
+
+class Component(ABC):
+    """Base class of scenario components; `apply` mutates the signal arrays in place"""
+
+    name = None
+
+    @abstractmethod
+    def apply(self, signals, timestamps, rng):
+        pass
+
+    def to_spec(self):
+        return {'type': self.name, **self.__dict__}
+
+
+class BaseSignals(Component):
+    """Independent gaussian readings around the nominal operating point"""
+
+    name = 'base'
+
+    def __init__(self, **overrides):
+        # Each override is a [mean, std] pair for one metric
+        self.overrides = overrides
+
+    def apply(self, signals, timestamps, rng):
+        n = len(timestamps)
+        for field, (mean, std) in NOMINAL.items():
+            mean, std = self.overrides.get(field, (mean, std))
+            signals[field] = rng.normal(mean, std, n)
+
+    def to_spec(self):
+        return {'type': self.name, **self.overrides}
+
+
+class DiurnalLoad(Component):
+    """
+    Daily load curve peaking at `peak_hour`, with correlated battery current,
+    battery temperature and AC voltage sag
+    """
+
+    name = 'diurnal_load'
+
+    def __init__(self, amplitude=600, peak_hour=19, current_per_watt=0.008, temperature_per_amp=0.3,
+                 voltage_sag_per_kw=2.0):
+        self.amplitude = amplitude
+        self.peak_hour = peak_hour
+        self.current_per_watt = current_per_watt
+        self.temperature_per_amp = temperature_per_amp
+        self.voltage_sag_per_kw = voltage_sag_per_kw
+
+    def apply(self, signals, timestamps, rng):
+        hours = timestamps.hour.to_numpy() + timestamps.minute.to_numpy() / 60
+        delta_load = self.amplitude * np.cos(2 * np.pi * (hours - self.peak_hour) / 24)
+
+        delta_current = delta_load * self.current_per_watt
+        signals['load_power'] += delta_load
+        signals['dc_battery_current'] += delta_current
+        signals['temperature'] += delta_current * self.temperature_per_amp
+        signals['ac_output_voltage'] -= delta_load / 1000 * self.voltage_sag_per_kw
+
+
+class BatteryDischarge(Component):
+    """Nightly discharge: battery voltage ramps down by `depth` volts over the window, then recovers"""
+
+    name = 'battery_discharge'
+
+    def __init__(self, start_hour=20, duration_hours=8, depth=3.0, current_increase=4.0):
+        self.start_hour = start_hour
+        self.duration_hours = duration_hours
+        self.depth = depth
+        self.current_increase = current_increase
+
+    def apply(self, signals, timestamps, rng):
+        hours = timestamps.hour.to_numpy() + timestamps.minute.to_numpy() / 60
+        elapsed = (hours - self.start_hour) % 24
+        progress = np.where(elapsed < self.duration_hours, elapsed / self.duration_hours, 0.0)
+
+        signals['dc_battery_voltage'] -= progress * self.depth
+        signals['dc_battery_current'] += np.where(progress > 0, self.current_increase, 0.0)
+
+
+class Drift(Component):
+    """Linear sensor drift of one metric, in units per day since the scenario start"""
+
+    name = 'drift'
+
+    def __init__(self, field='temperature', per_day=0.5):
+        self.field = field
+        self.per_day = per_day
+
+    def apply(self, signals, timestamps, rng):
+        days = (timestamps - timestamps[0]).total_seconds().to_numpy() / 86400
+        signals[self.field] += days * self.per_day
+
+
+class SlightAnomalies(Component):
+    """
+    Occasional mild deviations of a single parameter (voltage, current or temperature),
+    as produced by the regular simulation
+    """
+
+    name = 'slight_anomalies'
+
+    def __init__(self, probability=0.15):
+        self.probability = probability
+
+    def apply(self, signals, timestamps, rng):
+        n = len(timestamps)
+        affected = rng.random(n) < self.probability
+        kind = rng.integers(0, 3, n)
+
+        voltage = affected & (kind == 0)
+        current = affected & (kind == 1)
+        temperature = affected & (kind == 2)
+
+        signals['ac_output_voltage'][voltage] = rng.normal(rng.choice([210, 250], voltage.sum()), 3)
+        signals['dc_battery_current'][current] = rng.normal(rng.choice([4, 17], current.sum()), 1)
+        signals['temperature'][temperature] = rng.normal(50, 2, temperature.sum())
+        signals['injected_anomaly'] |= affected
+
+
+class AnomalyBurst(Component):
+    """
+    Bursts of clearly anomalous readings: each reading starts a burst with `probability`,
+    and a burst lasts `duration` consecutive readings. Probability 1 turns every reading anomalous.
+    """
+
+    name = 'anomaly_burst'
+
+    def __init__(self, probability=0.002, duration=4):
+        self.probability = probability
+        self.duration = duration
+
+    def apply(self, signals, timestamps, rng):
+        n = len(timestamps)
+        starts = (rng.random(n) < self.probability).astype(np.int32)
+        # A reading is inside a burst if a burst started within the last `duration` readings
+        window = np.convolve(starts, np.ones(self.duration, dtype=np.int32))[:n]
+        mask = window > 0
+        count = mask.sum()
+
+        signals['ac_output_voltage'][mask] = rng.normal(rng.choice([150, 280], count), 10)
+        signals['dc_battery_voltage'][mask] = np.where(rng.random(count) < 0.5,
+                                                       rng.normal(18, 1, count), rng.normal(30, 2, count))
+        signals['dc_battery_current'][mask] = rng.normal(10, 8, count)
+        signals['load_power'][mask] = rng.normal(1250, 150, count)
+        signals['temperature'][mask] = rng.normal(55, 5, count)
+        signals['injected_anomaly'] |= mask
+
+
+class SensorDropout(Component):
+    """
+    Sensor dropouts lasting `duration` readings. `mode` decides how they look in the data:
+    'nan' (missing), 'zero' (dead sensor) or 'hold' (stuck at the last good value).
+    """
+
+    name = 'sensor_dropout'
+
+    def __init__(self, fields=('temperature',), probability=0.005, duration=3, mode='nan'):
+        self.fields = list(fields)
+        self.probability = probability
+        self.duration = duration
+        self.mode = mode
+
+    def apply(self, signals, timestamps, rng):
+        n = len(timestamps)
+        starts = (rng.random(n) < self.probability).astype(np.int32)
+        mask = np.convolve(starts, np.ones(self.duration, dtype=np.int32))[:n] > 0
+
+        for field in self.fields:
+            values = signals[field]
+            if self.mode == 'zero':
+                values[mask] = 0.0
+            elif self.mode == 'hold':
+                # Index of the last reading before each dropout, carried forward through it
+                last_good = np.where(~mask, np.arange(n), 0)
+                np.maximum.accumulate(last_good, out=last_good)
+                values[mask] = values[last_good[mask]]
+            else:
+                values[mask] = np.nan
+        signals['sensor_dropout'] |= mask
+
+
+COMPONENTS = {component.name: component for component in [
+    BaseSignals, DiurnalLoad, BatteryDischarge, Drift, SlightAnomalies, AnomalyBurst, SensorDropout,
+]}
+
+
+class Scenario:
+    """An ordered list of components plus sampling interval and seed"""
+
+    def __init__(self, components, interval_minutes=15, seed=None, name=None):
+        self.components = components
+        self.interval_minutes = interval_minutes
+        self.seed = seed
+        self.name = name
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Build a scenario from a plain dict, e.g. loaded from JSON"""
+        components = []
+        for item in spec['components']:
+            params = dict(item)
+            components.append(COMPONENTS[params.pop('type')](**params))
+        return cls(components, interval_minutes=spec.get('interval_minutes', 15),
+                   seed=spec.get('seed'), name=spec.get('name'))
+
+    def to_spec(self):
+        return {
+            'name': self.name,
+            'interval_minutes': self.interval_minutes,
+            'seed': self.seed,
+            'components': [component.to_spec() for component in self.components],
+        }
+
+    def generate(self, periods=None, days=None, start=None):
+        """
+        Generate all readings of the scenario in one vectorized pass
+
+        Args:
+            periods: Number of readings
+            days: Alternatively, duration in days (converted using the interval)
+            start: Timestamp of the first reading (aware datetime), defaults to now
+
+        Returns:
+            DataFrame: timestamp, metric columns, and the ground-truth flags
+                       `injected_anomaly` and `sensor_dropout`
+        """
+        if periods is None:
+            periods = int(days * 24 * 60 / self.interval_minutes)
+
+        start = start or datetime.now(timezone.utc)
+        timestamps = pd.date_range(start=start, periods=periods, freq=pd.Timedelta(minutes=self.interval_minutes))
+
+        rng = np.random.default_rng(self.seed)
+        signals = {field: np.zeros(periods) for field in METRIC_FIELDS}
+        signals['injected_anomaly'] = np.zeros(periods, dtype=bool)
+        signals['sensor_dropout'] = np.zeros(periods, dtype=bool)
+
+        for component in self.components:
+            component.apply(signals, timestamps, rng)
+
+        # Physical limits: load readings can't go negative (battery temperatures in °C can)
+        np.clip(signals['load_power'], 0, None, out=signals['load_power'])
+
+        return pd.DataFrame({'timestamp': timestamps, **signals})
+
+
+# Ready-made scenarios; the first four mirror the simulation types of simulate_data.py
+SCENARIOS = {
+    'normal': lambda: [BaseSignals()],
+    'natural': lambda: [BaseSignals(), SlightAnomalies(probability=0.15)],
+    'anomaly': lambda: [BaseSignals(), AnomalyBurst(probability=1.0, duration=1)],
+    'abnormal_prediction': lambda: [BaseSignals()],
+    'diurnal': lambda: [BaseSignals(), DiurnalLoad()],
+    'battery_discharge': lambda: [BaseSignals(), DiurnalLoad(), BatteryDischarge()],
+    'sensor_dropout': lambda: [BaseSignals(), SensorDropout(fields=['temperature', 'dc_battery_current'],
+                                                            probability=0.01, mode='hold')],
+    # Missing readings are stored as NULL, which the models cannot score; only for testing gaps explicitly
+    'sensor_gaps': lambda: [BaseSignals(), SensorDropout(fields=['temperature'], probability=0.01, mode='nan')],
+    'drift': lambda: [BaseSignals(), Drift(field='temperature', per_day=0.5),
+                      Drift(field='ac_output_voltage', per_day=-0.3)],
+    'anomaly_burst': lambda: [BaseSignals(), DiurnalLoad(), AnomalyBurst(probability=0.005, duration=6)],
+    'realistic': lambda: [BaseSignals(), DiurnalLoad(), BatteryDischarge(), Drift(per_day=0.05),
+                          SlightAnomalies(probability=0.02), AnomalyBurst(probability=0.001, duration=4),
+                          SensorDropout(probability=0.002, mode='hold')],
+}
+
+
+def get_scenario(name, interval_minutes=15, seed=None):
+    """Instantiate one of the ready-made scenarios by name"""
+    if name not in SCENARIOS:
+        raise ValueError(f"Unknown scenario '{name}'. Available: {', '.join(SCENARIOS)}")
+    return Scenario(SCENARIOS[name](), interval_minutes=interval_minutes, seed=seed, name=name)
+
+
+def iter_readings(df):
+    """Yield reading dicts from a generated frame, with missing values as None"""
+    frame = df[['timestamp'] + METRIC_FIELDS].astype(object).where(df[['timestamp'] + METRIC_FIELDS].notna(), None)
+    for row in frame.itertuples(index=False):
+        yield row._asdict()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic energy workload")
+    parser.add_argument("scenario", nargs='?', default='realistic',
+                        help=f"Ready-made scenario ({', '.join(SCENARIOS)})")
+    parser.add_argument("--spec", help="JSON file with a scenario spec (overrides the scenario name)")
+    parser.add_argument("--days", type=float, default=1, help="Duration in days (default: 1)")
+    parser.add_argument("--interval", type=float, default=15, help="Minutes between readings (default: 15)")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible output")
+    parser.add_argument("--csv", help="Write the readings to this CSV file (replay_pipeline.py --csv format)")
+
+    args = parser.parse_args()
+
+    if args.spec:
+        with open(args.spec) as f:
+            scenario = Scenario.from_spec(json.load(f))
+    else:
+        scenario = get_scenario(args.scenario, interval_minutes=args.interval, seed=args.seed)
+
+    readings = scenario.generate(days=args.days)
+
+    if args.csv:
+        readings.to_csv(args.csv, index=False)
+        print(f"Wrote {len(readings)} readings to {args.csv}")
+    else:
+        print(readings.describe().round(2).to_string())
+        print(f"\nInjected anomalies: {readings['injected_anomaly'].sum()}, "
+              f"dropout readings: {readings['sensor_dropout'].sum()}")
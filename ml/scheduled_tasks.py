@@ -6,7 +6,9 @@ import logging
 import time
 import schedule
 import sys
+import queue
 import functools
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 from django.utils import timezone
@@ -18,7 +20,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
 django.setup()
 
-from monitoring.models import EnergyLog, BackupLog, SystemSettings
+from monitoring.models import EnergyLog, BackupLog, SystemSettings, Device
+from ml.backup_policy import DEFAULT_CHANGE_THRESHOLD, POLICY_CHECK_MINUTES
 
 # Create a logs directory if it doesn't exist
 logs_dir = os.path.join(BASE_DIR, 'logs')
@@ -56,6 +59,16 @@ active_jobs = {
 # Track if a job is currently running
 job_running = None
 
+# Backups and maintenance run in these threads, so a long dump never delays a data collection tick
+background_jobs = {}
+
+# Backup checks of new readings are handled one at a time by a single worker thread. A check
+# dropped because the queue is full leaves its reading pending, and the backup dumper picks it
+# up with the next trigger (see ml/backup_coordinator.py).
+BACKUP_CHECK_QUEUE_SIZE = 100
+backup_checks = queue.Queue(maxsize=BACKUP_CHECK_QUEUE_SIZE)
+backup_check_worker = None
+
 
 def get_system_settings():
     """Get or create system settings"""
@@ -67,6 +80,7 @@ def get_system_settings():
         # Return default values
         return type('obj', (object,), {
             'backup_frequency_hours': 24,
+            'backup_change_threshold': DEFAULT_CHANGE_THRESHOLD,
             'max_energy_logs': 5000,
             'max_backups': 20,
             'data_collection_interval': 15,
@@ -106,6 +120,74 @@ def prioritized_job_wrapper(func):
     return wrapper
 
 
+def run_in_background(func, *args, low_priority=False):
+    """
+    Run a job in a background thread with its own database connection
+
+    The run is skipped if the previous run of the same job is still going.
+
+    Args:
+        func: Job function
+        low_priority: Run the thread at low CPU and idle I/O priority (per thread on Linux)
+
+    Returns:
+        Thread or None if the run was skipped
+    """
+    name = func.__name__
+    previous = background_jobs.get(name)
+    if previous and previous.is_alive():
+        logger.warning(f"Previous run of {name} is still in progress, skipping this one")
+        return None
+
+    def target():
+        from django.db import connection
+        if low_priority:
+            from ml.backup_throttle import lower_priority
+            lower_priority(threading.get_native_id())
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"Error in background job {name}: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    background_jobs[name] = thread
+    thread.start()
+    return thread
+
+
+def backup_check_loop():
+    """Request backups for the queued readings that need one (runs in the backup check worker)"""
+    from django.db import connection
+    from ml.backup_database import check_and_backup_if_needed
+
+    while True:
+        log_id = backup_checks.get()
+        try:
+            check_and_backup_if_needed(log_id)
+        except Exception as e:
+            logger.error(f"Error checking reading {log_id} for a backup: {str(e)}")
+        finally:
+            connection.close()
+            backup_checks.task_done()
+
+
+def queue_backup_check(log_id):
+    """Leave the backup check of a new reading to the backup check worker, starting it if needed"""
+    global backup_check_worker
+    if backup_check_worker is None or not backup_check_worker.is_alive():
+        backup_check_worker = threading.Thread(target=backup_check_loop, name='backup_check', daemon=True)
+        backup_check_worker.start()
+
+    try:
+        backup_checks.put_nowait(log_id)
+    except queue.Full:
+        logger.warning(f"Backup check queue is full, reading {log_id} is left to the next backup trigger")
+
+
 @prioritized_job_wrapper
 def run_data_simulation():
     """Run the data simulation directly with proper connection handling"""
@@ -114,23 +196,35 @@ def run_data_simulation():
     try:
         # Import functions from simulate_data instead of reimplementing
         from ml.simulate_data import run_simulation_with_type
-
-        # Run the simulation with proper error handling
-        log_id, simulation_message = run_simulation_with_type(
-            simulation_type=None,  # Normal simulation
-            is_manual=False,  # Automated by scheduler
-            user_id=None  # No user for automated tasks
-        )
-
-        if log_id:
-            logger.info(f"Data simulation completed successfully. Log ID: {log_id}, {simulation_message}")
-
-            # After simulation, check if we need to create a backup
-            # This additional check helps ensure that backups are triggered when needed
-            from ml.backup_database import check_and_backup_if_needed
-            check_and_backup_if_needed(log_id)
-        else:
-            logger.error("Data simulation failed - no log ID returned")
+        from ml.backup_coordinator import backup_in_progress
+
+        # One reading per active device; installations without registered devices keep a single stream
+        device_ids = list(Device.objects.filter(is_active=True).values_list('id', flat=True)) or [None]
+
+        for device_id in device_ids:
+            # Ingest latency of the reading, compared with and without a dump running
+            started = time.monotonic()
+            during_backup = backup_in_progress()
+
+            # Run the simulation with proper error handling; the backup check is left to the backup
+            # check worker, so it never holds up the next reading
+            log_id, simulation_message = run_simulation_with_type(
+                simulation_type=None,  # Normal simulation
+                is_manual=False,  # Automated by scheduler
+                user_id=None,  # No user for automated tasks
+                device_id=device_id,
+                trigger_backup=False
+            )
+
+            if log_id:
+                logger.info(f"Data simulation completed successfully. Log ID: {log_id}, {simulation_message}")
+                logger.info(f"Reading ingested in {(time.monotonic() - started) * 1000:.0f} ms"
+                            f"{' (backup in progress)' if during_backup else ''}")
+
+                # After simulation, check if we need to create a backup
+                queue_backup_check(log_id)
+            else:
+                logger.error(f"Data simulation failed for device {device_id} - no log ID returned")
 
     except django.db.utils.InterfaceError as e:
         # Handle the specific connection closed error
@@ -151,6 +245,33 @@ def run_data_simulation():
 
 @prioritized_job_wrapper
 def run_scheduled_backup():
+    """
+    Start the scheduled backup in the background if the backup policy makes it due
+
+    A backup is skipped while too little has changed since the last one, so an idle database is
+    not dumped again and again. The backup itself runs in the background, so data collection
+    keeps its schedule.
+    """
+    previous = background_jobs.get('scheduled_backup')
+    if previous and previous.is_alive():
+        return
+
+    try:
+        from ml.backup_database import scheduled_backup_due
+
+        due, reason = scheduled_backup_due()
+    except Exception as e:
+        logger.error(f"Error checking the backup policy: {str(e)}")
+        return
+
+    if not due:
+        logger.info(f"Scheduled backup skipped: {reason}")
+        return
+    logger.info(f"Scheduled backup due: {reason}")
+    run_in_background(scheduled_backup, low_priority=True)
+
+
+def scheduled_backup():
     """Run daily scheduled backup"""
     logger.info("Running scheduled backup")
 
@@ -251,14 +372,40 @@ def cleanup_old_system_logs():
         logger.error(f"Error cleaning up logs: {e}")
 
 
+def start_backup_verification():
+    """Verify new backups by test restores in a detached low-priority process"""
+    logger.info("Starting background backup verification")
+
+    try:
+        import subprocess
+        script_path = os.path.join(BASE_DIR, 'ml', 'verify_backups.py')
+        # The script lowers its own CPU and I/O priority; its results go to logs/backup.log
+        subprocess.Popen(
+            [sys.executable, script_path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            cwd=str(BASE_DIR)
+        )
+
+    except Exception as e:
+        logger.error(f"Exception starting backup verification: {str(e)}")
+
+
 @prioritized_job_wrapper
 def run_maintenance():
+    """Start the maintenance tasks in the background; backup cleanup waits for any dump in flight"""
+    run_in_background(maintenance, low_priority=True)
+
+
+def maintenance():
     """Run all maintenance tasks"""
     logger.info("Running maintenance tasks")
 
     cleanup_old_system_logs()
     cleanup_old_backups()
     purge_old_energy_logs()
+    start_backup_verification()
 
     logger.info("Maintenance tasks completed")
 
@@ -334,18 +481,11 @@ def update_schedule():
     if backup_hours <= 0:
         backup_hours = 24  # Default to daily if invalid
 
-    backup_interval_minutes = backup_hours * 60
-    backup_times = get_aligned_schedule_times(backup_interval_minutes)
-
-    logger.info(f"Setting backup frequency to {backup_hours} hours")
-    logger.info(f"Backups will run at: {', '.join(backup_times[:4])}...")
-
-    # Schedule backups at each aligned time
-    for time_str in backup_times:
-        schedule.every().day.at(time_str).do(run_scheduled_backup)
-
-    next_backup_time = get_next_aligned_time(backup_interval_minutes)
-    logger.info(f"Next backup at: {next_backup_time}")
+    # The policy is checked often; a backup runs only once enough has changed or the maximum
+    # interval has passed (see ml/backup_policy.py)
+    logger.info(f"Backups run after {settings.backup_change_threshold} changes or at most every "
+                f"{backup_hours} hours; checking every {POLICY_CHECK_MINUTES} minutes")
+    schedule.every(POLICY_CHECK_MINUTES).minutes.do(run_scheduled_backup)
 
     # ===== MAINTENANCE SCHEDULING =====
     try:
@@ -479,7 +619,7 @@ def start_scheduler():
 if __name__ == "__main__":
     # Check if a command is provided
     if len(sys.argv) > 1 and sys.argv[1] == "maintenance":
-        run_maintenance()
+        maintenance()
         sys.exit(0)
 
     # Otherwise start the regular scheduler
@@ -1,10 +1,11 @@
-# ml/simulate_data.py - Final update with natural anomaly chance
+# ml/simulate_data.py
 
 import os
+import time
 import django
-import numpy as np
 import logging
 import argparse
+from datetime import timedelta
 from pathlib import Path
 
 from django.utils import timezone
@@ -20,7 +21,7 @@ os.makedirs(logs_dir, exist_ok=True)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
 django.setup()
 
-from monitoring.models import EnergyLog
+from monitoring.models import EnergyLog, Device, SimulationBatch
 from django.contrib.auth.models import User
 
 # Configure logging
@@ -35,7 +36,28 @@ logging.basicConfig(
 logger = logging.getLogger('simulation')
 
 
-def create_energy_reading(simulation_type=None, is_manual=False, user=None):
+# Scenario used for each simulation type; normal simulations include a 15% chance of natural anomalies
+SIMULATION_SCENARIOS = {
+    None: 'natural',
+    'anomaly': 'anomaly',
+    'abnormal_prediction': 'abnormal_prediction',
+}
+
+
+def generate_readings(simulation_type=None, count=1, seed=None):
+    """
+    Generate metric values for `count` readings of the given simulation type in one vectorized pass
+
+    Returns:
+        DataFrame: one row per reading (see ml.scenarios.Scenario.generate)
+    """
+    from ml.scenarios import get_scenario
+
+    scenario = get_scenario(SIMULATION_SCENARIOS.get(simulation_type, 'natural'), seed=seed)
+    return scenario.generate(count)
+
+
+def create_energy_reading(simulation_type=None, is_manual=False, user=None, device=None):
     """
     Create a new energy reading simulating data from an energy system
 
@@ -44,68 +66,25 @@ def create_energy_reading(simulation_type=None, is_manual=False, user=None):
                          'abnormal_prediction' for abnormal prediction data
         is_manual: Flag if this is a manually triggered reading
         user: User who created this reading (for manual readings)
+        device: Device the reading comes from, or None
 
     Returns:
         EnergyLog: The created record
     """
-    if simulation_type == 'anomaly':
-        # Create clearly anomalous data
-        ac_output_voltage = np.random.choice([
-            np.random.normal(150, 10),  # Low voltage
-            np.random.normal(280, 10)  # High voltage
-        ])
-        dc_battery_voltage = np.random.choice([
-            np.random.normal(18, 1),  # Low battery
-            np.random.normal(30, 2)  # High battery
-        ])
-        dc_battery_current = np.random.normal(10, 8)  # Unstable current
-        load_power = np.random.normal(1250, 150)  # Normal power range
-        temperature = np.random.normal(55, 5)  # High battery temperature
-    else:
-        # For normal simulation, create mostly normal data but with occasional slightly anomalous values
-        anomaly_chance = 0.15  # 15% chance of natural anomaly
-
-        if simulation_type != 'abnormal_prediction' and np.random.random() < anomaly_chance:
-            # Create slightly anomalous data - but not as extreme as forced anomalies
-            logger.info("Creating slightly anomalous data in normal simulation")
-            anomaly_type = np.random.choice(['voltage', 'current', 'temperature'])
-
-            if anomaly_type == 'voltage':
-                ac_output_voltage = np.random.normal(np.random.choice([210, 250]), 3)  # Slightly off voltage
-                dc_battery_voltage = np.random.normal(24, 0.5)  # Normal
-                dc_battery_current = np.random.normal(10, 1)  # Normal
-            elif anomaly_type == 'current':
-                ac_output_voltage = np.random.normal(230, 3)  # Normal
-                dc_battery_voltage = np.random.normal(24, 0.5)  # Normal
-                dc_battery_current = np.random.normal(np.random.choice([4, 17]), 1)  # Slightly off current
-            else:  # temperature
-                ac_output_voltage = np.random.normal(230, 3)  # Normal
-                dc_battery_voltage = np.random.normal(24, 0.5)  # Normal
-                dc_battery_current = np.random.normal(10, 1)  # Normal
-                temperature = np.random.normal(50, 2)  # High temperature
-
-            # Use normal load power regardless of anomaly type
-            load_power = np.random.normal(1250, 150)
-
-            # Set temperature if not already set
-            if 'temperature' not in locals():
-                temperature = np.random.normal(35, 1)
-        else:
-            # Completely normal data
-            ac_output_voltage = np.random.normal(230, 3)
-            dc_battery_voltage = np.random.normal(24, 0.5)
-            dc_battery_current = np.random.normal(10, 1)
-            load_power = np.random.normal(1250, 150)
-            temperature = np.random.normal(35, 1)
+    reading = generate_readings(simulation_type, count=1).iloc[0]
+
+    if simulation_type is None and reading['injected_anomaly']:
+        logger.info("Creating slightly anomalous data in normal simulation")
 
     # Save to DB
     log = EnergyLog.objects.create(
         timestamp=timezone.now(),
-        ac_output_voltage=ac_output_voltage,
-        dc_battery_voltage=dc_battery_voltage,
-        dc_battery_current=dc_battery_current,
-        load_power=load_power,
-        temperature=temperature,
+        device=device,
+        ac_output_voltage=reading['ac_output_voltage'],
+        dc_battery_voltage=reading['dc_battery_voltage'],
+        dc_battery_current=reading['dc_battery_current'],
+        load_power=reading['load_power'],
+        temperature=reading['temperature'],
         is_manual=is_manual,
         created_by=user
     )
@@ -114,7 +93,7 @@ def create_energy_reading(simulation_type=None, is_manual=False, user=None):
     return log
 
 
-def run_simulation_with_type(simulation_type=None, is_manual=False, user_id=None):
+def run_simulation_with_type(simulation_type=None, is_manual=False, user_id=None, device_id=None, trigger_backup=True):
     """
     Unified simulation function that handles all simulation types
 
@@ -123,6 +102,8 @@ def run_simulation_with_type(simulation_type=None, is_manual=False, user_id=None
                         'abnormal_prediction' for abnormal prediction data
         is_manual: Flag if this is a manually triggered reading
         user_id: ID of the user who triggered the simulation
+        device_id: ID of the device the reading belongs to
+        trigger_backup: If False, leave the backup check to the caller
 
     Returns:
         tuple: (log_id, simulation_message)
@@ -137,9 +118,18 @@ def run_simulation_with_type(simulation_type=None, is_manual=False, user_id=None
         except User.DoesNotExist:
             logger.warning(f"User with ID {user_id} not found")
 
+    # Get the device if provided
+    device = None
+    if device_id:
+        try:
+            device = Device.objects.get(id=device_id)
+        except Device.DoesNotExist:
+            logger.warning(f"Device with ID {device_id} not found")
+
     try:
         # 1. Create a new energy reading based on simulation type
-        log = create_energy_reading(simulation_type=simulation_type, is_manual=is_manual, user=user)
+        log = create_energy_reading(simulation_type=simulation_type, is_manual=is_manual, user=user,
+                                    device=device)
         logger.info(f"Created new energy log with ID: {log.id}")
 
         # 2. Apply ML models to the new reading, with force parameters if needed
@@ -153,7 +143,8 @@ def run_simulation_with_type(simulation_type=None, is_manual=False, user_id=None
         is_anomaly, anomaly_score, predicted_current, predicted_voltage = apply_models_to_record(
             log.id,
             force_abnormal_prediction=force_abnormal,
-            force_anomaly=force_anomaly
+            force_anomaly=force_anomaly,
+            trigger_backup=trigger_backup
         )
 
         logger.info(f"Applied models to record {log.id}")
@@ -190,6 +181,79 @@ def run_simulation_with_type(simulation_type=None, is_manual=False, user_id=None
         return None, "Помилка симуляції"
 
 
+def run_batch_simulation(count, simulation_type=None, is_manual=False, user_id=None, device_id=None,
+                         interval_minutes=0):
+    """
+    Generate, bulk-insert and score `count` readings of one simulation type
+
+    Readings are generated in one vectorized pass, inserted with batched INSERTs (see ml/ingest.py)
+    and scored in one model pass; at most one backup is created for the whole batch.
+
+    Args:
+        count: Number of readings to create
+        simulation_type: Type of simulation - None for normal, 'anomaly' or 'abnormal_prediction'
+        is_manual: Flag if these are manually triggered readings
+        user_id: ID of the user who triggered the simulation
+        device_id: ID of the device the readings belong to
+        interval_minutes: Spacing of the readings, ending at the current time (0 - all at the current time)
+
+    Returns:
+        dict: Summary of the batch
+    """
+    logger.info(f"Running batch simulation of {count} readings with type: {simulation_type or 'normal'}")
+    started = time.perf_counter()
+
+    user = User.objects.filter(id=user_id).first() if user_id else None
+    device = Device.objects.filter(id=device_id).first() if device_id else None
+
+    try:
+        readings = generate_readings(simulation_type, count=count)
+        now = timezone.now()
+
+        # Simulated readings have no source timestamp to dedupe on, so no keys are derived
+        from ml.ingest import bulk_ingest
+        ingested = bulk_ingest(
+            (
+                {
+                    **row._asdict(),
+                    'timestamp': now - timedelta(minutes=interval_minutes * (count - 1 - i)),
+                }
+                for i, row in enumerate(readings.itertuples(index=False))
+            ),
+            device=device,
+            is_manual=is_manual,
+            user=user,
+            derive_keys=False
+        )
+        log_ids = ingested['ids']
+        logger.info(f"Inserted {len(log_ids)} energy logs ({log_ids[0]}..{log_ids[-1]})")
+
+        from ml.apply_models_to_record import apply_models_to_records
+        scoring = apply_models_to_records(
+            log_ids,
+            force_abnormal_prediction=(simulation_type == 'abnormal_prediction'),
+            force_anomaly=(simulation_type == 'anomaly')
+        )
+
+        summary = {
+            'created': len(log_ids),
+            'first_id': log_ids[0],
+            'last_id': log_ids[-1],
+            'anomalies': scoring['anomalies'],
+            'abnormal_predictions': scoring['abnormal_predictions'],
+            'backup_requested': scoring['backup_requested'],
+            'elapsed_seconds': round(time.perf_counter() - started, 2),
+        }
+        logger.info(f"Batch simulation finished: {summary}")
+        return summary
+
+    except Exception as e:
+        logger.error(f"Error during batch simulation: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return None
+
+
 if __name__ == "__main__":
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Simulate energy system data")
@@ -197,17 +261,63 @@ if __name__ == "__main__":
                         default=None, help="Type of simulation data to generate")
     parser.add_argument("--manual", action="store_true", help="Mark as manual entry")
     parser.add_argument("--user", type=int, help="User ID who created this entry")
+    parser.add_argument("--device", help="Serial number of the device the reading comes from")
+    parser.add_argument("--count", type=int, default=1, help="Number of readings to create in one batch")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Minutes between batch readings, ending now (default: all at the current time)")
+    parser.add_argument("--batch-id", type=int,
+                        help="SimulationBatch started from the logs page, to store the batch summary on")
 
     args = parser.parse_args()
 
     # Map 'normal' to None for function call
     sim_type = None if args.type == 'normal' else args.type
 
+    # Register unknown devices on first use
+    device_id = None
+    if args.device:
+        device_id = Device.objects.get_or_create(serial_number=args.device,
+                                                 defaults={'name': args.device})[0].id
+
+    if args.count > 1 or args.batch_id:
+        if args.batch_id:
+            SimulationBatch.objects.filter(id=args.batch_id).update(status='RUNNING')
+
+        batch_summary = run_batch_simulation(
+            args.count,
+            simulation_type=sim_type,
+            is_manual=args.manual,
+            user_id=args.user,
+            device_id=device_id,
+            interval_minutes=args.interval
+        )
+
+        # The logs page polls the batch for its summary
+        if args.batch_id:
+            SimulationBatch.objects.filter(id=args.batch_id).update(
+                status='SUCCESS' if batch_summary else 'FAILED',
+                summary=batch_summary,
+                finished_at=timezone.now()
+            )
+
+        print("\nBatch simulation summary:")
+        if batch_summary:
+            print(f"- Created energy logs: {batch_summary['created']} "
+                  f"(IDs {batch_summary['first_id']}..{batch_summary['last_id']})")
+            print(f"- Anomalies detected: {batch_summary['anomalies']}")
+            print(f"- Abnormal predictions: {batch_summary['abnormal_predictions']}")
+            print(f"- Backup requested: {batch_summary['backup_requested']}")
+            print(f"- Elapsed: {batch_summary['elapsed_seconds']}s")
+        else:
+            print("- Помилка симуляції")
+        raise SystemExit(0 if batch_summary else 1)
+
     # Run the simulation
     log_id, message = run_simulation_with_type(
         simulation_type=sim_type,
         is_manual=args.manual,
-        user_id=args.user
+        user_id=args.user,
+        device_id=device_id
     )
 
     print("\nSimulation summary:")
@@ -217,6 +327,8 @@ if __name__ == "__main__":
     # Get the updated log to show results
     if log_id:
         log = EnergyLog.objects.get(id=log_id)
+        if log.device:
+            print(f"- Device: {log.device}")
         print(f"- Manual entry: {log.is_manual}")
         if log.created_by:
             print(f"- Created by: {log.created_by.username}")
@@ -0,0 +1,263 @@
+# ml/table_swap.py
+
+import time
+import logging
+
+logger = logging.getLogger('backup')
+
+# Suffixes of the table being loaded by a restore and of the table kept for rollback
+SHADOW_SUFFIX = '_shadow'
+OLD_SUFFIX = '_old'
+TEMP_SUFFIX = '_swap'
+
+# How long the swap may wait for the exclusive lock before retrying
+SWAP_LOCK_TIMEOUT = '5s'
+SWAP_ATTEMPTS = 3
+
+
+def derived_name(name, suffix):
+    """Name of a table's counterpart object, kept within Postgres' 63 character identifier limit"""
+    return name[:63 - len(suffix)] + suffix
+
+
+def table_exists(cursor, table, schema='public'):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [f"{schema}.{table}"])
+    return cursor.fetchone()[0]
+
+
+def table_sequence(cursor, table, column='id', schema='public'):
+    """Name of the sequence (identity or serial) behind a table's ID column, or None"""
+    cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [f"{schema}.{table}", column])
+    sequence = cursor.fetchone()[0]
+    return sequence.split('.')[-1].strip('"') if sequence else None
+
+
+def list_indexes(cursor, table, schema='public'):
+    """
+    Indexes of a table as (name, is_unique, definition tail, constraint definition)
+
+    The definition tail starts after `USING`, so it can be replayed on another table. The constraint
+    definition is set for indexes backing a primary key or unique constraint.
+    """
+    cursor.execute("""
+        SELECT c.relname, i.indisunique, split_part(pg_get_indexdef(i.indexrelid), ' USING ', 2),
+               pg_get_constraintdef(con.oid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.contype IN ('p', 'u')
+        WHERE i.indrelid = %s::regclass
+        ORDER BY c.relname
+    """, [f"{schema}.{table}"])
+    return cursor.fetchall()
+
+
+def list_foreign_keys(cursor, table, schema='public'):
+    """Foreign keys declared on a table as (name, definition)"""
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        ORDER BY conname
+    """, [f"{schema}.{table}"])
+    return cursor.fetchall()
+
+
+def list_referencing_keys(cursor, table, schema='public'):
+    """Foreign keys of other tables pointing at a table as (table, name, column, definition)"""
+    cursor.execute("""
+        SELECT con.conrelid::regclass::text, con.conname, a.attname, pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = con.conkey[1]
+        WHERE con.confrelid = %s::regclass AND con.contype = 'f' AND con.conrelid <> con.confrelid
+        ORDER BY con.conname
+    """, [f"{schema}.{table}"])
+    return cursor.fetchall()
+
+
+def create_shadow_table(cursor, table, schema='public'):
+    """
+    Create an empty copy of a table to load a restore into
+
+    Only columns, defaults, check constraints and the identity are copied: indexes and foreign keys
+    are built by `build_shadow_indexes` once the data is in, which is much faster than maintaining
+    them row by row during COPY.
+    """
+    shadow = derived_name(table, SHADOW_SUFFIX)
+    cursor.execute(f"DROP TABLE IF EXISTS {schema}.{shadow}")
+    cursor.execute(f"CREATE TABLE {schema}.{shadow} (LIKE {schema}.{table} "
+                   f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY INCLUDING GENERATED)")
+
+    # Give the shadow's own identity sequence the name it will need when swapped in
+    live_sequence = table_sequence(cursor, table, schema=schema)
+    shadow_sequence = table_sequence(cursor, shadow, schema=schema)
+    if live_sequence and shadow_sequence and shadow_sequence != live_sequence:
+        cursor.execute(f"ALTER SEQUENCE {schema}.{shadow_sequence} "
+                       f"RENAME TO {derived_name(live_sequence, SHADOW_SUFFIX)}")
+    return shadow
+
+
+def build_shadow_indexes(cursor, table, schema='public'):
+    """Recreate the indexes and foreign keys of a table on its loaded shadow"""
+    shadow = derived_name(table, SHADOW_SUFFIX)
+
+    for name, is_unique, definition, constraint in list_indexes(cursor, table, schema):
+        started = time.monotonic()
+        shadow_index = derived_name(name, SHADOW_SUFFIX)
+        if constraint:
+            cursor.execute(f"ALTER TABLE {schema}.{shadow} ADD CONSTRAINT {shadow_index} {constraint}")
+        else:
+            cursor.execute(f"CREATE {'UNIQUE ' if is_unique else ''}INDEX {shadow_index} "
+                           f"ON {schema}.{shadow} USING {definition}")
+        logger.info(f"Built index {shadow_index} in {time.monotonic() - started:.1f}s")
+
+    # Constraint names only need to be unique per table, so foreign keys keep their names
+    for name, definition in list_foreign_keys(cursor, table, schema):
+        cursor.execute(f"ALTER TABLE {schema}.{shadow} ADD CONSTRAINT {name} {definition}")
+
+    cursor.execute(f"ANALYZE {schema}.{shadow}")
+
+
+def _rename_objects(cursor, table, from_suffix, to_suffix, index_names, sequence, schema='public'):
+    """Rename a counterpart table with its indexes and sequence from one suffix to another"""
+    def name_for(base, suffix):
+        return derived_name(base, suffix) if suffix else base
+
+    for name in index_names:
+        cursor.execute(f"ALTER INDEX {schema}.{name_for(name, from_suffix)} RENAME TO {name_for(name, to_suffix)}")
+    if sequence:
+        cursor.execute(f"ALTER SEQUENCE {schema}.{name_for(sequence, from_suffix)} "
+                       f"RENAME TO {name_for(sequence, to_suffix)}")
+    cursor.execute(f"ALTER TABLE {schema}.{name_for(table, from_suffix)} RENAME TO {name_for(table, to_suffix)}")
+
+
+def _repoint_referencing_keys(cursor, referencing_keys, table, schema='public'):
+    """
+    Recreate foreign keys of other tables against the table that now carries the live name
+
+    Renaming a table keeps foreign keys attached to it, so after a swap they still point at the
+    replaced table. Rows referencing records that are not in the new table are kept: swapping the
+    previous table back makes them valid again (see validate_referencing_keys).
+    """
+    for referencing_table, name, column, definition in referencing_keys:
+        cursor.execute(f"ALTER TABLE {referencing_table} DROP CONSTRAINT {name}")
+        # NOT VALID keeps the lock short and skips existing rows; new rows are still checked
+        cursor.execute(f"ALTER TABLE {referencing_table} ADD CONSTRAINT {name} {definition} NOT VALID")
+
+
+def validate_referencing_keys(cursor, table, schema='public'):
+    """
+    Validate foreign keys recreated after a swap, outside the exclusive lock
+
+    A key with rows referencing records missing from the table is left NOT VALID, so those rows
+    (e.g. links of backups to records the restored data does not contain) survive for a rollback.
+
+    Returns:
+        dict: {referencing table: rows referencing missing records}
+    """
+    orphans = {}
+    for referencing_table, name, column, _ in list_referencing_keys(cursor, table, schema):
+        cursor.execute(f"SELECT COUNT(*) FROM {referencing_table} r WHERE r.{column} IS NOT NULL AND NOT EXISTS "
+                       f"(SELECT 1 FROM {schema}.{table} t WHERE t.id = r.{column})")
+        count = cursor.fetchone()[0]
+        if count:
+            logger.warning(f"{count} rows of {referencing_table} reference records missing from {table}; "
+                           f"{name} stays NOT VALID until they match again")
+            orphans[referencing_table] = count
+            continue
+        cursor.execute(f"ALTER TABLE {referencing_table} VALIDATE CONSTRAINT {name}")
+    return orphans
+
+
+def _lock_for_swap(cursor, table, schema='public'):
+    """Take the exclusive lock on the live table, retrying while readers or writers hold it"""
+    cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+    for attempt in range(1, SWAP_ATTEMPTS + 1):
+        cursor.execute("SAVEPOINT swap_lock")
+        try:
+            cursor.execute(f"LOCK TABLE {schema}.{table} IN ACCESS EXCLUSIVE MODE")
+            cursor.execute("RELEASE SAVEPOINT swap_lock")
+            return
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT swap_lock")
+            if attempt == SWAP_ATTEMPTS:
+                raise
+            logger.warning(f"Could not lock {table} for the swap (attempt {attempt}), retrying")
+
+
+def swap_in_shadow(cursor, table, catch_up_after_id=None, schema='public'):
+    """
+    Replace a table with its loaded shadow, keeping the replaced table for rollback
+
+    Must run inside a transaction. Only catalog changes happen under the exclusive lock, so
+    readers and writers are blocked for milliseconds rather than for the whole load.
+
+    Args:
+        cursor: Database cursor inside a transaction
+        table: Live table name
+        catch_up_after_id: Rows of the live table with a higher ID (written while the shadow was
+            loading) are copied into the shadow before the swap
+
+    Returns:
+        tuple: (seconds waited for the exclusive lock, seconds the lock was held before commit)
+    """
+    shadow = derived_name(table, SHADOW_SUFFIX)
+    old = derived_name(table, OLD_SUFFIX)
+
+    requested = time.monotonic()
+    _lock_for_swap(cursor, table, schema)
+    started = time.monotonic()
+
+    if catch_up_after_id is not None:
+        cursor.execute(f"INSERT INTO {schema}.{shadow} SELECT * FROM {schema}.{table} WHERE id > %s "
+                       f"ON CONFLICT DO NOTHING", [catch_up_after_id])
+        if cursor.rowcount:
+            logger.info(f"Carried {cursor.rowcount} records written during the restore over to the new table")
+
+    index_names = [row[0] for row in list_indexes(cursor, table, schema)]
+    sequence = table_sequence(cursor, table, schema=schema)
+    shadow_has_sequence = table_sequence(cursor, shadow, schema=schema) != sequence
+    referencing_keys = list_referencing_keys(cursor, table, schema)
+
+    # Only one generation is kept for rollback
+    cursor.execute(f"DROP TABLE IF EXISTS {schema}.{old}")
+
+    _rename_objects(cursor, table, '', OLD_SUFFIX, index_names, sequence if shadow_has_sequence else None, schema)
+    _rename_objects(cursor, table, SHADOW_SUFFIX, '', index_names, sequence if shadow_has_sequence else None, schema)
+
+    if sequence and not shadow_has_sequence:
+        # A serial column shares its sequence; it must not be dropped with the old table
+        cursor.execute(f"ALTER SEQUENCE {schema}.{sequence} OWNED BY {schema}.{table}.id")
+
+    _repoint_referencing_keys(cursor, referencing_keys, table, schema)
+    logger.info(f"Swapped {shadow} in for {table} in {(time.monotonic() - started) * 1000:.0f} ms "
+                f"(previous table kept as {old})")
+    return started - requested, time.monotonic() - started
+
+
+def swap_back(cursor, table, schema='public'):
+    """
+    Exchange the live table with the one kept by the last swap
+
+    Running it twice restores the original state, so a rollback can itself be undone.
+    """
+    old = derived_name(table, OLD_SUFFIX)
+    if not table_exists(cursor, old, schema):
+        raise Exception(f"No previous table {old} to roll back to")
+
+    _lock_for_swap(cursor, table, schema)
+    index_names = [row[0] for row in list_indexes(cursor, table, schema)]
+    sequence = table_sequence(cursor, table, schema=schema)
+    separate_sequence = table_sequence(cursor, old, schema=schema) not in (None, sequence)
+    referencing_keys = list_referencing_keys(cursor, table, schema)
+
+    renamed_sequence = sequence if separate_sequence else None
+    _rename_objects(cursor, table, '', TEMP_SUFFIX, index_names, renamed_sequence, schema)
+    _rename_objects(cursor, table, OLD_SUFFIX, '', index_names, renamed_sequence, schema)
+    _rename_objects(cursor, table, TEMP_SUFFIX, OLD_SUFFIX, index_names, renamed_sequence, schema)
+
+    _repoint_referencing_keys(cursor, referencing_keys, table, schema)
+    logger.info(f"Swapped {old} back in for {table}")
+
+
+def drop_shadow_table(cursor, table, schema='public'):
+    cursor.execute(f"DROP TABLE IF EXISTS {schema}.{derived_name(table, SHADOW_SUFFIX)}")
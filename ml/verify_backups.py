@@ -0,0 +1,187 @@
+# ml/verify_backups.py
+
+import os
+import time
+import django
+import logging
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Get the absolute path to the project directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Ensure the logs directory exists
+logs_dir = os.path.join(BASE_DIR, 'logs')
+os.makedirs(logs_dir, exist_ok=True)
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Diploma.settings')
+django.setup()
+
+from django.db import connection, transaction
+from django.utils import timezone
+from monitoring.models import EnergyLog, BackupLog
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(logs_dir, 'backup.log')),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('backup')
+
+# Statistics of the energy log table that a test restore must reproduce
+COMPARED_STATS = ('rows', 'min_id', 'max_id', 'min_timestamp', 'max_timestamp')
+
+DEFAULT_WORKERS = 2
+
+
+def test_restore(backup, backup_path):
+    """
+    Stream a backup's energy logs into a throwaway schema and return their statistics
+
+    The schema is dropped afterwards whatever the outcome.
+    """
+    from ml.backup_database import restore_copy_block
+    from ml.backup_manifest import table_stats
+    from ml.row_digest import build_tree, digest_columns, hour_digests
+
+    table = EnergyLog._meta.db_table
+    schema = f"backup_verify_{backup.id}"
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {schema}")
+        try:
+            with transaction.atomic():
+                cursor.execute(f"CREATE TABLE {schema}.{table} (LIKE public.{table} INCLUDING DEFAULTS)")
+                restore_copy_block(cursor, backup_path, backup.backup_file, mode='load', target=f"{schema}.{table}")
+                stats = table_stats(cursor, table, schema=schema)
+                stats['row_digest'] = build_tree(hour_digests(cursor, table, digest_columns(EnergyLog),
+                                                                  schema=schema))['root']
+                return stats
+        finally:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+
+
+def verify_backup(backup_id):
+    """
+    Verify one backup: checksum against its manifest and a test restore compared with the manifest
+
+    Records the outcome and the restore duration on the backup log.
+
+    Returns:
+        bool: True if the backup was verified
+    """
+    from ml.backup_database import backups_dir
+    from ml.backup_manifest import read_manifest, verify_checksum
+    from ml.row_digest import DIGEST_VERSION
+
+    backup = BackupLog.objects.get(id=backup_id)
+    backup_path = os.path.join(backups_dir, backup.backup_file)
+    problems = []
+    restore_seconds = None
+
+    try:
+        try:
+            if not os.path.exists(backup_path):
+                raise Exception(f"Backup file not found: {backup.backup_file}")
+
+            manifest = read_manifest(backup_path)
+            if manifest:
+                checksum_ok, checksum_message = verify_checksum(backup_path, manifest)
+                if not checksum_ok:
+                    problems.append(checksum_message)
+
+            started = time.monotonic()
+            restored = test_restore(backup, backup_path)
+            restore_seconds = time.monotonic() - started
+
+            if manifest:
+                expected = manifest['tables'].get(EnergyLog._meta.db_table, {})
+                for key in COMPARED_STATS:
+                    if key in expected and expected[key] != restored.get(key):
+                        problems.append(f"{key}: manifest {expected[key]}, restored {restored.get(key)}")
+                # Full backups also record a digest of every row, comparable when hashed the same way
+                row_digests = manifest.get('row_digests')
+                if (row_digests and row_digests.get('version') == DIGEST_VERSION
+                        and row_digests['root'] != restored['row_digest']):
+                    problems.append("row digests differ from the manifest")
+
+            status = 'FAILED' if problems else 'VERIFIED'
+            if problems:
+                message = '; '.join(problems)
+            elif manifest:
+                message = f"{restored['rows']} records restored, matching the manifest"
+            else:
+                # Backups made before manifests existed can only be checked for a clean restore
+                message = f"{restored['rows']} records restored (no manifest to compare with)"
+
+        except Exception as e:
+            status = 'FAILED'
+            message = str(e)
+
+        BackupLog.objects.filter(id=backup_id).update(
+            verification_status=status,
+            verification_message=message[:255],
+            verification_seconds=restore_seconds,
+            verified_at=timezone.now(),
+        )
+    finally:
+        # Worker threads hold their own connections
+        connection.close()
+
+    log = logger.info if status == 'VERIFIED' else logger.error
+    log(f"Verification of {backup.backup_file}: {status} - {message}"
+        f"{f' (restore {restore_seconds:.1f}s)' if restore_seconds is not None else ''}")
+    return status == 'VERIFIED'
+
+
+def verify_backups(backup_ids=None, workers=DEFAULT_WORKERS, reverify=False, limit=None):
+    """
+    Verify backups in parallel with at most `workers` test restores at a time
+
+    Args:
+        backup_ids: Backups to verify; defaults to successful backups not verified yet (newest first)
+        workers: Maximum number of concurrent test restores
+        reverify: Also verify backups that were verified before
+        limit: Verify at most this many backups
+
+    Returns:
+        dict: Number of verified and failed backups
+    """
+    if backup_ids is None:
+        backups = BackupLog.objects.filter(status='SUCCESS').order_by('-timestamp')
+        if not reverify:
+            backups = backups.filter(verification_status__isnull=True)
+        backup_ids = list(backups.values_list('id', flat=True)[:limit] if limit else
+                          backups.values_list('id', flat=True))
+
+    logger.info(f"Verifying {len(backup_ids)} backups with {workers} workers")
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = list(executor.map(verify_backup, backup_ids))
+
+    summary = {'verified': results.count(True), 'failed': results.count(False)}
+    logger.info(f"Backup verification finished: {summary['verified']} verified, {summary['failed']} failed")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify backups by test restores into a scratch schema")
+    parser.add_argument("--backup-id", type=int, nargs='+', help="Backups to verify (default: unverified ones)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Concurrent test restores (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--all", action='store_true', help="Also re-verify backups verified before")
+    parser.add_argument("--limit", type=int, help="Verify at most this many backups")
+
+    args = parser.parse_args()
+
+    # Run the verification at low CPU and idle I/O priority so it does not compete with ingestion
+    from ml.backup_throttle import lower_priority
+    lower_priority()
+    verify_backups(args.backup_id, workers=args.workers, reverify=args.all, limit=args.limit)
@@ -4,7 +4,8 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 
-from .models import EnergyLog, BackupLog, UserProfile, SystemSettings
+from .models import (EnergyLog, BackupLog, BackupChunk, BackupDiff, BackupMount, RestoreOperation, SimulationBatch,
+                     UserProfile, SystemSettings, Device)
 
 
 # Define inline admin for UserProfile
@@ -34,25 +35,79 @@ admin.site.register(User, UserAdmin)
 
 
 # Register other models
+@admin.register(Device)
+class DeviceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'serial_number', 'location', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'serial_number', 'location')
+    readonly_fields = ('created_at',)
+
+
 @admin.register(EnergyLog)
 class EnergyLogAdmin(admin.ModelAdmin):
-    list_display = ('timestamp', 'load_power', 'predicted_current', 'predicted_voltage', 'is_anomaly', 'is_abnormal_prediction', 'is_manual', 'created_by')
-    list_filter = ('is_anomaly', 'is_manual', 'backup_triggered', 'is_abnormal_prediction')
+    list_display = ('timestamp', 'device', 'load_power', 'predicted_current', 'predicted_voltage', 'is_anomaly', 'is_abnormal_prediction', 'is_manual', 'created_by')
+    list_filter = ('device', 'is_anomaly', 'is_manual', 'backup_triggered', 'is_abnormal_prediction')
+    list_select_related = ('device', 'created_by')
     search_fields = ('anomaly_reason',)
     readonly_fields = ('timestamp',)
 
 
 @admin.register(BackupLog)
 class BackupLogAdmin(admin.ModelAdmin):
-    list_display = ('timestamp', 'backup_file', 'status', 'trigger_reason', 'size_kb', 'created_by')
-    list_filter = ('status', 'trigger_reason')
-    search_fields = ('backup_file', 'error_message')
-    readonly_fields = ('timestamp',)
+    list_display = ('timestamp', 'backup_file', 'backup_type', 'backup_format', 'status', 'trigger_reason', 'size_kb',
+                    'duration_seconds', 'record_count', 'first_record_at', 'last_record_at', 'coalesced_triggers',
+                    'verification_status', 'created_by')
+    list_filter = ('status', 'trigger_reason', 'backup_type', 'backup_format', 'verification_status')
+    search_fields = ('backup_file', 'error_message', 'checksum')
+    readonly_fields = ('timestamp', 'checksum', 'row_digest', 'pg_dump_version', 'manifest', 'verification_status',
+                       'verification_message', 'verification_seconds', 'verified_at', 'ingest_latency_before_ms',
+                       'ingest_latency_during_ms', 'change_counter', 'duration_seconds', 'bytes_per_second',
+                       'phase_timings', 'restored_at', 'restore_seconds', 'restore_bytes_per_second',
+                       'restore_phase_timings')
+
+
+@admin.register(BackupChunk)
+class BackupChunkAdmin(admin.ModelAdmin):
+    list_display = ('hash', 'stored_size', 'ref_count', 'created_at')
+    search_fields = ('hash',)
+    readonly_fields = ('hash', 'stored_size', 'ref_count', 'created_at')
+
+
+@admin.register(BackupMount)
+class BackupMountAdmin(admin.ModelAdmin):
+    list_display = ('schema', 'backup', 'status', 'record_count', 'size_bytes', 'load_seconds', 'mounted_at',
+                    'last_used_at')
+    readonly_fields = ('schema', 'status', 'error_message', 'record_count', 'size_bytes', 'load_seconds', 'mounted_at',
+                       'last_used_at')
+
+
+@admin.register(BackupDiff)
+class BackupDiffAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'backup', 'status', 'message', 'finished_at', 'created_by')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'finished_at', 'report')
+
+
+@admin.register(RestoreOperation)
+class RestoreOperationAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'backup_file', 'status', 'phase', 'rows_restored', 'expected_rows', 'bytes_read',
+                    'started_at', 'finished_at', 'created_by')
+    list_filter = ('status',)
+    search_fields = ('backup_file', 'message')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'updated_at', 'pid', 'phase', 'rows_restored',
+                       'bytes_read')
+
+
+@admin.register(SimulationBatch)
+class SimulationBatchAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'count', 'simulation_type', 'device', 'status', 'finished_at', 'created_by')
+    list_filter = ('status', 'simulation_type')
+    readonly_fields = ('created_at', 'finished_at', 'summary')
 
 
 @admin.register(SystemSettings)
 class SystemSettingsAdmin(admin.ModelAdmin):
-    list_display = ('id', 'backup_frequency_hours', 'backup_retention_days', 'max_backups',
+    list_display = ('id', 'backup_frequency_hours', 'backup_change_threshold', 'backup_retention_days', 'max_backups',
                     'max_energy_logs', 'last_modified', 'modified_by')
     readonly_fields = ('last_modified',)
 
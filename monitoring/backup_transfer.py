@@ -0,0 +1,230 @@
+# monitoring/backup_transfer.py
+import os
+import re
+import uuid
+import hashlib
+import tarfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+# Transfers move 1 MB at a time whatever the backup size
+TRANSFER_BLOCK_SIZE = 1024 * 1024
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class BackupFileResponse(FileResponse):
+    """File response streaming in large blocks; WSGI servers with a file wrapper send it with sendfile"""
+    block_size = TRANSFER_BLOCK_SIZE
+
+
+class FileRange:
+    """Read-only view of `length` bytes of an open file from its current position"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        # Lets the WSGI file wrapper use sendfile; it stops at the Content-Length of the range
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range `Range: bytes=...` header
+
+    Returns:
+        tuple or None: (first, last) byte offsets, None without a usable range header; raises
+            ValueError for a range that cannot be satisfied
+    """
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if not match:
+        # Multiple ranges and other units are answered with the whole file
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        if not last or int(last) == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - int(last), 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        raise ValueError("Range outside the file")
+    return first, last
+
+
+def file_etag(path):
+    stat = os.stat(path)
+    return f'"{int(stat.st_mtime)}-{stat.st_size}"'
+
+
+def ranged_file_response(request, path, filename):
+    """Stream a file in constant memory, answering Range requests with 206 Partial Content"""
+    size = os.path.getsize(path)
+    etag = file_etag(path)
+
+    # A resumed transfer of a file that changed since must start over
+    if_range = request.headers.get('If-Range')
+    header = request.headers.get('Range') if not if_range or if_range == etag else None
+
+    try:
+        byte_range = parse_range(header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return response
+
+    f = open(path, 'rb')
+    if byte_range is None:
+        response = BackupFileResponse(f, as_attachment=True, filename=filename)
+    else:
+        first, last = byte_range
+        f.seek(first)
+        response = BackupFileResponse(FileRange(f, last - first + 1), as_attachment=True, filename=filename,
+                                      status=206)
+        response['Content-Range'] = f"bytes {first}-{last}/{size}"
+        response['Content-Length'] = str(last - first + 1)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    return response
+
+
+def iter_stream(stream):
+    """Yield a binary stream in transfer blocks, closing it at the end"""
+    with stream:
+        for block in iter(lambda: stream.read(TRANSFER_BLOCK_SIZE), b''):
+            yield block
+
+
+def tar_members(directory):
+    """Files of a directory archive with their tar headers, in name order"""
+    root = Path(directory)
+    for item in sorted(path for path in root.rglob('*') if path.is_file()):
+        info = tarfile.TarInfo(f"{root.name}/{item.relative_to(root).as_posix()}")
+        stat = item.stat()
+        info.size = stat.st_size
+        info.mtime = stat.st_mtime
+        yield item, info.tobuf(format=tarfile.PAX_FORMAT)
+
+
+def iter_tar(directory):
+    """
+    Yield an uncompressed tar of a directory archive block by block
+
+    The archive is written by hand (header, data, padding to 512 bytes) so no member is ever
+    held in memory.
+    """
+    for item, header in tar_members(directory):
+        yield header
+        size = 0
+        with open(item, 'rb') as f:
+            for block in iter(lambda: f.read(TRANSFER_BLOCK_SIZE), b''):
+                size += len(block)
+                yield block
+        if size % tarfile.BLOCKSIZE:
+            yield b'\0' * (tarfile.BLOCKSIZE - size % tarfile.BLOCKSIZE)
+    yield b'\0' * (2 * tarfile.BLOCKSIZE)
+
+
+def tar_size(directory):
+    size = 2 * tarfile.BLOCKSIZE
+    for item, header in tar_members(directory):
+        size += len(header) + -(-item.stat().st_size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+    return size
+
+
+def backup_download_response(request, path, filename):
+    """
+    Download response for a backup of any format
+
+    Single-file backups are sent as they are, with Range support. Directory archives are sent
+    as a tar and chunked backups as the SQL reassembled from their chunks; both are generated
+    on the fly, so they cannot be resumed.
+    """
+    from ml.backup_formats import BACKUP_FORMATS, detect_format
+
+    format_name = detect_format(path)
+    if format_name == 'directory':
+        response = StreamingHttpResponse(iter_tar(path), content_type='application/x-tar')
+        response['Content-Length'] = str(tar_size(path))
+        filename = f"{filename}.tar"
+    elif BACKUP_FORMATS[format_name]['kind'] == 'chunked':
+        from ml.chunk_store import open_recipe
+        response = StreamingHttpResponse(iter_stream(open_recipe(path, 'rb')), content_type='application/sql')
+        filename = f"{filename[:-len(BACKUP_FORMATS[format_name]['extension'])]}.sql"
+    else:
+        return ranged_file_response(request, path, filename)
+
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['Accept-Ranges'] = 'none'
+    return response
+
+
+class StoredUpload(UploadedFile):
+    """Uploaded backup already written into the backups directory; only its path and checksum are kept"""
+
+    def __init__(self, path, name, size, sha256):
+        super().__init__(None, name, None, size)
+        self.path = path
+        self.sha256 = sha256
+
+
+class BackupUploadHandler(FileUploadHandler):
+    """
+    Stream uploaded files straight into the backups directory, hashing them on the way
+
+    Each chunk is written as it arrives, so multi-GB dumps never pass through memory or a
+    temporary copy. The file keeps a `.part` name until it is registered. An upload growing past
+    BACKUP_UPLOAD_MAX_MB is stopped and its file removed; `too_large` tells the view.
+    """
+    chunk_size = TRANSFER_BLOCK_SIZE
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = settings.BACKUP_UPLOAD_MAX_MB * 1024 * 1024
+        self.too_large = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        from ml.backup_database import UPLOAD_PART_PREFIX, backups_dir
+        self.path = os.path.join(backups_dir, f"{UPLOAD_PART_PREFIX}{uuid.uuid4().hex}.part")
+        self.file = open(self.path, 'wb')
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            self.too_large = True
+            raise StopUpload(connection_reset=True)
+        self.file.write(raw_data)
+        self.digest.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.close()
+        return StoredUpload(self.path, self.file_name, file_size, self.digest.hexdigest())
+
+    def upload_interrupted(self):
+        if not hasattr(self, 'file'):
+            return
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
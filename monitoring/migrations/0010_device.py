@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-19 10:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes on the (potentially very large) energy log table are built concurrently
+    atomic = False
+
+    dependencies = [
+        ('monitoring', '0009_alter_systemsettings_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Device',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Назва')),
+                ('serial_number', models.CharField(max_length=64, unique=True, verbose_name='Серійний номер')),
+                ('location', models.CharField(blank=True, max_length=255, verbose_name='Розташування')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активний')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Час додавання')),
+            ],
+            options={
+                'verbose_name': 'Інвертор',
+                'verbose_name_plural': 'Інвертори',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='energylog',
+            name='device',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='logs', to='monitoring.device', verbose_name='Інвертор'),
+        ),
+        AddIndexConcurrently(
+            model_name='energylog',
+            index=models.Index(fields=['device', '-timestamp'], name='energylog_device_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='energylog',
+            index=models.Index(condition=models.Q(('is_anomaly', True)), fields=['device', '-timestamp'], name='energylog_device_anomaly_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-19 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The unique index on the (potentially very large) energy log table is built concurrently
+    atomic = False
+
+    dependencies = [
+        ('monitoring', '0010_device'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='energylog',
+                    name='ingest_key',
+                    field=models.CharField(blank=True, max_length=128, null=True, unique=True, verbose_name='Ключ ідемпотентності'),
+                ),
+            ],
+            database_operations=[
+                # A nullable column without a default is added without rewriting the table
+                migrations.AddField(
+                    model_name='energylog',
+                    name='ingest_key',
+                    field=models.CharField(blank=True, max_length=128, null=True, verbose_name='Ключ ідемпотентності'),
+                ),
+                migrations.RunSQL(
+                    "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS energylog_ingest_key_uniq "
+                    "ON monitoring_energylog (ingest_key)",
+                    reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS energylog_ingest_key_uniq",
+                ),
+                # Attaching the built index as the constraint only takes a short lock
+                migrations.RunSQL(
+                    "ALTER TABLE monitoring_energylog ADD CONSTRAINT energylog_ingest_key_uniq "
+                    "UNIQUE USING INDEX energylog_ingest_key_uniq",
+                    reverse_sql="ALTER TABLE monitoring_energylog DROP CONSTRAINT IF EXISTS energylog_ingest_key_uniq",
+                ),
+            ],
+        ),
+    ]
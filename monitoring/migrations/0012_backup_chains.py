@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-19 10:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0011_energylog_ingest_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backuplog',
+            name='backup_type',
+            field=models.CharField(choices=[('FULL', 'Повна'), ('INCREMENTAL', 'Інкрементна')], default='FULL', max_length=20, verbose_name='Тип копії'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='increments', to='monitoring.backuplog', verbose_name='Попередня копія ланцюжка'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='watermark_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Останній збережений запис'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='backup_mode',
+            field=models.CharField(choices=[('FULL', 'Повні копії'), ('INCREMENTAL', 'Інкрементні копії')], default='FULL', help_text='Режим резервного копіювання при аномаліях та аномальних прогнозах', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='max_incremental_chain',
+            field=models.IntegerField(default=24, help_text='Максимальна кількість інкрементних копій після повної'),
+        ),
+    ]
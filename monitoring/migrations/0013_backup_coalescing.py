@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0012_backup_chains'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backuplog',
+            name='coalesced_triggers',
+            field=models.IntegerField(default=0, verbose_name="Об'єднано тригерів"),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='backup_coalesce_seconds',
+            field=models.IntegerField(default=10, help_text="Вікно об'єднання тригерів резервного копіювання (секунд)"),
+        ),
+    ]
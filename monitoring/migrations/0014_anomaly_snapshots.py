@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0013_backup_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemsettings',
+            name='snapshot_window_minutes',
+            field=models.IntegerField(default=60, help_text='Хвилин до та після аномалії у знімку резервної копії'),
+        ),
+        migrations.AlterField(
+            model_name='backuplog',
+            name='backup_type',
+            field=models.CharField(choices=[('FULL', 'Повна'), ('INCREMENTAL', 'Інкрементна'), ('SNAPSHOT', 'Знімок аномалії')], default='FULL', max_length=20, verbose_name='Тип копії'),
+        ),
+        migrations.AlterField(
+            model_name='systemsettings',
+            name='backup_mode',
+            field=models.CharField(choices=[('FULL', 'Повні копії'), ('INCREMENTAL', 'Інкрементні копії'), ('SNAPSHOT', 'Знімки навколо аномалії')], default='FULL', help_text='Режим резервного копіювання при аномаліях та аномальних прогнозах', max_length=20),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0014_anomaly_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backuplog',
+            name='backup_format',
+            field=models.CharField(choices=[('plain', 'SQL без стиснення'), ('custom', 'pg_dump custom (-Fc)'), ('directory', 'pg_dump directory (-Fd, паралельно)'), ('gzip', 'SQL + gzip'), ('lzma', 'SQL + lzma (xz)'), ('bz2', 'SQL + bzip2')], default='plain', max_length=20, verbose_name='Формат'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='backup_compression_level',
+            field=models.IntegerField(default=6, help_text='Рівень стиснення (0-9)'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='backup_dump_jobs',
+            field=models.IntegerField(default=2, help_text='Паралельних процесів pg_dump для формату directory'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='backup_format',
+            field=models.CharField(choices=[('plain', 'SQL без стиснення'), ('custom', 'pg_dump custom (-Fc)'), ('directory', 'pg_dump directory (-Fd, паралельно)'), ('gzip', 'SQL + gzip'), ('lzma', 'SQL + lzma (xz)'), ('bz2', 'SQL + bzip2')], default='plain', help_text='Формат та стиснення повних резервних копій', max_length=20),
+        ),
+    ]
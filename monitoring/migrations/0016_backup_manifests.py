@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-19 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0015_backup_formats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backuplog',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='first_record_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Час першого запису'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='last_record_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Час останнього запису'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='manifest',
+            field=models.JSONField(blank=True, null=True, verbose_name='Маніфест'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='max_record_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Останній ID запису'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='min_record_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Перший ID запису'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='pg_dump_version',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Версія pg_dump'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='record_count',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Записів енергосистеми'),
+        ),
+        migrations.AddIndex(
+            model_name='backuplog',
+            index=models.Index(fields=['first_record_at', 'last_record_at'], name='backuplog_record_range_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0016_backup_manifests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('stored_size', models.BigIntegerField(default=0, verbose_name='Розмір на диску (байт)')),
+                ('ref_count', models.IntegerField(db_index=True, default=0, verbose_name='Кількість посилань')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Створено')),
+            ],
+            options={
+                'verbose_name': 'Фрагмент резервної копії',
+                'verbose_name_plural': 'Фрагменти резервних копій',
+            },
+        ),
+        migrations.AlterField(
+            model_name='backuplog',
+            name='backup_format',
+            field=models.CharField(choices=[('plain', 'SQL без стиснення'), ('custom', 'pg_dump custom (-Fc)'), ('directory', 'pg_dump directory (-Fd, паралельно)'), ('gzip', 'SQL + gzip'), ('lzma', 'SQL + lzma (xz)'), ('bz2', 'SQL + bzip2'), ('chunked', 'Дедупліковані фрагменти')], default='plain', max_length=20, verbose_name='Формат'),
+        ),
+        migrations.AlterField(
+            model_name='systemsettings',
+            name='backup_format',
+            field=models.CharField(choices=[('plain', 'SQL без стиснення'), ('custom', 'pg_dump custom (-Fc)'), ('directory', 'pg_dump directory (-Fd, паралельно)'), ('gzip', 'SQL + gzip'), ('lzma', 'SQL + lzma (xz)'), ('bz2', 'SQL + bzip2'), ('chunked', 'Дедупліковані фрагменти')], default='plain', help_text='Формат та стиснення повних резервних копій', max_length=20),
+        ),
+    ]
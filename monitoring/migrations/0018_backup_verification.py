@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0017_backup_chunk_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backuplog',
+            name='verification_message',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Результат перевірки'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='verification_seconds',
+            field=models.FloatField(blank=True, null=True, verbose_name='Тривалість тестового відновлення (с)'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='verification_status',
+            field=models.CharField(blank=True, choices=[('VERIFIED', 'Перевірено'), ('FAILED', 'Перевірку не пройдено')], max_length=20, null=True, verbose_name='Перевірка'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Час перевірки'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0018_backup_verification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemsettings',
+            name='backup_storage_budget_mb',
+            field=models.IntegerField(default=0, help_text='Максимальний обсяг резервних копій (МБ, 0 - без обмеження)'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='retention_daily',
+            field=models.IntegerField(default=7, help_text='Зберігати щоденних резервних копій'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='retention_hourly',
+            field=models.IntegerField(default=24, help_text='Зберігати погодинних резервних копій'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='retention_monthly',
+            field=models.IntegerField(default=6, help_text='Зберігати щомісячних резервних копій'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='retention_weekly',
+            field=models.IntegerField(default=4, help_text='Зберігати щотижневих резервних копій'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0019_backup_retention_tiers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemsettings',
+            name='backup_exporter',
+            field=models.CharField(choices=[('NATIVE', 'Вбудований експорт (COPY)'), ('PG_DUMP', 'pg_dump')], default='NATIVE', help_text='Спосіб створення повних SQL-копій (формати custom та directory завжди створює pg_dump)', max_length=20),
+        ),
+    ]
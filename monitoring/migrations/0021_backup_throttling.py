@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0020_backup_native_exporter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backuplog',
+            name='ingest_latency_before_ms',
+            field=models.FloatField(blank=True, null=True, verbose_name='Затримка запису до копіювання (мс)'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='ingest_latency_during_ms',
+            field=models.FloatField(blank=True, null=True, verbose_name='Затримка запису під час копіювання (мс)'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='backup_bandwidth_mb',
+            field=models.IntegerField(default=0, help_text='Обмеження швидкості резервного копіювання (МБ/с, 0 - без обмеження)'),
+        ),
+    ]
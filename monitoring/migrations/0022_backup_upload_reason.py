@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0021_backup_throttling'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backuplog',
+            name='trigger_reason',
+            field=models.CharField(choices=[('ANOMALY', 'Аномалія'), ('PREDICTION', 'Аномальний прогноз'), ('MANUAL', 'Ручне копіювання'), ('SCHEDULED', 'За розкладом'), ('UPLOAD', 'Завантажено'), ('UNKNOWN', 'Невідома причина')], max_length=20, verbose_name='Причина'),
+        ),
+    ]
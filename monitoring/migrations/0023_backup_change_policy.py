@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0022_backup_upload_reason'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backuplog',
+            name='change_counter',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Лічильник змін'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='backup_change_threshold',
+            field=models.IntegerField(default=1000, help_text='Змін у базі даних для позачергової резервної копії (0 - лише за інтервалом)'),
+        ),
+        migrations.AlterField(
+            model_name='systemsettings',
+            name='backup_frequency_hours',
+            field=models.IntegerField(default=24, help_text='Максимальний інтервал між резервними копіями (годин)'),
+        ),
+    ]
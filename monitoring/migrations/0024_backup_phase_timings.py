@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-19 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0023_backup_change_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backuplog',
+            name='bytes_per_second',
+            field=models.FloatField(blank=True, null=True, verbose_name='Швидкість запису (байт/с)'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, null=True, verbose_name='Тривалість (с)'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='phase_timings',
+            field=models.JSONField(blank=True, null=True, verbose_name='Етапи резервування (с)'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='restore_bytes_per_second',
+            field=models.FloatField(blank=True, null=True, verbose_name='Швидкість відновлення (байт/с)'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='restore_phase_timings',
+            field=models.JSONField(blank=True, null=True, verbose_name='Етапи відновлення (с)'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='restore_seconds',
+            field=models.FloatField(blank=True, null=True, verbose_name='Тривалість відновлення (с)'),
+        ),
+        migrations.AddField(
+            model_name='backuplog',
+            name='restored_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Час останнього відновлення'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-19 11:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0024_backup_phase_timings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestoreOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('backup_file', models.CharField(max_length=255, verbose_name='Файл')),
+                ('selection', models.JSONField(blank=True, null=True, verbose_name='Вибірка записів')),
+                ('status', models.CharField(choices=[('PENDING', 'Очікує запуску'), ('RUNNING', 'Виконується'), ('SUCCESS', 'Успіх'), ('FAILED', 'Помилка'), ('CANCELLED', 'Скасовано')], default='PENDING', max_length=20, verbose_name='Статус')),
+                ('phase', models.CharField(blank=True, choices=[('load', 'Завантаження'), ('indexes', 'Індекси'), ('lock_wait', 'Очікування блокування'), ('swap', 'Заміна таблиці'), ('bookkeeping', 'Облік у базі даних')], default='', max_length=20, verbose_name='Етап')),
+                ('rows_restored', models.BigIntegerField(default=0, verbose_name='Відновлено записів')),
+                ('bytes_read', models.BigIntegerField(default=0, verbose_name='Прочитано (байт)')),
+                ('expected_rows', models.BigIntegerField(blank=True, null=True, verbose_name='Очікувана кількість записів')),
+                ('message', models.CharField(blank=True, default='', max_length=255, verbose_name='Повідомлення')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='Запит на скасування')),
+                ('pid', models.IntegerField(blank=True, null=True, verbose_name='PID процесу')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Час запиту')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Час початку')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Час завершення')),
+                ('updated_at', models.DateTimeField(blank=True, null=True, verbose_name='Останнє оновлення')),
+                ('backup', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='restores', to='monitoring.backuplog', verbose_name='Резервна копія')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Запущено користувачем')),
+            ],
+            options={
+                'verbose_name': 'Відновлення',
+                'verbose_name_plural': 'Відновлення',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0025_restore_operation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backuplog',
+            name='row_digest',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Дайджест записів'),
+        ),
+    ]
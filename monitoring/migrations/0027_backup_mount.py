@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-19 11:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0026_backup_row_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemsettings',
+            name='backup_mount_limit_mb',
+            field=models.IntegerField(default=500, help_text='Обсяг резервних копій, відкритих для перегляду (МБ)'),
+        ),
+        migrations.CreateModel(
+            name='BackupMount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema', models.CharField(max_length=63, unique=True, verbose_name='Схема')),
+                ('record_count', models.BigIntegerField(default=0, verbose_name='Записів енергосистеми')),
+                ('size_bytes', models.BigIntegerField(default=0, verbose_name='Розмір (байт)')),
+                ('load_seconds', models.FloatField(blank=True, null=True, verbose_name='Тривалість завантаження (с)')),
+                ('mounted_at', models.DateTimeField(auto_now_add=True, verbose_name='Час завантаження')),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Останній перегляд')),
+                ('backup', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='mount', to='monitoring.backuplog', verbose_name='Резервна копія')),
+            ],
+            options={
+                'verbose_name': 'Відкрита резервна копія',
+                'verbose_name_plural': 'Відкриті резервні копії',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 11:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0027_backup_mount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimulationBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(verbose_name='Кількість записів')),
+                ('simulation_type', models.CharField(choices=[('normal', 'Звичайні дані'), ('anomaly', 'Аномалії'), ('abnormal_prediction', 'Аномальні прогнози')], default='normal', max_length=30, verbose_name='Тип даних')),
+                ('status', models.CharField(choices=[('PENDING', 'Очікує запуску'), ('RUNNING', 'Виконується'), ('SUCCESS', 'Успіх'), ('FAILED', 'Помилка')], default='PENDING', max_length=20, verbose_name='Статус')),
+                ('summary', models.JSONField(blank=True, null=True, verbose_name='Підсумок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Час запиту')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Час завершення')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Запущено користувачем')),
+                ('device', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='monitoring.device', verbose_name='Інвертор')),
+            ],
+            options={
+                'verbose_name': 'Пакетна симуляція',
+                'verbose_name_plural': 'Пакетні симуляції',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
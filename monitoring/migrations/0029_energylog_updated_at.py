@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-19 11:42
+
+import django.db.models.functions.datetime
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes on the (potentially very large) energy log table are built concurrently
+    atomic = False
+
+    dependencies = [
+        ('monitoring', '0028_simulationbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backuplog',
+            name='snapshot_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Час знімка даних'),
+        ),
+        # now() is evaluated once for the existing rows, so the column is added without a table rewrite
+        migrations.AddField(
+            model_name='energylog',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_default=django.db.models.functions.datetime.Now(), verbose_name='Час зміни'),
+        ),
+        AddIndexConcurrently(
+            model_name='energylog',
+            index=models.Index(fields=['updated_at'], name='energylog_updated_at_idx'),
+        ),
+    ]
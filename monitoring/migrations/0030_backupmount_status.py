@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-19 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0029_energylog_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupmount',
+            name='error_message',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Повідомлення про помилку'),
+        ),
+        # Mounts that already exist were loaded synchronously and are ready
+        migrations.AddField(
+            model_name='backupmount',
+            name='status',
+            field=models.CharField(choices=[('LOADING', 'Завантажується'), ('READY', 'Готова до перегляду'), ('FAILED', 'Помилка')], default='READY', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AlterField(
+            model_name='backupmount',
+            name='status',
+            field=models.CharField(choices=[('LOADING', 'Завантажується'), ('READY', 'Готова до перегляду'), ('FAILED', 'Помилка')], default='LOADING', max_length=20, verbose_name='Статус'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 12:00
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0030_backupmount_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupDiff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('RUNNING', 'Виконується'), ('SUCCESS', 'Успіх'), ('FAILED', 'Помилка')], default='RUNNING', max_length=20, verbose_name='Статус')),
+                ('report', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Звіт')),
+                ('message', models.CharField(blank=True, max_length=255, null=True, verbose_name='Повідомлення')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Час запиту')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Час завершення')),
+                ('backup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='diffs', to='monitoring.backuplog', verbose_name='Резервна копія')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Запущено користувачем')),
+            ],
+            options={
+                'verbose_name': 'Порівняння з резервною копією',
+                'verbose_name_plural': 'Порівняння з резервними копіями',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
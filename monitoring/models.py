@@ -1,5 +1,7 @@
 # monitoring/models.py
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Now
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -29,10 +31,65 @@ class UserProfile(models.Model):
 
 
 class SystemSettings(models.Model):
+    BACKUP_MODE_CHOICES = [
+        ('FULL', 'Повні копії'),
+        ('INCREMENTAL', 'Інкрементні копії'),
+        ('SNAPSHOT', 'Знімки навколо аномалії'),
+    ]
+
+    # Keys match the profiles in ml/backup_formats.py
+    BACKUP_FORMAT_CHOICES = [
+        ('plain', 'SQL без стиснення'),
+        ('custom', 'pg_dump custom (-Fc)'),
+        ('directory', 'pg_dump directory (-Fd, паралельно)'),
+        ('gzip', 'SQL + gzip'),
+        ('lzma', 'SQL + lzma (xz)'),
+        ('bz2', 'SQL + bzip2'),
+        ('chunked', 'Дедупліковані фрагменти'),
+    ]
+
+    BACKUP_EXPORTER_CHOICES = [
+        ('NATIVE', 'Вбудований експорт (COPY)'),
+        ('PG_DUMP', 'pg_dump'),
+    ]
+
     # Backup settings
-    backup_frequency_hours = models.IntegerField(default=24, help_text="Частота створення резервних копій (годин)")
+    # Scheduled backups run once enough has changed, or after the maximum interval (see ml/backup_policy.py)
+    backup_frequency_hours = models.IntegerField(default=24,
+                                                 help_text="Максимальний інтервал між резервними копіями (годин)")
+    backup_change_threshold = models.IntegerField(default=1000,
+                                                  help_text="Змін у базі даних для позачергової резервної копії "
+                                                            "(0 - лише за інтервалом)")
     backup_retention_days = models.IntegerField(default=30, help_text="Зберігати резервні копії (днів)")
     max_backups = models.IntegerField(default=20, help_text="Максимальна кількість резервних копій")
+    backup_mode = models.CharField(max_length=20, choices=BACKUP_MODE_CHOICES, default='FULL',
+                                   help_text="Режим резервного копіювання при аномаліях та аномальних прогнозах")
+    max_incremental_chain = models.IntegerField(default=24,
+                                                help_text="Максимальна кількість інкрементних копій після повної")
+    backup_coalesce_seconds = models.IntegerField(default=10,
+                                                  help_text="Вікно об'єднання тригерів резервного копіювання (секунд)")
+    snapshot_window_minutes = models.IntegerField(default=60,
+                                                  help_text="Хвилин до та після аномалії у знімку резервної копії")
+    backup_format = models.CharField(max_length=20, choices=BACKUP_FORMAT_CHOICES, default='plain',
+                                     help_text="Формат та стиснення повних резервних копій")
+    backup_exporter = models.CharField(max_length=20, choices=BACKUP_EXPORTER_CHOICES, default='NATIVE',
+                                       help_text="Спосіб створення повних SQL-копій (формати custom та directory "
+                                                 "завжди створює pg_dump)")
+    backup_compression_level = models.IntegerField(default=6, help_text="Рівень стиснення (0-9)")
+    backup_bandwidth_mb = models.IntegerField(default=0,
+                                              help_text="Обмеження швидкості резервного копіювання (МБ/с, 0 - без обмеження)")
+    backup_dump_jobs = models.IntegerField(default=2, help_text="Паралельних процесів pg_dump для формату directory")
+    # Backups opened for browsing stay loaded until this space is needed (see ml/backup_mount.py)
+    backup_mount_limit_mb = models.IntegerField(default=500,
+                                                help_text="Обсяг резервних копій, відкритих для перегляду (МБ)")
+
+    # Grandfather-father-son retention: the newest backup of each of the last N periods is kept
+    retention_hourly = models.IntegerField(default=24, help_text="Зберігати погодинних резервних копій")
+    retention_daily = models.IntegerField(default=7, help_text="Зберігати щоденних резервних копій")
+    retention_weekly = models.IntegerField(default=4, help_text="Зберігати щотижневих резервних копій")
+    retention_monthly = models.IntegerField(default=6, help_text="Зберігати щомісячних резервних копій")
+    backup_storage_budget_mb = models.IntegerField(default=0,
+                                                   help_text="Максимальний обсяг резервних копій (МБ, 0 - без обмеження)")
 
     # Maintenance settings
     maintenance_time = models.TimeField(
@@ -59,9 +116,58 @@ class SystemSettings(models.Model):
         verbose_name_plural = "Налаштування планувальника"
 
 
+class Device(models.Model):
+    name = models.CharField(max_length=100, verbose_name="Назва")
+    serial_number = models.CharField(max_length=64, unique=True, verbose_name="Серійний номер")
+    location = models.CharField(max_length=255, blank=True, verbose_name="Розташування")
+    is_active = models.BooleanField(default=True, verbose_name="Активний")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Час додавання")
+
+    def __str__(self):
+        return f"{self.name} ({self.serial_number})"
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = "Інвертор"
+        verbose_name_plural = "Інвертори"
+
+
+class EnergyLogManager(models.Manager):
+    def for_device(self, device):
+        """Restrict logs to a single device (instance or ID); no-op when device is empty"""
+        queryset = self.get_queryset()
+        if device:
+            queryset = queryset.filter(device=device)
+        return queryset
+
+    def latest_per_device(self, limit=1):
+        """
+        Return the latest `limit` logs of every device
+
+        Uses a LATERAL join so that each device is served by a short backward scan of the
+        (device, -timestamp) index instead of ranking the whole table with a window function.
+        Every log carries the name of its device as `device_name`.
+        """
+        log_table = self.model._meta.db_table
+        device_table = Device._meta.db_table
+        return self.raw(
+            f"SELECT latest.*, d.name AS device_name FROM {device_table} d "
+            f"CROSS JOIN LATERAL ("
+            f"    SELECT * FROM {log_table} e WHERE e.device_id = d.id "
+            f"    ORDER BY e.timestamp DESC LIMIT %s"
+            f") latest "
+            f"ORDER BY latest.device_id, latest.timestamp DESC",
+            [limit]
+        )
+
+
 class EnergyLog(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Час запису")
 
+    # Source inverter; the composite indexes below cover device lookups, so no separate FK index
+    device = models.ForeignKey(Device, on_delete=models.PROTECT, null=True, blank=True, db_index=False,
+                               related_name='logs', verbose_name="Інвертор")
+
     # Energy system metrics
     ac_output_voltage = models.FloatField(verbose_name="Вихідна напруга (В)")
     dc_battery_voltage = models.FloatField(verbose_name="Напруга акамулятора (В)")
@@ -87,6 +193,17 @@ class EnergyLog(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
                                  verbose_name="Створено користувачем")
 
+    # Idempotency key: client-supplied ID or derived from (device, source timestamp); retried deliveries
+    # conflict on it and are dropped by the bulk loader
+    ingest_key = models.CharField(max_length=128, null=True, blank=True, unique=True,
+                                  verbose_name="Ключ ідемпотентності")
+
+    # Time of the last write to the record, so incremental backups also pick up records changed after
+    # their parent (scores, backup flags); the database default covers raw INSERTs and COPY
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now(), verbose_name="Час зміни")
+
+    objects = EnergyLogManager()
+
     def __str__(self):
         return f"[{self.timestamp}] Навантаження: {self.load_power}Вт | Аномалія: {self.is_anomaly}"
 
@@ -108,6 +225,13 @@ class EnergyLog(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['-timestamp']),  # Index for faster ordering by timestamp desc
+            # Per-device listings and latest-N-per-device lookups
+            models.Index(fields=['device', '-timestamp'], name='energylog_device_ts_idx'),
+            # Small partial index for the "recent anomalies" panels
+            models.Index(fields=['device', '-timestamp'], condition=models.Q(is_anomaly=True),
+                         name='energylog_device_anomaly_idx'),
+            # Records changed since the parent of an incremental backup
+            models.Index(fields=['updated_at'], name='energylog_updated_at_idx'),
         ]
         verbose_name = "Запис енергосистеми"
         verbose_name_plural = "Записи енергосистеми"
@@ -119,6 +243,7 @@ class BackupLog(models.Model):
         ('PREDICTION', 'Аномальний прогноз'),
         ('MANUAL', 'Ручне копіювання'),
         ('SCHEDULED', 'За розкладом'),
+        ('UPLOAD', 'Завантажено'),
         ('UNKNOWN', 'Невідома причина'),
     ]
 
@@ -127,6 +252,35 @@ class BackupLog(models.Model):
         ('FAILED', 'Помилка'),
     ]
 
+    BACKUP_TYPE_CHOICES = [
+        ('FULL', 'Повна'),
+        ('INCREMENTAL', 'Інкрементна'),
+        ('SNAPSHOT', 'Знімок аномалії'),
+    ]
+
+    VERIFICATION_CHOICES = [
+        ('VERIFIED', 'Перевірено'),
+        ('FAILED', 'Перевірку не пройдено'),
+    ]
+
+    BACKUP_PHASES = [
+        ('coalesce', "Вікно об'єднання тригерів"),
+        ('lock_wait', 'Очікування блокування'),
+        ('prepare', 'Підготовка'),
+        ('dump', 'Копіювання'),
+        ('fsync', 'Запис на диск (fsync)'),
+        ('manifest', 'Маніфест'),
+        ('bookkeeping', 'Облік у базі даних'),
+    ]
+
+    RESTORE_PHASES = [
+        ('load', 'Завантаження'),
+        ('indexes', 'Індекси'),
+        ('lock_wait', 'Очікування блокування'),
+        ('swap', 'Заміна таблиці'),
+        ('bookkeeping', 'Облік у базі даних'),
+    ]
+
     timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Час створення")
     backup_file = models.CharField(max_length=255, verbose_name="Файл")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, verbose_name="Статус")
@@ -138,12 +292,273 @@ class BackupLog(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
                                    verbose_name="Створено користувачем")
 
+    # Backup chain: increments hold energy logs with IDs above the parent's watermark or changed since its snapshot
+    backup_type = models.CharField(max_length=20, choices=BACKUP_TYPE_CHOICES, default='FULL',
+                                   verbose_name="Тип копії")
+    backup_format = models.CharField(max_length=20, choices=SystemSettings.BACKUP_FORMAT_CHOICES, default='plain',
+                                     verbose_name="Формат")
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='increments',
+                               verbose_name="Попередня копія ланцюжка")
+    watermark_id = models.BigIntegerField(null=True, blank=True, verbose_name="Останній збережений запис")
+    # Start of the dump transaction; records changed after it are carried by the next increment
+    snapshot_at = models.DateTimeField(null=True, blank=True, verbose_name="Час знімка даних")
+    coalesced_triggers = models.IntegerField(default=0, verbose_name="Об'єднано тригерів")
+
+    # Index of the manifest written next to the backup (see ml/backup_manifest.py)
+    checksum = models.CharField(max_length=64, null=True, blank=True, verbose_name="SHA-256")
+    # Root of the digest tree of the energy logs in a full backup (see ml/row_digest.py)
+    row_digest = models.CharField(max_length=64, null=True, blank=True, verbose_name="Дайджест записів")
+    pg_dump_version = models.CharField(max_length=100, null=True, blank=True, verbose_name="Версія pg_dump")
+    record_count = models.BigIntegerField(null=True, blank=True, verbose_name="Записів енергосистеми")
+    min_record_id = models.BigIntegerField(null=True, blank=True, verbose_name="Перший ID запису")
+    max_record_id = models.BigIntegerField(null=True, blank=True, verbose_name="Останній ID запису")
+    first_record_at = models.DateTimeField(null=True, blank=True, verbose_name="Час першого запису")
+    last_record_at = models.DateTimeField(null=True, blank=True, verbose_name="Час останнього запису")
+    manifest = models.JSONField(null=True, blank=True, verbose_name="Маніфест")
+
+    # Outcome of the last test restore by ml/verify_backups.py
+    verification_status = models.CharField(max_length=20, choices=VERIFICATION_CHOICES, null=True, blank=True,
+                                           verbose_name="Перевірка")
+    verification_message = models.CharField(max_length=255, null=True, blank=True,
+                                            verbose_name="Результат перевірки")
+    verification_seconds = models.FloatField(null=True, blank=True, verbose_name="Тривалість тестового відновлення (с)")
+    verified_at = models.DateTimeField(null=True, blank=True, verbose_name="Час перевірки")
+
+    # p95 of the ingest latency probes right before and during the dump (see ml/backup_throttle.py)
+    ingest_latency_before_ms = models.FloatField(null=True, blank=True, verbose_name="Затримка запису до копіювання (мс)")
+    ingest_latency_during_ms = models.FloatField(null=True, blank=True,
+                                                 verbose_name="Затримка запису під час копіювання (мс)")
+
+    # Database change counter when a full backup was taken (see ml/backup_policy.py)
+    change_counter = models.BigIntegerField(null=True, blank=True, verbose_name="Лічильник змін")
+
+    # Timings of the backup (see ml/backup_timing.py): {phase: seconds} with the phases of BACKUP_PHASES.
+    # The coalesce window before an anomaly backup is a phase, but not part of its duration.
+    duration_seconds = models.FloatField(null=True, blank=True, verbose_name="Тривалість (с)")
+    bytes_per_second = models.FloatField(null=True, blank=True, verbose_name="Швидкість запису (байт/с)")
+    phase_timings = models.JSONField(null=True, blank=True, verbose_name="Етапи резервування (с)")
+
+    # Timings of the last restore from this backup, with the phases of RESTORE_PHASES
+    restored_at = models.DateTimeField(null=True, blank=True, verbose_name="Час останнього відновлення")
+    restore_seconds = models.FloatField(null=True, blank=True, verbose_name="Тривалість відновлення (с)")
+    restore_bytes_per_second = models.FloatField(null=True, blank=True,
+                                                 verbose_name="Швидкість відновлення (байт/с)")
+    restore_phase_timings = models.JSONField(null=True, blank=True, verbose_name="Етапи відновлення (с)")
+
+    def get_chain(self):
+        """Return the backups needed to restore this one, from the full backup to this one"""
+        chain = [self]
+        while chain[0].parent_id:
+            chain.insert(0, chain[0].parent)
+        return chain
+
+    def get_dependents(self):
+        """Return all increments chained onto this backup, nearest first"""
+        dependents = []
+        pending = list(self.increments.all())
+        while pending:
+            child = pending.pop(0)
+            dependents.append(child)
+            pending.extend(child.increments.all())
+        return dependents
+
     def __str__(self):
         return f"Резервна копія {self.id} - {self.timestamp} - {self.get_status_display()}"
 
     class Meta:
         indexes = [
             models.Index(fields=['-timestamp']),  # Index for faster ordering by timestamp desc
+            # Choosing a restore point by the time range of the records a backup holds
+            models.Index(fields=['first_record_at', 'last_record_at'], name='backuplog_record_range_idx'),
         ]
         verbose_name = "Резервна копія"
-        verbose_name_plural = "Резервні копії"
\ No newline at end of file
+        verbose_name_plural = "Резервні копії"
+
+
+class BackupMount(models.Model):
+    """Energy logs of a backup loaded into a separate schema for read-only browsing"""
+    STATUS_CHOICES = [
+        ('LOADING', 'Завантажується'),
+        ('READY', 'Готова до перегляду'),
+        ('FAILED', 'Помилка'),
+    ]
+
+    backup = models.OneToOneField(BackupLog, on_delete=models.CASCADE, related_name='mount',
+                                  verbose_name="Резервна копія")
+    schema = models.CharField(max_length=63, unique=True, verbose_name="Схема")
+    # Mounts are loaded by a background process (see ml/backup_mount.py)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='LOADING', verbose_name="Статус")
+    error_message = models.CharField(max_length=255, null=True, blank=True, verbose_name="Повідомлення про помилку")
+    record_count = models.BigIntegerField(default=0, verbose_name="Записів енергосистеми")
+    size_bytes = models.BigIntegerField(default=0, verbose_name="Розмір (байт)")
+    load_seconds = models.FloatField(null=True, blank=True, verbose_name="Тривалість завантаження (с)")
+    mounted_at = models.DateTimeField(auto_now_add=True, verbose_name="Час завантаження")
+    # Least recently browsed mounts are dropped first when the space limit is reached
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Останній перегляд")
+
+    def __str__(self):
+        return f"{self.schema} ({self.backup.backup_file})"
+
+    class Meta:
+        verbose_name = "Відкрита резервна копія"
+        verbose_name_plural = "Відкриті резервні копії"
+
+
+class BackupChunk(models.Model):
+    """A content-addressed chunk of the deduplicated backup store, shared by chunked backups"""
+    hash = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    stored_size = models.BigIntegerField(default=0, verbose_name="Розмір на диску (байт)")
+    ref_count = models.IntegerField(default=0, db_index=True, verbose_name="Кількість посилань")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Створено")
+
+    def __str__(self):
+        return f"Фрагмент {self.hash[:12]} ({self.ref_count} посилань)"
+
+    class Meta:
+        verbose_name = "Фрагмент резервної копії"
+        verbose_name_plural = "Фрагменти резервних копій"
+
+
+class RestoreOperation(models.Model):
+    """A restore run in the background by ml/restore_operation.py, with its progress"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Очікує запуску'),
+        ('RUNNING', 'Виконується'),
+        ('SUCCESS', 'Успіх'),
+        ('FAILED', 'Помилка'),
+        ('CANCELLED', 'Скасовано'),
+    ]
+    ACTIVE_STATUSES = ('PENDING', 'RUNNING')
+
+    # Until the restored data is committed, a cancelled restore is rolled back and leaves the energy logs unchanged
+    CANCELLABLE_PHASES = ('', 'load', 'indexes')
+
+    backup = models.ForeignKey(BackupLog, on_delete=models.SET_NULL, null=True, blank=True, related_name='restores',
+                               verbose_name="Резервна копія")
+    backup_file = models.CharField(max_length=255, verbose_name="Файл")
+    # Time window and ID range of a selective restore (arguments of restore_database, datetimes in ISO format)
+    selection = models.JSONField(null=True, blank=True, verbose_name="Вибірка записів")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name="Статус")
+    phase = models.CharField(max_length=20, choices=BackupLog.RESTORE_PHASES, blank=True, default='',
+                             verbose_name="Етап")
+    rows_restored = models.BigIntegerField(default=0, verbose_name="Відновлено записів")
+    bytes_read = models.BigIntegerField(default=0, verbose_name="Прочитано (байт)")
+    # Records of the backup chain, when the whole chain is restored; unknown for a selection
+    expected_rows = models.BigIntegerField(null=True, blank=True, verbose_name="Очікувана кількість записів")
+    message = models.CharField(max_length=255, blank=True, default='', verbose_name="Повідомлення")
+    cancel_requested = models.BooleanField(default=False, verbose_name="Запит на скасування")
+    pid = models.IntegerField(null=True, blank=True, verbose_name="PID процесу")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                   verbose_name="Запущено користувачем")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Час запиту")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Час початку")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Час завершення")
+    # Heartbeat of the restore process; an active operation that stops updating it has died
+    updated_at = models.DateTimeField(null=True, blank=True, verbose_name="Останнє оновлення")
+
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    def is_cancellable(self):
+        return self.is_active() and not self.cancel_requested and self.phase in self.CANCELLABLE_PHASES
+
+    def elapsed_seconds(self):
+        if not self.started_at:
+            return 0
+        return ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+
+    def progress_percent(self):
+        """Share of the expected records loaded, while it is known"""
+        if not self.expected_rows:
+            return None
+        if self.status == 'SUCCESS':
+            return 100
+        return min(int(self.rows_restored * 100 / self.expected_rows), 99)
+
+    def rows_per_second(self):
+        elapsed = self.elapsed_seconds()
+        if not elapsed or not self.rows_restored:
+            return None
+        return self.rows_restored / elapsed
+
+    def eta_seconds(self):
+        """Estimated seconds left to load the remaining records at the current rate"""
+        rate = self.rows_per_second()
+        if not self.is_active() or self.phase != 'load' or not self.expected_rows or not rate:
+            return None
+        return max(self.expected_rows - self.rows_restored, 0) / rate
+
+    def __str__(self):
+        return f"Відновлення {self.id} з {self.backup_file} - {self.get_status_display()}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Відновлення"
+        verbose_name_plural = "Відновлення"
+
+
+class SimulationBatch(models.Model):
+    """A batch simulation run in the background by ml/simulate_data.py --count, with its summary"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Очікує запуску'),
+        ('RUNNING', 'Виконується'),
+        ('SUCCESS', 'Успіх'),
+        ('FAILED', 'Помилка'),
+    ]
+    ACTIVE_STATUSES = ('PENDING', 'RUNNING')
+
+    TYPE_CHOICES = [
+        ('normal', 'Звичайні дані'),
+        ('anomaly', 'Аномалії'),
+        ('abnormal_prediction', 'Аномальні прогнози'),
+    ]
+
+    count = models.IntegerField(verbose_name="Кількість записів")
+    simulation_type = models.CharField(max_length=30, choices=TYPE_CHOICES, default='normal',
+                                       verbose_name="Тип даних")
+    device = models.ForeignKey(Device, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Інвертор")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name="Статус")
+    # Summary returned by run_batch_simulation: created, first_id, last_id, anomalies, abnormal_predictions, ...
+    summary = models.JSONField(null=True, blank=True, verbose_name="Підсумок")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                   verbose_name="Запущено користувачем")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Час запиту")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Час завершення")
+
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    def __str__(self):
+        return f"Пакетна симуляція {self.id} ({self.count} записів) - {self.get_status_display()}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Пакетна симуляція"
+        verbose_name_plural = "Пакетні симуляції"
+
+
+class BackupDiff(models.Model):
+    """Comparison of the live energy logs with a full backup, run in the background by ml/backup_database.py"""
+    STATUS_CHOICES = [
+        ('RUNNING', 'Виконується'),
+        ('SUCCESS', 'Успіх'),
+        ('FAILED', 'Помилка'),
+    ]
+
+    backup = models.ForeignKey(BackupLog, on_delete=models.CASCADE, related_name='diffs', verbose_name="Резервна копія")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='RUNNING', verbose_name="Статус")
+    # Report returned by diff_with_live: identical, windows, changed_hours, compared_nodes, live_rows, backup_rows
+    report = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Звіт")
+    message = models.CharField(max_length=255, null=True, blank=True, verbose_name="Повідомлення")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                   verbose_name="Запущено користувачем")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Час запиту")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Час завершення")
+
+    def __str__(self):
+        return f"Порівняння з {self.backup.backup_file} - {self.get_status_display()}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Порівняння з резервною копією"
+        verbose_name_plural = "Порівняння з резервними копіями"
@@ -26,16 +26,48 @@ class SystemSettingsForm(forms.ModelForm):
         fields = [
             'data_collection_interval',
             'backup_frequency_hours',
+            'backup_change_threshold',
             'backup_retention_days',
             'max_backups',
+            'retention_hourly',
+            'retention_daily',
+            'retention_weekly',
+            'retention_monthly',
+            'backup_storage_budget_mb',
+            'backup_mode',
+            'max_incremental_chain',
+            'backup_coalesce_seconds',
+            'snapshot_window_minutes',
+            'backup_format',
+            'backup_exporter',
+            'backup_compression_level',
+            'backup_dump_jobs',
+            'backup_bandwidth_mb',
+            'backup_mount_limit_mb',
             'max_energy_logs',
             'maintenance_time',
         ]
         widgets = {
             'data_collection_interval': forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'max': '60'}),
             'backup_frequency_hours': forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'max': '168'}),
+            'backup_change_threshold': forms.NumberInput(attrs={'class': 'form-control', 'min': '0'}),
             'backup_retention_days': forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'max': '365'}),
             'max_backups': forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'max': '100'}),
+            'retention_hourly': forms.NumberInput(attrs={'class': 'form-control', 'min': '0', 'max': '168'}),
+            'retention_daily': forms.NumberInput(attrs={'class': 'form-control', 'min': '0', 'max': '90'}),
+            'retention_weekly': forms.NumberInput(attrs={'class': 'form-control', 'min': '0', 'max': '52'}),
+            'retention_monthly': forms.NumberInput(attrs={'class': 'form-control', 'min': '0', 'max': '120'}),
+            'backup_storage_budget_mb': forms.NumberInput(attrs={'class': 'form-control', 'min': '0'}),
+            'backup_mode': forms.Select(attrs={'class': 'form-select'}),
+            'max_incremental_chain': forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'max': '500'}),
+            'backup_coalesce_seconds': forms.NumberInput(attrs={'class': 'form-control', 'min': '0', 'max': '300'}),
+            'snapshot_window_minutes': forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'max': '1440'}),
+            'backup_format': forms.Select(attrs={'class': 'form-select'}),
+            'backup_exporter': forms.Select(attrs={'class': 'form-select'}),
+            'backup_compression_level': forms.NumberInput(attrs={'class': 'form-control', 'min': '0', 'max': '9'}),
+            'backup_dump_jobs': forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'max': '16'}),
+            'backup_bandwidth_mb': forms.NumberInput(attrs={'class': 'form-control', 'min': '0', 'max': '1000'}),
+            'backup_mount_limit_mb': forms.NumberInput(attrs={'class': 'form-control', 'min': '0'}),
             'max_energy_logs': forms.NumberInput(attrs={'class': 'form-control', 'min': '100', 'max': '50000'}),
             'maintenance_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
         }
@@ -1,3 +1,264 @@
-from django.test import TestCase
+import os
+import tempfile
+import zlib
+from datetime import datetime, timedelta, timezone
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from monitoring.backup_transfer import parse_range
+from ml.backup_policy import backup_decision
+from ml.backup_retention import DEFAULT_POLICY, compute_keep_set
+from ml.backup_stream import make_row_filter
+from ml.chunk_store import BOUNDARY_MASK, MAX_CHUNK_SIZE, MIN_CHUNK_SIZE, ChunkWriter, open_recipe
+from ml.row_digest import build_tree, changed_windows, diff_trees
+
+
+def make_backup(backup_id, timestamp, parent_id=None, size_bytes=1024, backup_type='FULL', trigger_reason='SCHEDULED'):
+    return {
+        'id': backup_id,
+        'timestamp': timestamp,
+        'parent_id': parent_id,
+        'size_bytes': size_bytes,
+        'backup_type': backup_type,
+        'trigger_reason': trigger_reason,
+    }
+
+
+class ComputeKeepSetTests(SimpleTestCase):
+    now = datetime(2024, 5, 15, 12, 0)
+
+    def policy(self, **overrides):
+        return {**DEFAULT_POLICY, **overrides}
+
+    def test_empty(self):
+        self.assertEqual(compute_keep_set([], self.policy(), self.now), {})
+
+    def test_newest_backup_of_each_hour_is_kept(self):
+        backups = [
+            make_backup(1, self.now - timedelta(minutes=70)),
+            make_backup(2, self.now - timedelta(minutes=50)),
+            make_backup(3, self.now - timedelta(minutes=10)),
+        ]
+        keep = compute_keep_set(backups, self.policy(), self.now)
+        self.assertEqual(keep, {3: 'latest', 1: 'hourly'})
+
+    def test_increment_is_kept_with_its_chain(self):
+        backups = [
+            make_backup(1, self.now - timedelta(days=3)),
+            make_backup(2, self.now - timedelta(days=2), parent_id=1, backup_type='INCREMENTAL'),
+            make_backup(3, self.now - timedelta(days=1), parent_id=2, backup_type='INCREMENTAL'),
+        ]
+        keep = compute_keep_set(backups, self.policy(daily=1, hourly=0, weekly=0, monthly=0), self.now)
+        self.assertEqual(keep, {3: 'latest', 2: 'chain', 1: 'chain'})
+
+    def test_broken_chain_is_dropped(self):
+        backups = [
+            make_backup(1, self.now - timedelta(hours=1)),
+            make_backup(2, self.now - timedelta(hours=2), parent_id=99, backup_type='INCREMENTAL'),
+        ]
+        self.assertEqual(set(compute_keep_set(backups, self.policy(), self.now)), {1})
+
+    def test_snapshot_does_not_take_the_full_backups_tier_slot(self):
+        backups = [
+            make_backup(1, self.now - timedelta(days=40)),
+            make_backup(2, self.now - timedelta(days=35), backup_type='SNAPSHOT', trigger_reason='ANOMALY'),
+            make_backup(3, self.now - timedelta(hours=1)),
+        ]
+        keep = compute_keep_set(backups, self.policy(), self.now)
+        # Backups 1 and 2 share a month; the snapshot is past the age limit and keeps no slot
+        self.assertEqual(keep, {3: 'latest', 1: 'monthly'})
+
+    def test_upload_does_not_take_a_tier_slot(self):
+        backups = [
+            make_backup(1, self.now - timedelta(minutes=30)),
+            make_backup(2, self.now - timedelta(minutes=10), trigger_reason='UPLOAD'),
+        ]
+        keep = compute_keep_set(backups, self.policy(), self.now)
+        self.assertEqual(keep, {1: 'latest', 2: 'standalone'})
+
+    def test_standalone_backups_come_after_the_tiers_under_the_count_budget(self):
+        backups = [
+            make_backup(1, self.now - timedelta(hours=3)),
+            make_backup(2, self.now - timedelta(hours=2)),
+            make_backup(3, self.now - timedelta(hours=1), backup_type='SNAPSHOT', trigger_reason='ANOMALY'),
+        ]
+        keep = compute_keep_set(backups, self.policy(max_count=2), self.now)
+        self.assertEqual(set(keep), {1, 2})
+
+    def test_byte_budget_gives_up_hourly_detail_first(self):
+        backups = [
+            make_backup(1, self.now - timedelta(days=2), size_bytes=100),
+            make_backup(2, self.now - timedelta(hours=2), size_bytes=100),
+            make_backup(3, self.now - timedelta(hours=1), size_bytes=100),
+        ]
+        keep = compute_keep_set(backups, self.policy(max_bytes=200), self.now)
+        self.assertEqual(keep, {3: 'latest', 1: 'daily'})
+
+    def test_newest_backup_is_kept_over_budget(self):
+        backups = [make_backup(1, self.now - timedelta(hours=1), size_bytes=10_000)]
+        self.assertEqual(compute_keep_set(backups, self.policy(max_bytes=100), self.now), {1: 'latest'})
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_without_a_range(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range('', 100))
+
+    def test_closed_range(self):
+        self.assertEqual(parse_range('bytes=10-19', 100), (10, 19))
+
+    def test_last_byte_past_the_end_is_clamped(self):
+        self.assertEqual(parse_range('bytes=90-200', 100), (90, 99))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range('bytes=40-', 100), (40, 99))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range('bytes=-30', 100), (70, 99))
+
+    def test_suffix_longer_than_the_file(self):
+        self.assertEqual(parse_range('bytes=-500', 100), (0, 99))
+
+    def test_multiple_ranges_and_other_units_get_the_whole_file(self):
+        self.assertIsNone(parse_range('bytes=0-9,20-29', 100))
+        self.assertIsNone(parse_range('items=0-9', 100))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=100-', 'bytes=150-160', 'bytes=20-10', 'bytes=-0'):
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                parse_range(header, 100)
+
+
+class MakeRowFilterTests(SimpleTestCase):
+    columns = ['id', 'device_id', 'timestamp', 'load_power']
+
+    def line(self, record_id, timestamp):
+        return f"{record_id}\t1\t{timestamp}\t1250.5\n"
+
+    def test_nothing_restricted(self):
+        self.assertIsNone(make_row_filter(self.columns))
+
+    def test_id_range_is_inclusive(self):
+        row_filter = make_row_filter(self.columns, min_id=10, max_id=20)
+        kept = [record_id for record_id in (9, 10, 15, 20, 21)
+                if row_filter(self.line(record_id, '2024-05-01 10:00:00+00'))]
+        self.assertEqual(kept, [10, 15, 20])
+
+    def test_time_window_is_inclusive(self):
+        start = datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc)
+        row_filter = make_row_filter(self.columns, start=start, end=start + timedelta(hours=1))
+        self.assertFalse(row_filter(self.line(1, '2024-05-01 09:59:59.999999+00')))
+        self.assertTrue(row_filter(self.line(2, '2024-05-01 10:00:00+00')))
+        self.assertTrue(row_filter(self.line(3, '2024-05-01 11:00:00+00')))
+        self.assertFalse(row_filter(self.line(4, '2024-05-01 11:00:00.5+00')))
+
+    def test_offsets_are_compared_as_instants(self):
+        start = datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc)
+        row_filter = make_row_filter(self.columns, start=start)
+        self.assertTrue(row_filter(self.line(1, '2024-05-01 12:30:00+02')))
+        self.assertFalse(row_filter(self.line(2, '2024-05-01 11:30:00+02')))
+
+    def test_open_side(self):
+        row_filter = make_row_filter(self.columns, max_id=5)
+        self.assertTrue(row_filter(self.line(1, '2024-05-01 10:00:00+00')))
+        self.assertFalse(row_filter(self.line(6, '2024-05-01 10:00:00+00')))
+
+
+class DiffTreesTests(SimpleTestCase):
+    leaves = {
+        '2024-05-01T10': [3, 'a'],
+        '2024-05-01T11': [2, 'b'],
+        '2024-05-02T08': [4, 'c'],
+        '2024-06-01T00': [1, 'd'],
+    }
+
+    def test_identical_trees_compare_only_the_root(self):
+        self.assertEqual(diff_trees(build_tree(self.leaves), build_tree(dict(self.leaves))), ([], 1))
+
+    def test_changed_added_and_removed_hours(self):
+        live = {**self.leaves, '2024-05-01T11': [2, 'changed'], '2024-05-01T12': [5, 'new']}
+        del live['2024-06-01T00']
+        changed, compared = diff_trees(build_tree(live), build_tree(self.leaves))
+        self.assertEqual(changed, [('2024-05-01T11', 2, 2), ('2024-05-01T12', 5, 0), ('2024-06-01T00', 0, 1)])
+        # Root, 2 months, 3 days and the 4 hours of the changed days; 2024-05-02 is not descended into
+        self.assertEqual(compared, 10)
+
+    def test_changed_windows_merge_consecutive_hours(self):
+        changed = [('2024-05-01T11', 2, 2), ('2024-05-01T12', 5, 0), ('2024-05-01T15', 0, 1)]
+        windows = changed_windows(changed)
+        self.assertEqual(windows, [
+            {'start': datetime(2024, 5, 1, 11, tzinfo=timezone.utc), 'end': datetime(2024, 5, 1, 13, tzinfo=timezone.utc),
+             'hours': 2, 'left_rows': 7, 'right_rows': 2},
+            {'start': datetime(2024, 5, 1, 15, tzinfo=timezone.utc), 'end': datetime(2024, 5, 1, 16, tzinfo=timezone.utc),
+             'hours': 1, 'left_rows': 0, 'right_rows': 1},
+        ])
+
+    def test_windows_span_midnight(self):
+        windows = changed_windows([('2024-05-01T23', 1, 1), ('2024-05-02T00', 1, 1)])
+        self.assertEqual(len(windows), 1)
+        self.assertEqual(windows[0]['hours'], 2)
+
+
+class BackupDecisionTests(SimpleTestCase):
+    def test_first_backup(self):
+        self.assertTrue(backup_decision(None, None, 1000, 24)[0])
+
+    def test_threshold_triggers_early(self):
+        self.assertTrue(backup_decision(1000, 1.0, 1000, 24)[0])
+        self.assertFalse(backup_decision(999, 1.0, 1000, 24)[0])
+
+    def test_interval_needs_a_change(self):
+        self.assertTrue(backup_decision(1, 24.0, 1000, 24)[0])
+        self.assertFalse(backup_decision(0, 100.0, 1000, 24)[0])
+
+    def test_disabled_threshold_waits_for_the_interval(self):
+        self.assertFalse(backup_decision(10 ** 6, 1.0, 0, 24)[0])
+        self.assertTrue(backup_decision(10 ** 6, 24.0, 0, 24)[0])
+
+    def test_unknown_change_count_falls_back_to_the_interval(self):
+        self.assertFalse(backup_decision(None, 23.0, 1000, 24)[0])
+        self.assertTrue(backup_decision(None, 24.0, 1000, 24)[0])
+
+
+class ChunkWriterTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.recipe_path = os.path.join(self.directory.name, 'backup.chunks')
+
+    def line_where(self, at_boundary):
+        """A 100-byte line whose CRC does (or does not) mark a chunk boundary"""
+        for number in range(100_000):
+            line = f"{number:099d}\n".encode()
+            if ((zlib.crc32(line) & BOUNDARY_MASK) == 0) == at_boundary:
+                return line
+
+    def write(self, data):
+        with ChunkWriter(self.recipe_path) as writer:
+            # Uneven writes, so lines are split across calls
+            for offset in range(0, len(data), 7000):
+                writer.write(data[offset:offset + 7000])
+        with open_recipe(self.recipe_path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        return writer
+
+    def test_no_boundary_before_the_minimum_size(self):
+        line = self.line_where(at_boundary=True)
+        writer = self.write(line * (3 * MIN_CHUNK_SIZE // len(line)))
+        sizes = [size for _, size in writer.chunks]
+        # A chunk ends at the first boundary line once the minimum size is reached
+        self.assertEqual(sizes[0], -(-MIN_CHUNK_SIZE // len(line)) * len(line))
+        self.assertTrue(all(size >= MIN_CHUNK_SIZE for size in sizes[:-1]))
+        # Equal chunks are stored once
+        self.assertEqual(writer.stats['new_chunks'], 2)
+
+    def test_chunks_are_cut_at_the_maximum_size(self):
+        line = self.line_where(at_boundary=False)
+        writer = self.write(line * (2 * MAX_CHUNK_SIZE // len(line) + 10))
+        sizes = [size for _, size in writer.chunks]
+        self.assertEqual(sizes, [-(-MAX_CHUNK_SIZE // len(line)) * len(line)] * 2 + [sizes[-1]])
+        self.assertLess(sizes[-1], MIN_CHUNK_SIZE)
+
+    def test_unfinished_last_line_is_kept(self):
+        writer = self.write(b'1\t2\n3\t4')
+        self.assertEqual(len(writer.chunks), 1)
@@ -25,6 +25,7 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('logs/', views.logs_list, name='logs_list'),
     path('logs/<int:pk>/', views.log_detail, name='log_detail'),
+    path('logs/backup/<int:backup_id>/status/', views.backup_mount_status, name='backup_mount_status'),
     path('backups/', views.backups_list, name='backups_list'),
     path('analytics/', views.analytics, name='analytics'),
 
@@ -39,11 +40,21 @@ urlpatterns = [
     path('action/run-simulation-anomaly/', views.run_anomaly_simulation, name='run_simulation_anomaly'),
     path('action/run-simulation-abnormal-prediction/', views.run_abnormal_prediction_simulation,
          name='run_simulation_abnormal_prediction'),
+    path('action/run-simulation-batch/', views.run_batch_simulation, name='run_simulation_batch'),
+    path('action/run-simulation-batch/<int:batch_id>/', views.simulation_batch_status, name='simulation_batch_status'),
 
     # Backup management actions
     path('action/force-backup/', views.force_backup, name='force_backup'),
     path('backups/<int:backup_id>/restore/', views.restore_backup, name='restore_backup'),
+    path('backups/restore-range/', views.restore_backup_range, name='restore_backup_range'),
+    path('backups/rollback-restore/', views.rollback_restore, name='rollback_restore'),
+    path('backups/<int:backup_id>/diff/', views.backup_diff, name='backup_diff'),
+    path('backups/diffs/<int:diff_id>/', views.backup_diff_status, name='backup_diff_status'),
+    path('backups/restores/<int:operation_id>/', views.restore_status, name='restore_status'),
+    path('backups/restores/<int:operation_id>/cancel/', views.cancel_restore, name='cancel_restore'),
     path('backups/<int:backup_id>/delete/', views.delete_backup, name='delete_backup'),
+    path('backups/<int:backup_id>/download/', views.download_backup, name='download_backup'),
+    path('backups/upload/', views.upload_backup, name='upload_backup'),
 
     # Scheduler management
     path('action/start-scheduler/', system_settings.start_scheduler, name='start_scheduler'),
@@ -55,5 +66,6 @@ urlpatterns = [
     path('charts/load-trend/', views.load_trend_chart, name='load_trend_chart'),
     path('charts/anomalies-trend/', views.anomalies_trend_chart, name='anomalies_trend_chart'),
     path('charts/backups-by-reason/', views.backups_by_reason_chart, name='backups_by_reason_chart'),
+    path('charts/backup-timings/', views.backup_timings_chart, name='backup_timings_chart'),
     path('charts/anomaly-by-parameter/', views.anomaly_by_parameter_chart, name='anomaly_by_parameter_chart'),
 ]
\ No newline at end of file
@@ -10,6 +10,7 @@ from datetime import timedelta
 from django.utils import timezone
 
 from ..models import EnergyLog, BackupLog
+from .devices import get_device_filter
 
 
 @login_required
@@ -17,6 +18,8 @@ def analytics(request):
     """Main analytics view with charts"""
     # Get a time period from query params, default to month
     period = request.GET.get('period', 'month')
+    device_id, devices = get_device_filter(request)
+    device_logs = EnergyLog.objects.for_device(device_id)
 
     # Get date ranges for context
     now = timezone.now()
@@ -31,8 +34,8 @@ def analytics(request):
         period_display = "місяць"
 
     # Get summary stats for the selected period
-    logs_in_period = EnergyLog.objects.filter(timestamp__gte=start_date).count()
-    anomalies_in_period = EnergyLog.objects.filter(timestamp__gte=start_date, is_anomaly=True).count()
+    logs_in_period = device_logs.filter(timestamp__gte=start_date).count()
+    anomalies_in_period = device_logs.filter(timestamp__gte=start_date, is_anomaly=True).count()
     backups_in_period = BackupLog.objects.filter(timestamp__gte=start_date).count()
     successful_backups = BackupLog.objects.filter(timestamp__gte=start_date, status='SUCCESS').count()
 
@@ -47,13 +50,13 @@ def analytics(request):
         backup_success_rate = (successful_backups / backups_in_period) * 100
 
     # Calculate average load
-    avg_load = EnergyLog.objects.filter(timestamp__gte=start_date).aggregate(avg=Avg('load_power'))['avg'] or 0
+    avg_load = device_logs.filter(timestamp__gte=start_date).aggregate(avg=Avg('load_power'))['avg'] or 0
 
     # Calculate peak load
-    peak_load = EnergyLog.objects.filter(timestamp__gte=start_date).aggregate(max=Max('load_power'))['max'] or 0
+    peak_load = device_logs.filter(timestamp__gte=start_date).aggregate(max=Max('load_power'))['max'] or 0
 
     # Get top anomaly reasons
-    top_anomalies = EnergyLog.objects.filter(
+    top_anomalies = device_logs.filter(
         timestamp__gte=start_date,
         is_anomaly=True,
         anomaly_reason__isnull=False
@@ -75,6 +78,8 @@ def analytics(request):
         'avg_load': avg_load,
         'peak_load': peak_load,
         'top_anomalies': top_anomalies,
+        'device': device_id,
+        'devices': devices,
     }
 
     return render(request, 'analytics/analytics.html', context)
@@ -102,7 +107,8 @@ def load_trend_chart(request):
         date_format = '%d %b'
 
     # Query for average and max load by day/week/month
-    load_data = EnergyLog.objects.filter(
+    device_id, _ = get_device_filter(request)
+    load_data = EnergyLog.objects.for_device(device_id).filter(
         timestamp__gte=start_date
     ).annotate(
         date=trunc_func('timestamp')
@@ -154,7 +160,8 @@ def anomaly_by_parameter_chart(request):
         start_date = now - timedelta(days=30)
 
     # Get anomalies with reasons
-    anomalies = EnergyLog.objects.filter(
+    device_id, _ = get_device_filter(request)
+    anomalies = EnergyLog.objects.for_device(device_id).filter(
         timestamp__gte=start_date,
         is_anomaly=True,
         anomaly_reason__isnull=False
@@ -217,7 +224,8 @@ def anomalies_trend_chart(request):
         date_format = '%d %b'
 
     # Query for anomaly counts by day/week/month
-    anomaly_data = EnergyLog.objects.filter(
+    device_id, _ = get_device_filter(request)
+    anomaly_data = EnergyLog.objects.for_device(device_id).filter(
         timestamp__gte=start_date
     ).annotate(
         date=trunc_func('timestamp')
@@ -306,6 +314,7 @@ def backups_by_reason_chart(request):
         'PREDICTION': 'Прогноз',
         'MANUAL': 'Вручну',
         'SCHEDULED': 'За розкладом',
+        'UPLOAD': 'Завантажено',
         'UNKNOWN': 'Невідомо'
     }
 
@@ -339,3 +348,51 @@ def backups_by_reason_chart(request):
             }
         ]
     })
+
+
+# Most recent backups shown in the backup timings chart
+BACKUP_TIMINGS_LIMIT = 100
+
+
+@login_required
+def backup_timings_chart(request):
+    """AJAX endpoint for backup phase timings and throughput chart data"""
+    period = request.GET.get('period', 'month')
+
+    now = timezone.now()
+    if period == 'week':
+        start_date = now - timedelta(days=7)
+    elif period == 'year':
+        start_date = now - timedelta(days=365)
+    else:  # default to month
+        start_date = now - timedelta(days=30)
+
+    # The latest backups of the period, oldest first; backups made before timings existed are left out
+    backups = list(BackupLog.objects.filter(
+        timestamp__gte=start_date, status='SUCCESS', phase_timings__isnull=False
+    ).order_by('-timestamp').values('timestamp', 'phase_timings', 'bytes_per_second')[:BACKUP_TIMINGS_LIMIT])
+    backups.reverse()
+
+    labels = [timezone.localtime(item['timestamp']).strftime('%d.%m %H:%M') for item in backups]
+    colors = ['102, 187, 106', '201, 203, 207', '255, 205, 86', '54, 162, 235', '255, 159, 64', '153, 102, 255', '75, 192, 192']
+
+    datasets = [
+        {
+            'label': label,
+            'data': [item['phase_timings'].get(phase, 0) for item in backups],
+            'backgroundColor': f'rgba({colors[index % len(colors)]}, 0.7)',
+            'stack': 'phases',
+        }
+        for index, (phase, label) in enumerate(BackupLog.BACKUP_PHASES)
+    ]
+    datasets.append({
+        'type': 'line',
+        'label': 'Швидкість запису (МБ/с)',
+        'data': [round(item['bytes_per_second'] / (1024 * 1024), 2) if item['bytes_per_second'] else None
+                 for item in backups],
+        'borderColor': 'rgba(255, 99, 132, 1)',
+        'backgroundColor': 'rgba(255, 99, 132, 0.2)',
+        'yAxisID': 'y1',
+    })
+
+    return JsonResponse({'labels': labels, 'datasets': datasets})
@@ -1,15 +1,25 @@
 # monitoring/views/backups.py
+import os
+
+from django.conf import settings
 from django.contrib import messages
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db.models import Q
+from django.http import HttpResponse, HttpResponseForbidden, QueryDict
+from django.middleware.csrf import CsrfViewMiddleware
+from django.urls import reverse
+from django.utils.datastructures import MultiValueDict
+from django.views.decorators.csrf import csrf_exempt
 from datetime import datetime, timedelta
 
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 # from . import get_stats
-from ..models import BackupLog, UserProfile, SystemSettings, EnergyLog
+from ..models import BackupLog, BackupDiff, UserProfile, SystemSettings, EnergyLog, RestoreOperation
+from ..backup_transfer import BackupUploadHandler, backup_download_response
 
 
 @login_required
@@ -80,6 +90,8 @@ def backups_list(request):
         'reason': reason,
         'period': period,
         'reasons': reasons,
+        'restorable_backups': BackupLog.objects.filter(status='SUCCESS').order_by('-timestamp')[:50],
+        'restore_operation': current_restore_operation(),
     }
 
     # Check if it's an HTMX request
@@ -151,9 +163,31 @@ def force_backup(request):
         return redirect(redirect_url, **redirect_params)
 
 
+# Finished restores stay on the backups page for this long
+RESTORE_PANEL_HOURS = 1
+
+
+def current_restore_operation():
+    """The running restore, or the last one if it finished recently"""
+    operation = RestoreOperation.objects.first()
+    if operation is None or operation.is_active():
+        return operation
+    if operation.finished_at and operation.finished_at >= timezone.now() - timedelta(hours=RESTORE_PANEL_HOURS):
+        return operation
+    return None
+
+
+def restore_progress_response(request, operation, error=None):
+    """HTMX partial with the progress of a restore operation"""
+    return render(request, 'backups/restore_progress.html', {
+        'restore_operation': operation,
+        'restore_error': error,
+    })
+
+
 @login_required
 def restore_backup(request, backup_id):
-    """Restore energy logs from a backup"""
+    """Start a restore of the energy logs from a backup in the background"""
     if request.method != 'POST':
         return redirect('backups_list')
 
@@ -167,31 +201,327 @@ def restore_backup(request, backup_id):
         messages.error(request, "У вас немає профілю користувача.")
         return redirect('backups_list')
 
+    operation = None
     try:
         # Get the backup
         backup = get_object_or_404(BackupLog, id=backup_id, status='SUCCESS')
 
-        # Import restore function
-        from ml.backup_database import restore_database
+        # The restore runs in its own process; its progress is polled from the backups page
+        from ml.restore_operation import start_restore
 
-        # Perform restore
-        success, message = restore_database(backup.backup_file)
+        operation, message = start_restore(backup, user=request.user)
+        if not operation:
+            message = f"Помилка відновлення: {message}"
 
-        if success:
-            messages.success(request, f"Дані енергосистеми успішно відновлено з резервної копії {backup.backup_file}")
+    except Exception as e:
+        message = f"Помилка при відновленні даних: {str(e)}"
+
+    # Check if the request was made with HTMX
+    if request.headers.get('HX-Request'):
+        return restore_progress_response(request, operation or current_restore_operation(),
+                                         error=None if operation else message)
+
+    if operation:
+        messages.success(request, message)
+    else:
+        messages.error(request, message)
+    return redirect('backups_list')
+
+
+@login_required
+def restore_backup_range(request):
+    """Restore only the energy logs of a time window and/or ID range from a backup"""
+    if request.method != 'POST':
+        return redirect('backups_list')
+
+    # Check if user has manager or admin role
+    try:
+        profile = request.user.profile
+        if not profile.is_manager:
+            messages.error(request, "У вас немає прав для відновлення резервних копій.")
+            return redirect('backups_list')
+    except UserProfile.DoesNotExist:
+        messages.error(request, "У вас немає профілю користувача.")
+        return redirect('backups_list')
+
+    try:
+        backup = get_object_or_404(BackupLog, id=request.POST.get('backup_id'), status='SUCCESS')
+
+        # Parse the selection; empty fields leave that side open
+        bounds = {}
+        for field in ('start', 'end'):
+            value = request.POST.get(field, '').strip()
+            if value:
+                bounds[field] = timezone.make_aware(datetime.fromisoformat(value))
+        for field in ('min_id', 'max_id'):
+            value = request.POST.get(field, '').strip()
+            if value:
+                bounds[field] = int(value)
+
+        if not bounds:
+            messages.error(request, "Вкажіть часовий проміжок або діапазон ID записів для відновлення.")
+            return redirect('backups_list')
+
+        from ml.restore_operation import start_restore
+
+        operation, message = start_restore(backup, user=request.user, selection=bounds)
+
+        if operation:
+            messages.success(request, f"Вибіркове відновлення: {message}")
         else:
             messages.error(request, f"Помилка відновлення: {message}")
 
+    except ValueError:
+        messages.error(request, "Некоректний формат дати або ID.")
     except Exception as e:
         messages.error(request, f"Помилка при відновленні даних: {str(e)}")
 
-    # Check if the request was made with HTMX
-    if request.headers.get('HX-Request'):
-        # Forward to the backups_list view to get updated data with current filters
-        return backups_list(request)
+    return redirect('backups_list')
+
+
+@login_required
+def backup_diff(request, backup_id):
+    """Changed hour windows of the energy logs since a full backup, compared in the background"""
+    # Check if user has manager or admin role
+    try:
+        profile = request.user.profile
+        if not profile.is_manager:
+            messages.error(request, "У вас немає прав для порівняння резервних копій.")
+            return redirect('backups_list')
+    except UserProfile.DoesNotExist:
+        messages.error(request, "У вас немає профілю користувача.")
+        return redirect('backups_list')
+
+    backup = get_object_or_404(BackupLog, id=backup_id, status='SUCCESS')
+
+    from ml.backup_database import start_diff
+
+    # The live digests take a scan of the whole table, so the panel polls the diff until it is done
+    diff = start_diff(backup, user=request.user)
+    return render(request, 'backups/backup_diff.html', _diff_context(diff))
+
+
+@login_required
+def backup_diff_status(request, diff_id):
+    """Status and report of a diff, polled by the diff panel while it runs"""
+    # Check if user has manager or admin role
+    try:
+        if not request.user.profile.is_manager:
+            return HttpResponseForbidden()
+    except UserProfile.DoesNotExist:
+        return HttpResponseForbidden()
+
+    diff = get_object_or_404(BackupDiff.objects.select_related('backup'), id=diff_id)
+    return render(request, 'backups/backup_diff.html', _diff_context(diff))
+
+
+def _diff_context(diff):
+    report = diff.report
+    if report:
+        # The windows come back from JSON, and the selective restore bounds are inclusive
+        for window in report['windows']:
+            window['start'] = parse_datetime(window['start'])
+            window['end'] = parse_datetime(window['end'])
+            window['restore_end'] = window['end'] - timedelta(microseconds=1)
+
+    return {
+        'backup': diff.backup,
+        'diff': diff,
+        'report': report,
+        'diff_message': diff.message,
+    }
+
+
+@login_required
+def rollback_restore(request):
+    """Bring back the energy logs replaced by the last full restore"""
+    if request.method != 'POST':
+        return redirect('backups_list')
+
+    # Check if user has manager or admin role
+    try:
+        profile = request.user.profile
+        if not profile.is_manager:
+            messages.error(request, "У вас немає прав для відновлення резервних копій.")
+            return redirect('backups_list')
+    except UserProfile.DoesNotExist:
+        messages.error(request, "У вас немає профілю користувача.")
+        return redirect('backups_list')
+
+    if RestoreOperation.objects.filter(status__in=RestoreOperation.ACTIVE_STATUSES).exists():
+        messages.error(request, "Дочекайтеся завершення або скасуйте поточне відновлення.")
+        return redirect('backups_list')
+
+    from ml.backup_database import rollback_restore as rollback_last_restore
+
+    success, message = rollback_last_restore()
+
+    if success:
+        messages.success(request, "Останнє відновлення скасовано, попередні записи енергосистеми повернено")
     else:
+        messages.error(request, f"Помилка скасування відновлення: {message}")
+
+    return redirect('backups_list')
+
+
+@login_required
+def download_backup(request, backup_id):
+    """Stream a backup file to the browser; single-file backups can be resumed with HTTP Range"""
+    # Check if user has manager or admin role
+    try:
+        profile = request.user.profile
+        if not profile.is_manager:
+            messages.error(request, "У вас немає прав для завантаження резервних копій.")
+            return redirect('backups_list')
+    except UserProfile.DoesNotExist:
+        messages.error(request, "У вас немає профілю користувача.")
         return redirect('backups_list')
 
+    backup = get_object_or_404(BackupLog, id=backup_id, status='SUCCESS')
+
+    from ml.backup_database import backups_dir
+
+    backup_path = os.path.join(backups_dir, backup.backup_file)
+    if not os.path.exists(backup_path):
+        messages.error(request, f"Файл резервної копії не знайдено: {backup.backup_file}")
+        return redirect('backups_list')
+
+    return backup_download_response(request, backup_path, backup.backup_file)
+
+
+@csrf_exempt
+@login_required
+def upload_backup(request):
+    """Upload an external dump and register it as a full backup"""
+    if request.method != 'POST':
+        return _upload_redirect(request)
+
+    # Check if user has manager or admin role
+    try:
+        profile = request.user.profile
+        if not profile.is_manager:
+            messages.error(request, "У вас немає прав для завантаження резервних копій.")
+            return _upload_redirect(request)
+    except UserProfile.DoesNotExist:
+        messages.error(request, "У вас немає профілю користувача.")
+        return _upload_redirect(request)
+
+    # The upload is streamed to the backups directory chunk by chunk, so the handlers must be replaced
+    # before the body is read. The CSRF token therefore comes in the X-CSRFToken header and is checked
+    # first: a forged request never writes anything to disk.
+    rejected = _check_upload_csrf(request)
+    if rejected:
+        return rejected
+
+    max_bytes = settings.BACKUP_UPLOAD_MAX_MB * 1024 * 1024
+    if int(request.META.get('CONTENT_LENGTH') or 0) > max_bytes:
+        messages.error(request, f"Файл резервної копії більший за {settings.BACKUP_UPLOAD_MAX_MB} МБ.")
+        return _upload_redirect(request)
+
+    handler = BackupUploadHandler(request)
+    request.upload_handlers = [handler]
+    # Without a Content-Length the size is only known while the body is read; the handler stops the
+    # upload, and files completed before it are removed
+    uploads = request.FILES
+    if handler.too_large:
+        for field, files in uploads.lists():
+            for upload in files:
+                os.remove(upload.path)
+        messages.error(request, f"Файл резервної копії більший за {settings.BACKUP_UPLOAD_MAX_MB} МБ.")
+        return _upload_redirect(request)
+
+    return _register_upload(request)
+
+
+def _check_upload_csrf(request):
+    """CSRF check of an upload from the X-CSRFToken header alone; returns the rejection response, if any"""
+    # The middleware reads a form token first; an empty form makes it take the header and leaves the
+    # body unread for the upload handler
+    request._post, request._files = QueryDict(), MultiValueDict()
+    try:
+        return CsrfViewMiddleware(lambda checked_request: None).process_view(request, None, (), {})
+    finally:
+        del request._post, request._files
+
+
+def _upload_redirect(request):
+    """Back to the backups list; the form posts through HTMX, which must load the whole page"""
+    if request.headers.get('HX-Request'):
+        response = HttpResponse()
+        response['HX-Redirect'] = reverse('backups_list')
+        return response
+    return redirect('backups_list')
+
+
+def _register_upload(request):
+    uploads = request.FILES.getlist('backup_file')
+    # Files sent under other field names are not kept
+    for field, files in request.FILES.lists():
+        for upload in files:
+            if field != 'backup_file' or upload is not uploads[0]:
+                os.remove(upload.path)
+
+    if not uploads:
+        messages.error(request, "Оберіть файл резервної копії для завантаження.")
+        return _upload_redirect(request)
+
+    try:
+        from ml.backup_database import register_uploaded_backup
+
+        upload = uploads[0]
+        success, message = register_uploaded_backup(upload.path, upload.name, upload.sha256, user=request.user)
+
+        if success:
+            messages.success(request, f"Резервну копію {upload.name} завантажено як {message}")
+        else:
+            messages.error(request, f"Помилка завантаження: {message}")
+
+    except Exception as e:
+        messages.error(request, f"Помилка при завантаженні резервної копії: {str(e)}")
+
+    return _upload_redirect(request)
+
+
+@login_required
+def restore_status(request, operation_id):
+    """Progress of a restore operation, polled by the backups page while it runs"""
+    from ml.restore_operation import expire_stale_operations
+
+    expire_stale_operations()
+    operation = get_object_or_404(RestoreOperation, id=operation_id)
+    return restore_progress_response(request, operation)
+
+
+@login_required
+def cancel_restore(request, operation_id):
+    """Ask a running restore to stop; it is rolled back and the energy logs stay unchanged"""
+    if request.method != 'POST':
+        return redirect('backups_list')
+
+    operation = get_object_or_404(RestoreOperation, id=operation_id)
+
+    # Check if user has manager or admin role
+    try:
+        profile = request.user.profile
+        if not profile.is_manager:
+            message = "У вас немає прав для скасування відновлення."
+            success = False
+        else:
+            from ml.restore_operation import request_cancel
+            success, message = request_cancel(operation)
+    except UserProfile.DoesNotExist:
+        success, message = False, "У вас немає профілю користувача."
+
+    if request.headers.get('HX-Request'):
+        operation.refresh_from_db()
+        return restore_progress_response(request, operation, error=None if success else message)
+
+    if success:
+        messages.success(request, message)
+    else:
+        messages.error(request, message)
+    return redirect('backups_list')
+
 
 @login_required
 def delete_backup(request, backup_id):
@@ -6,10 +6,11 @@ import psutil
 from datetime import timedelta, datetime
 from django.utils import timezone
 from ..models import EnergyLog, BackupLog, SystemSettings
+from .devices import get_device_filter
 
 
-def get_stats():
-    """Helper function to get system statistics"""
+def get_stats(device_id=None):
+    """Helper function to get system statistics, optionally for a single device"""
     # Get current time
     now = timezone.now()
 
@@ -17,8 +18,9 @@ def get_stats():
     settings = SystemSettings.objects.first() or SystemSettings()
 
     # Calculate statistics
-    total_logs = EnergyLog.objects.count()
-    anomaly_count = EnergyLog.objects.filter(is_anomaly=True).count()
+    device_logs = EnergyLog.objects.for_device(device_id)
+    total_logs = device_logs.count()
+    anomaly_count = device_logs.filter(is_anomaly=True).count()
     backup_success = BackupLog.objects.filter(status="SUCCESS").count()
     backup_failed = BackupLog.objects.filter(status="FAILED").count()
 
@@ -28,7 +30,7 @@ def get_stats():
         anomaly_percentage = (anomaly_count / total_logs) * 100
 
     # Get all logs distribution by type
-    manual_count = EnergyLog.objects.filter(is_manual=True).count()
+    manual_count = device_logs.filter(is_manual=True).count()
     auto_count = total_logs - manual_count
 
     # Calculate storage used by backups
@@ -65,19 +67,13 @@ def get_stats():
     if backup_hours <= 0:
         backup_hours = 24  # Default to daily
 
-    # Convert hours to minutes for calculation
-    backup_interval_minutes = backup_hours * 60
-
-    # Get the current time in local timezone
+    # Scheduled backups run as soon as enough has changed (see ml/backup_policy.py), so only the
+    # latest time of the next one is known: the maximum interval after the last full backup
+    last_full = BackupLog.objects.filter(status="SUCCESS", backup_type="FULL").order_by('-timestamp').first()
     local_now = timezone.localtime(now)
-    midnight = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
-    minutes_since_midnight = (local_now - midnight).total_seconds() / 60
-    next_backup_interval = ((minutes_since_midnight // backup_interval_minutes) + 1) * backup_interval_minutes
-    next_backup = midnight + timedelta(minutes=next_backup_interval)
-
-    # If the calculated time is in the past, add a day
-    if next_backup < local_now:
-        next_backup += timedelta(days=1)
+    next_backup = local_now
+    if last_full:
+        next_backup = max(timezone.localtime(last_full.timestamp) + timedelta(hours=backup_hours), local_now)
 
     # Check if scheduler is running
     scheduler_active = False
@@ -112,6 +108,7 @@ def get_stats():
         'next_backup': next_backup,
         'next_maintenance': next_maintenance,
         'backup_frequency_hours': backup_hours,
+        'backup_change_threshold': settings.backup_change_threshold,
         'max_logs_kept': settings.max_energy_logs,
         'max_backups_kept': settings.max_backups,
         'retention_days': settings.backup_retention_days,
@@ -130,37 +127,47 @@ def get_stats():
 @login_required
 def dashboard(request):
     """Main dashboard view"""
+    device_id, devices = get_device_filter(request)
+
     # Get recent logs
-    logs = EnergyLog.objects.all().order_by('-timestamp')[:15]
+    logs = EnergyLog.objects.for_device(device_id).order_by('-timestamp')[:15]
 
     # Get recent backup logs
     backups = BackupLog.objects.all().order_by('-timestamp')[:5]
 
     # Get statistics
-    stats = get_stats()
+    stats = get_stats(device_id)
 
     # Get recent anomalies
-    recent_anomalies = EnergyLog.objects.filter(is_anomaly=True).order_by('-timestamp')[:5]
+    recent_anomalies = EnergyLog.objects.for_device(device_id).filter(is_anomaly=True).order_by('-timestamp')[:5]
+
+    # Latest reading of every inverter, when the fleet is shown as a whole
+    latest_readings = list(EnergyLog.objects.latest_per_device()) if devices and not device_id else []
 
     return render(request, 'dashboard/dashboard.html', {
         'logs': logs,
         'backups': backups,
         'stats': stats,
         'recent_anomalies': recent_anomalies,
+        'latest_readings': latest_readings,
+        'device': device_id,
+        'devices': devices,
     })
 
 
 @login_required
 def stats_partial(request):
     """HTMX partial view for statistics"""
-    stats = get_stats()
+    device_id, _ = get_device_filter(request)
+    stats = get_stats(device_id)
     return render(request, 'dashboard/partials/stats.html', {'stats': stats})
 
 
 @login_required
 def logs_partial(request):
     """HTMX partial view for energy logs"""
-    logs = EnergyLog.objects.all().order_by('-timestamp')[:15]
+    device_id, _ = get_device_filter(request)
+    logs = EnergyLog.objects.for_device(device_id).order_by('-timestamp')[:15]
     return render(request, 'dashboard/partials/logs_table.html', {'logs': logs})
 
 
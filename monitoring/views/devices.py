@@ -0,0 +1,16 @@
+# monitoring/views/devices.py
+from ..models import Device
+
+
+def get_device_filter(request):
+    """
+    Read the optional device filter from the query string
+
+    Returns:
+        tuple: (device_id as a string, '' for all devices; queryset of devices for the filter widget)
+    """
+    device_id = request.GET.get('device', '')
+    if not device_id.isdigit():
+        device_id = ''
+
+    return device_id, Device.objects.all()
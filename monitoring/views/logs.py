@@ -1,15 +1,110 @@
 # monitoring/views/logs.py
+import os
+import subprocess
+import sys
+from datetime import timedelta
+from functools import wraps
+from pathlib import Path
+
 from django.contrib import messages
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db.models import Q
+from django.utils import timezone
+
+
+from ..models import EnergyLog, UserProfile, SystemSettings, Device, BackupLog, BackupMount, SimulationBatch
+from .devices import get_device_filter
+
 
+def browsable(view):
+    """
+    Let a logs view show the energy logs of a backup instead of the live ones (?backup_id=)
 
-from ..models import EnergyLog, UserProfile
+    Only managers may browse backups. The backup is loaded into its own schema by a background
+    process on first use (see ml/backup_mount.py); until then a loading page polls its status.
+    Once loaded, the view runs in a read-only transaction that resolves the energy log table to
+    that schema. The backup is passed to the templates as `browsed_backup`.
+    """
+    @wraps(view)
+    def wrapped_view(request, *args, **kwargs):
+        request.browsed_backup = None
+        backup_id = request.GET.get('backup_id')
+        if not backup_id:
+            return view(request, *args, **kwargs)
+
+        # Check if user has manager or admin role
+        try:
+            if not request.user.profile.is_manager:
+                messages.error(request, "У вас немає прав для перегляду резервних копій.")
+                return redirect('backups_list')
+        except UserProfile.DoesNotExist:
+            messages.error(request, "У вас немає профілю користувача.")
+            return redirect('backups_list')
+
+        backup = get_object_or_404(BackupLog, id=backup_id, status='SUCCESS')
+        from ml.backup_mount import MountGone, browse_mount, start_mount
+
+        try:
+            mount = start_mount(backup)
+        except Exception as e:
+            messages.error(request, f"Не вдалося відкрити резервну копію {backup.backup_file}: {str(e)}")
+            return redirect('backups_list')
+
+        if mount.status != 'READY':
+            return backup_mount_response(request, mount)
+
+        try:
+            with browse_mount(mount):
+                request.browsed_backup = backup
+                # The response is rendered here, so every query runs against the backup
+                return view(request, *args, **kwargs)
+        except MountGone:
+            # Evicted after it was looked up; the next request loads it again
+            messages.warning(request, f"Резервну копію {backup.backup_file} було закрито, її буде завантажено знову.")
+            return redirect(request.get_full_path())
+
+    return wrapped_view
+
+
+def backup_mount_response(request, mount):
+    """
+    Loading state of a backup opened for browsing; the page polls it and reloads once it is ready
+
+    A failed mount is dropped after it is shown, so opening the backup again retries the load.
+    """
+    from ml.backup_mount import unmount
+
+    if mount.status == 'FAILED':
+        unmount(mount)
+
+    template_name = 'logs/backup_mount_status.html' if request.headers.get('HX-Request') else 'logs/backup_loading.html'
+    return render(request, template_name, {'mount': mount, 'backup': mount.backup})
 
 
 @login_required
+def backup_mount_status(request, backup_id):
+    """Status of a backup being loaded for browsing, polled by the loading page"""
+    # Check if user has manager or admin role
+    try:
+        if not request.user.profile.is_manager:
+            return HttpResponseForbidden()
+    except UserProfile.DoesNotExist:
+        return HttpResponseForbidden()
+
+    mount = BackupMount.objects.select_related('backup').filter(backup_id=backup_id).first()
+    if mount is None or mount.status == 'READY':
+        # Reloading the page browses the backup, or starts the load again if the mount is gone
+        response = HttpResponse()
+        response['HX-Refresh'] = 'true'
+        return response
+    return backup_mount_response(request, mount)
+
+
+@login_required
+@browsable
 def logs_list(request):
     """Full list of energy logs with filtering and pagination"""
     # Get filter parameters
@@ -17,9 +112,10 @@ def logs_list(request):
     is_anomaly = request.GET.get('anomaly', '')
     is_manual = request.GET.get('manual', '')
     has_backup = request.GET.get('backup', '')
+    device_id, devices = get_device_filter(request)
 
-    # Start with all logs
-    logs = EnergyLog.objects.all()
+    # Start with all logs of the selected device
+    logs = EnergyLog.objects.for_device(device_id)
 
     # Apply filters
     if search_query:
@@ -59,10 +155,11 @@ def logs_list(request):
     page_obj = paginator.get_page(page_number)
 
     # Count totals for summary
-    total_logs = EnergyLog.objects.count()
-    total_anomalies = EnergyLog.objects.filter(is_anomaly=True).count()
-    total_manual = EnergyLog.objects.filter(is_manual=True).count()
-    total_with_backup = EnergyLog.objects.filter(backup_triggered=True).count()
+    device_logs = EnergyLog.objects.for_device(device_id)
+    total_logs = device_logs.count()
+    total_anomalies = device_logs.filter(is_anomaly=True).count()
+    total_manual = device_logs.filter(is_manual=True).count()
+    total_with_backup = device_logs.filter(backup_triggered=True).count()
 
     context = {
         'page_obj': page_obj,
@@ -74,6 +171,12 @@ def logs_list(request):
         'is_anomaly': is_anomaly,
         'is_manual': is_manual,
         'has_backup': has_backup,
+        'device': device_id,
+        'devices': devices,
+        'browsed_backup': request.browsed_backup,
+        # The browse transaction is read-only and cannot mark a stale batch failed; the panel
+        # belongs to the live data anyway
+        'simulation_batch': None if request.browsed_backup else current_simulation_batch(request.user),
     }
 
     if request.headers.get('HX-Request'):
@@ -85,6 +188,7 @@ def logs_list(request):
 
 
 @login_required
+@browsable
 def log_detail(request, pk):
     """Detailed view of a single energy log"""
     log = get_object_or_404(EnergyLog, pk=pk)
@@ -92,15 +196,17 @@ def log_detail(request, pk):
     # Get related backups
     backups = log.backups.all()
 
-    # Get the previous and next logs for navigation
-    prev_log = EnergyLog.objects.filter(timestamp__lt=log.timestamp).order_by('-timestamp').first()
-    next_log = EnergyLog.objects.filter(timestamp__gt=log.timestamp).order_by('timestamp').first()
+    # Get the previous and next logs of the same device for navigation
+    device_logs = EnergyLog.objects.for_device(log.device_id)
+    prev_log = device_logs.filter(timestamp__lt=log.timestamp).order_by('-timestamp').first()
+    next_log = device_logs.filter(timestamp__gt=log.timestamp).order_by('timestamp').first()
 
     return render(request, 'logs/log_detail.html', {
         'log': log,
         'backups': backups,
         'prev_log': prev_log,
         'next_log': next_log,
+        'browsed_backup': request.browsed_backup,
     })
 
 
@@ -132,13 +238,15 @@ def run_simulation(request, simulation_type=None):
     # Set parameters for simulation
     is_manual = True
     user_id = request.user.id
+    device_id, _ = get_device_filter(request)
 
     try:
-        # Run the simulation
+        # Run the simulation for the device selected in the filters
         log_id, simulation_message = run_simulation_with_type(
             simulation_type=simulation_type,
             is_manual=is_manual,
-            user_id=user_id
+            user_id=user_id,
+            device_id=device_id or None
         )
 
         if log_id:
@@ -194,4 +302,104 @@ def run_anomaly_simulation(request):
 @login_required
 def run_abnormal_prediction_simulation(request):
     """Run abnormal prediction simulation"""
-    return run_simulation(request, simulation_type='abnormal_prediction')
\ No newline at end of file
+    return run_simulation(request, simulation_type='abnormal_prediction')
+
+
+MAX_BATCH_SIMULATION_SIZE = 10000
+
+# Finished batches stay on the logs page this long
+SIMULATION_PANEL_HOURS = 1
+# A batch still active after this long belongs to a simulation process that died
+STALE_SIMULATION_MINUTES = 30
+
+
+def current_simulation_batch(user):
+    """The running batch simulation of a user, or their last one if it finished recently"""
+    batch = SimulationBatch.objects.filter(created_by=user).first()
+    if batch is None:
+        return None
+    if batch.is_active():
+        if batch.created_at < timezone.now() - timedelta(minutes=STALE_SIMULATION_MINUTES):
+            SimulationBatch.objects.filter(id=batch.id).update(status='FAILED', finished_at=timezone.now())
+            batch.refresh_from_db()
+        return batch
+    if batch.finished_at and batch.finished_at >= timezone.now() - timedelta(hours=SIMULATION_PANEL_HOURS):
+        return batch
+    return None
+
+
+@login_required
+def run_batch_simulation(request):
+    """
+    Start a batch simulation of N readings in a background process
+
+    The batch is generated, bulk-inserted and scored by ml/simulate_data.py --count; its summary
+    is stored on a SimulationBatch, which the logs page polls until the batch is done.
+    """
+    if request.method != 'POST':
+        return redirect('logs_list')
+
+    # Check if user has manager or admin role
+    try:
+        profile = request.user.profile
+        if not profile.is_manager:
+            messages.error(request, "У вас немає прав для запуску симуляції.")
+            return redirect('dashboard')
+    except UserProfile.DoesNotExist:
+        messages.error(request, "У вас немає профілю користувача.")
+        return redirect('dashboard')
+
+    try:
+        count = int(request.POST.get('count', ''))
+    except ValueError:
+        count = 0
+
+    if not 1 <= count <= MAX_BATCH_SIMULATION_SIZE:
+        messages.error(request, f"Кількість записів має бути від 1 до {MAX_BATCH_SIMULATION_SIZE}.")
+        return redirect('logs_list')
+
+    simulation_type = request.POST.get('type', 'normal')
+    if simulation_type not in ('normal', 'anomaly', 'abnormal_prediction'):
+        simulation_type = 'normal'
+
+    # Space the readings like the scheduler would collect them
+    settings = SystemSettings.objects.first()
+    interval = settings.data_collection_interval if settings else 15
+
+    device = Device.objects.filter(id=request.POST.get('device') or None).first()
+    batch = SimulationBatch.objects.create(count=count, simulation_type=simulation_type, device=device,
+                                           created_by=request.user)
+
+    BASE_DIR = Path(__file__).resolve().parent.parent.parent
+    script_path = os.path.join(BASE_DIR, 'ml', 'simulate_data.py')
+    cmd = [sys.executable, script_path, '--count', str(count), '--type', simulation_type,
+           '--interval', str(interval), '--manual', '--user', str(request.user.id), '--batch-id', str(batch.id)]
+
+    if device:
+        cmd += ['--device', device.serial_number]
+
+    try:
+        log_file = os.path.join(BASE_DIR, 'logs', 'simulation.log')
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+
+        # Run detached so the request returns immediately
+        subprocess.Popen(
+            cmd,
+            stdout=open(log_file, 'a'),
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            cwd=str(BASE_DIR)
+        )
+        messages.success(request, f"Пакетну симуляцію запущено у фоновому режимі: {count} записів.")
+    except Exception as e:
+        SimulationBatch.objects.filter(id=batch.id).update(status='FAILED', finished_at=timezone.now())
+        messages.error(request, f"Помилка запуску пакетної симуляції: {str(e)}")
+
+    return redirect('logs_list')
+
+
+@login_required
+def simulation_batch_status(request, batch_id):
+    """Status and summary of a batch simulation, polled by the logs page while it runs"""
+    batch = get_object_or_404(SimulationBatch, id=batch_id, created_by=request.user)
+    return render(request, 'logs/simulation_batch.html', {'simulation_batch': batch})